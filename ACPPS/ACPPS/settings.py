@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 import os
+import tempfile
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -150,6 +151,12 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 
+# Uploads imported in the background are spooled here until the Celery worker has read them,
+# so the worker must share this filesystem with the web server.
+IMPORT_SPOOL_DIR = os.path.join(tempfile.gettempdir(), 'acpps_imports')
+# Downloadable per-row error reports of user imports (kept for a week).
+IMPORT_REPORT_DIR = os.path.join(tempfile.gettempdir(), 'acpps_import_reports')
+
 # Crispy Forms Settings
 CRISPY_ALLOWED_TEMPLATE_PACKS = "bootstrap5"
 CRISPY_TEMPLATE_PACK = "bootstrap5"
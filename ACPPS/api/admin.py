@@ -1,10 +1,12 @@
 from django.contrib import admin
-from .models import OriginalTopic, StandardisedTopic
+from .models import OriginalTopic, StandardisedTopic, LabelCacheEntry, LabelingRun
 
 # Register your models here.
 admin.site.register(
     [
         OriginalTopic,
         StandardisedTopic,
+        LabelCacheEntry,
+        LabelingRun,
     ]
 )
\ No newline at end of file
@@ -0,0 +1,116 @@
+# api/label_cache.py
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+from .models import LabelCacheEntry
+
+DEFAULT_LRU_SIZE = 10_000
+
+
+def normalise_text(text):
+    """Collapses whitespace and case so trivially different copies of a preference share one cache entry."""
+    return " ".join(text.split()).casefold()
+
+
+def text_fingerprint(text):
+    """sha256 of the normalised preference text; stored on a student once that text is labeled."""
+    return hashlib.sha256(normalise_text(text).encode("utf-8")).hexdigest()
+
+
+def topic_set_version(topics):
+    """sha256 of the sorted standardised topic names; changes whenever a topic is added, renamed or removed."""
+    return hashlib.sha256(json.dumps(sorted(topics), ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def label_cache_key(text, topics, model_name, prompt_version):
+    """sha256 over (normalised text, sorted topic list, model name, prompt version)."""
+    payload = json.dumps([normalise_text(text), sorted(topics), model_name, prompt_version], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LRUCache:
+    """Small thread-safe least-recently-used mapping."""
+
+    def __init__(self, maxsize=DEFAULT_LRU_SIZE):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            if key not in self.entries:
+                return None
+            self.entries.move_to_end(key)
+            return self.entries[key]
+
+    def put(self, key, value):
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+# Shared by every LabelCache in this process (e.g. successive tasks on one Celery worker).
+memory_cache = LRUCache()
+
+
+class LabelCache:
+    """
+    Content-addressed cache of Gemini labels, persisted in LabelCacheEntry with an optional
+    in-process LRU in front of it. Entries are keyed by label_cache_key, so a change to the
+    preference text, the standardised topic list, the model or the prompt version is a miss.
+    Values are (positive topic names, negative topic names).
+    """
+
+    def __init__(self, topics, model_name, prompt_version, lru=memory_cache):
+        self.topics = list(topics)
+        self.model_name = model_name
+        self.prompt_version = prompt_version
+        self.lru = lru
+
+    def key(self, text):
+        return label_cache_key(text, self.topics, self.model_name, self.prompt_version)
+
+    def get_many(self, keys):
+        """Returns {key: (positive, negative)} for the cached keys, with a single query for LRU misses."""
+        found = {}
+        missing = []
+        for key in set(keys):
+            value = self.lru.get(key) if self.lru is not None else None
+            if value is None:
+                missing.append(key)
+            else:
+                found[key] = value
+        if missing:
+            for entry in LabelCacheEntry.objects.filter(key__in=missing):
+                value = (entry.positive_topics, entry.negative_topics)
+                found[entry.key] = value
+                if self.lru is not None:
+                    self.lru.put(entry.key, value)
+        return found
+
+    def set_many(self, labels):
+        """Stores {key: (positive, negative)}; keys that are already cached are left untouched."""
+        LabelCacheEntry.objects.bulk_create(
+            [
+                LabelCacheEntry(
+                    key=key,
+                    model_name=self.model_name,
+                    prompt_version=self.prompt_version,
+                    positive_topics=list(positive),
+                    negative_topics=list(negative),
+                )
+                for key, (positive, negative) in labels.items()
+            ],
+            ignore_conflicts=True,
+        )
+        if self.lru is not None:
+            for key, (positive, negative) in labels.items():
+                self.lru.put(key, (list(positive), list(negative)))
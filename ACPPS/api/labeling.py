@@ -0,0 +1,153 @@
+# api/labeling.py
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Defaults sized for gemini-2.0-flash quotas; the labeling task can override them.
+DEFAULT_MAX_CONCURRENT_BATCHES = 4
+DEFAULT_REQUESTS_PER_MINUTE = 15
+DEFAULT_TOKENS_PER_MINUTE = 1_000_000
+DEFAULT_RETRY_LIMIT = 3
+DEFAULT_BASE_DELAY_SECONDS = 2.0
+DEFAULT_MAX_DELAY_SECONDS = 60.0
+
+# Rough prompt size estimate used for the tokens-per-minute budget.
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text):
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+class RateLimiter:
+    """
+    Token-bucket limiter for requests per minute and tokens per minute.
+    Each bucket holds up to one minute of budget and refills continuously; acquire() blocks
+    until both buckets can cover the request. A limit of None disables that bucket.
+    Thread-safe, so one limiter can be shared by all workers of a LabelingEngine.
+    """
+
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None, clock=time.monotonic, sleep=time.sleep):
+        self.capacities = {'requests': requests_per_minute, 'tokens': tokens_per_minute}
+        self.levels = {name: capacity for name, capacity in self.capacities.items() if capacity}
+        self.clock = clock
+        self.sleep = sleep
+        self.updated_at = clock()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = self.clock()
+        elapsed = now - self.updated_at
+        self.updated_at = now
+        for name in self.levels:
+            capacity = self.capacities[name]
+            self.levels[name] = min(capacity, self.levels[name] + elapsed * capacity / 60.0)
+
+    def acquire(self, tokens=0):
+        """Blocks until one request costing `tokens` fits in the budget, then consumes it."""
+        cost = {'requests': 1, 'tokens': tokens}
+        while True:
+            with self.lock:
+                self._refill()
+                # A single request larger than a bucket would never fit, so it only waits for a full bucket.
+                needed = {name: min(cost[name], self.capacities[name]) for name in self.levels}
+                wait = max(
+                    [(needed[name] - self.levels[name]) * 60.0 / self.capacities[name] for name in self.levels],
+                    default=0.0,
+                )
+                if wait <= 0:
+                    for name in self.levels:
+                        self.levels[name] -= needed[name]
+                    return
+            self.sleep(wait)
+
+
+def backoff_delay(attempt, base_delay, max_delay, rng=random):
+    """Exponential backoff with full jitter: a random delay in [0, min(max_delay, base_delay * 2**attempt)]."""
+    return rng.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+
+
+def parse_batch_response(response):
+    """
+    Extracts the JSON array of labels from a Gemini response.
+    Raises ValueError (json.JSONDecodeError included) when the response is blocked, empty or malformed.
+    """
+    if not response.parts:
+        if response.prompt_feedback and response.prompt_feedback.block_reason:
+            raise ValueError(f"Prompt was blocked. Reason: {response.prompt_feedback.block_reason}")
+        raise ValueError("Gemini response has no parts.")
+
+    # Gemini API can sometimes wrap JSON in markdown backticks
+    output = response.text.strip().removeprefix("```json").removesuffix("```").strip()
+    if not (output.startswith('[') and output.endswith(']')):
+        json_start_index = output.find('[')
+        json_end_index = output.rfind(']')
+        if json_start_index == -1 or json_end_index <= json_start_index:
+            raise ValueError("Could not reliably extract JSON array from Gemini response for this batch.")
+        output = output[json_start_index:json_end_index + 1]
+
+    results = json.loads(output)
+    if not isinstance(results, list):
+        raise ValueError("Gemini's output for batch was not a JSON list as expected.")
+    return results
+
+
+class LabelingEngine:
+    """
+    Sends labeling prompts to a Gemini model with up to max_concurrent_batches requests in flight.
+    Every request first takes its share of the shared RateLimiter (one request plus the estimated
+    prompt tokens); failed or malformed responses are retried with exponential backoff and jitter.
+
+    The model only needs a generate_content(prompt, generation_config=None) method returning an
+    object with .parts, .text and .prompt_feedback, so a local stub can stand in for Gemini in tests.
+    """
+
+    def __init__(self, model, max_concurrent_batches=DEFAULT_MAX_CONCURRENT_BATCHES,
+                 requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE, tokens_per_minute=DEFAULT_TOKENS_PER_MINUTE,
+                 retry_limit=DEFAULT_RETRY_LIMIT, base_delay=DEFAULT_BASE_DELAY_SECONDS,
+                 max_delay=DEFAULT_MAX_DELAY_SECONDS, generation_config=None, limiter=None, sleep=time.sleep, rng=None):
+        self.model = model
+        self.max_concurrent_batches = max(1, max_concurrent_batches)
+        self.limiter = limiter or RateLimiter(requests_per_minute, tokens_per_minute, sleep=sleep)
+        self.retry_limit = retry_limit
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.generation_config = generation_config
+        self.sleep = sleep
+        self.rng = rng or random.Random()
+
+    def label_batch(self, batch_number, prompt):
+        """Labels one batch. Returns the parsed list of results, or None once all retries failed."""
+        for attempt in range(self.retry_limit):
+            try:
+                self.limiter.acquire(estimate_tokens(prompt))
+                response = self.model.generate_content(prompt, generation_config=self.generation_config)
+                results = parse_batch_response(response)
+                print(f"Successfully processed batch {batch_number}. Received {len(results)} results.")
+                return results
+            except Exception as e:
+                print(f"Error labeling batch {batch_number} (attempt {attempt + 1}/{self.retry_limit}): {e}")
+                if attempt < self.retry_limit - 1:
+                    self.sleep(backoff_delay(attempt, self.base_delay, self.max_delay, self.rng))
+        print(f"Failed to process batch {batch_number} after {self.retry_limit} attempts. Skipping this batch.")
+        return None
+
+    def run(self, prompts, on_batch_done=None):
+        """
+        Labels every prompt concurrently and returns the results in prompt order (None for failed batches).
+        on_batch_done(index, results) is called from the calling thread as each batch finishes.
+        """
+        results = [None] * len(prompts)
+        with ThreadPoolExecutor(max_workers=self.max_concurrent_batches) as executor:
+            futures = {
+                executor.submit(self.label_batch, index + 1, prompt): index
+                for index, prompt in enumerate(prompts)
+            }
+            for future in as_completed(futures):
+                index = futures[future]
+                results[index] = future.result()
+                if on_batch_done:
+                    on_batch_done(index, results[index])
+        return results
@@ -0,0 +1,127 @@
+# api/matching_data.py
+import hashlib
+import json
+from collections import defaultdict
+
+import pandas as pd
+
+from academics.models import ProgrammePreferenceGroup
+from users.models import StudentProfile, SupervisorProfile
+from .label_cache import LRUCache
+from .models import StandardisedTopic
+from .scoring import ScoreEngine
+
+# Score engines of recently matched data versions. A handful covers re-runs of the current
+# semester with other weightages, its incremental variant and a grid search.
+DEFAULT_ENGINE_CACHE_SIZE = 4
+engine_cache = LRUCache(DEFAULT_ENGINE_CACHE_SIZE)
+
+
+def group_pairs(pairs):
+    """Groups (owner id, value id) rows into {owner id: [value ids]}."""
+    grouped = defaultdict(list)
+    for owner_id, value_id in pairs:
+        grouped[owner_id].append(value_id)
+    return grouped
+
+
+def matching_data_version(**engine_inputs):
+    """
+    sha256 over everything a ScoreEngine is built from: row order, programme and topic ids, and topic names.
+    Any change to the students, supervisors, their preferences or the topic list gives a new version.
+    """
+    payload = json.dumps(engine_inputs, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def load_matching_data(students, supervisors, cache=engine_cache):
+    """
+    Loads the matching model's input for the given querysets in a constant number of queries,
+    however many students and supervisors there are:
+
+    1. the students' scalar fields (student id, programme id, current supervisor id)
+    2. the supervisors' scalar fields, including the remaining_capacity and current_student_count
+       annotations of the supervisors queryset
+    3. the programmes of every referenced ProgrammePreferenceGroup
+    4-6. the positive preference, negative preference and expertise through-tables
+    7. the names of the referenced topics
+
+    Topics and programmes stay integer ids and the ScoreEngine is built from them directly.
+    Engines are cached by matching_data_version, so loading unchanged data again (e.g. matching with
+    another weightage) reuses the first-choice, second-choice and M_Sij matrices; pass cache=None to skip.
+    Returns (students_df, supervisors_df, engine). The DataFrames hold the scalar columns used by
+    solve_matching and solve_incremental_matching. 'student_pk' is the StudentProfile pk, which
+    save_assignments writes by, and 'current_supervisor' is the email of the student's supervisor
+    if that supervisor is in the model, otherwise None.
+    """
+    supervisor_rows = list(supervisors.values_list(
+        'pk', 'user__email', 'user__full_name', 'preferred_programmes_first_choice_id',
+        'preferred_programmes_second_choice_id', 'remaining_capacity', 'current_student_count',
+    ))
+    supervisor_pks = [row[0] for row in supervisor_rows]
+    supervisor_emails = {row[0]: row[1] for row in supervisor_rows}
+
+    student_rows = list(students.values_list('pk', 'student_id', 'programme_id', 'supervisor_id'))
+    student_pks = students.values('pk') # Reused as a subquery so large semesters never hit the parameter limit
+
+    group_ids = {group_id for row in supervisor_rows for group_id in row[3:5] if group_id is not None}
+    group_programmes = group_pairs(
+        ProgrammePreferenceGroup.programme.through.objects.filter(
+            programmepreferencegroup_id__in=group_ids
+        ).values_list('programmepreferencegroup_id', 'programme_id')
+    )
+    positive = group_pairs(
+        StudentProfile.positive_preferences.through.objects.filter(
+            studentprofile_id__in=student_pks
+        ).values_list('studentprofile_id', 'standardisedtopic_id')
+    )
+    negative = group_pairs(
+        StudentProfile.negative_preferences.through.objects.filter(
+            studentprofile_id__in=student_pks
+        ).values_list('studentprofile_id', 'standardisedtopic_id')
+    )
+    expertise = group_pairs(
+        SupervisorProfile.standardised_expertise.through.objects.filter(
+            supervisorprofile_id__in=supervisor_pks
+        ).values_list('supervisorprofile_id', 'standardisedtopic_id')
+    )
+    topic_ids = {
+        topic_id
+        for grouped in (positive, negative, expertise)
+        for ids in grouped.values()
+        for topic_id in ids
+    }
+    topic_names = dict(StandardisedTopic.objects.filter(id__in=topic_ids).values_list('id', 'name'))
+
+    engine_inputs = dict(
+        student_programmes=[row[2] for row in student_rows],
+        student_positive=[positive[row[0]] for row in student_rows],
+        student_negative=[negative[row[0]] for row in student_rows],
+        # A missing group and a group without programmes both mean "No Preference".
+        supervisor_first_choice=[group_programmes[row[3]] for row in supervisor_rows],
+        supervisor_second_choice=[group_programmes[row[4]] for row in supervisor_rows],
+        supervisor_expertise=[expertise[row[0]] for row in supervisor_rows],
+        topic_names=topic_names,
+    )
+    version = matching_data_version(**engine_inputs)
+    engine = cache.get(version) if cache is not None else None
+    if engine is None:
+        engine = ScoreEngine(**engine_inputs)
+        if cache is not None:
+            cache.put(version, engine)
+
+    students_df = pd.DataFrame(
+        [
+            {"student_pk": pk, "student_id": student_id, "current_supervisor": supervisor_emails.get(supervisor_pk)}
+            for pk, student_id, _, supervisor_pk in student_rows
+        ],
+        columns=["student_pk", "student_id", "current_supervisor"],
+    )
+    supervisors_df = pd.DataFrame(
+        [
+            {"supervisor_id": email, "name": full_name, "capacity": capacity, "student_count": student_count}
+            for _, email, full_name, _, _, capacity, student_count in supervisor_rows
+        ],
+        columns=["supervisor_id", "name", "capacity", "student_count"],
+    )
+    return students_df, supervisors_df, engine
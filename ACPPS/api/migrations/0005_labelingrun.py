@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academics', '0005_alter_semester_options'),
+        ('api', '0004_labelcacheentry'),
+        ('users', '0016_studentprofile_labeled_fingerprint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LabelingRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('topic_version', models.CharField(max_length=64)),
+                ('status', models.CharField(choices=[('running', 'Running'), ('incomplete', 'Incomplete'), ('completed', 'Completed')], default='running', max_length=10)),
+                ('total_batches', models.PositiveIntegerField(default=0)),
+                ('completed_batches', models.PositiveIntegerField(default=0)),
+                ('failed_batches', models.PositiveIntegerField(default=0)),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('semester', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='labeling_runs', to='academics.semester')),
+            ],
+        ),
+    ]
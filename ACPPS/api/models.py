@@ -19,3 +19,38 @@ class StandardisedTopic(models.Model):
 
     def __str__(self):
         return self.name
+
+class LabelCacheEntry(models.Model):
+    """Gemini labels for one preference text, keyed by api.label_cache.label_cache_key."""
+    key = models.CharField(max_length=64, unique=True)
+    model_name = models.CharField(max_length=100)
+    prompt_version = models.CharField(max_length=20)
+    positive_topics = models.JSONField(default=list)
+    negative_topics = models.JSONField(default=list)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.key[:12]} ({self.model_name}, prompt v{self.prompt_version})"
+
+class LabelingRun(models.Model):
+    """Batch progress of one labeling task, so a re-issued task can resume an interrupted run."""
+    RUNNING = 'running'
+    INCOMPLETE = 'incomplete'
+    COMPLETED = 'completed'
+    STATUS_CHOICES = (
+        (RUNNING, 'Running'),
+        (INCOMPLETE, 'Incomplete'),
+        (COMPLETED, 'Completed'),
+    )
+
+    semester = models.ForeignKey('academics.Semester', on_delete=models.CASCADE, related_name='labeling_runs')
+    topic_version = models.CharField(max_length=64)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=RUNNING)
+    total_batches = models.PositiveIntegerField(default=0)
+    completed_batches = models.PositiveIntegerField(default=0)
+    failed_batches = models.PositiveIntegerField(default=0)
+    started_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Labeling {self.semester} - {self.completed_batches}/{self.total_batches} batches ({self.get_status_display()})"
@@ -0,0 +1,148 @@
+# api/scoring.py
+import numpy as np
+
+
+class _Encoder:
+    """Assigns consecutive integer ids to hashable labels (topic or programme names)."""
+
+    def __init__(self):
+        self.index = {}
+        self.labels = []
+
+    def encode(self, label):
+        if label not in self.index:
+            self.index[label] = len(self.labels)
+            self.labels.append(label)
+        return self.index[label]
+
+    def encode_all(self, labels):
+        return [self.encode(label) for label in labels]
+
+    def __len__(self):
+        return len(self.labels)
+
+
+def _incidence_matrix(rows, width, dtype=np.float64):
+    """
+    Builds a (len(rows) x width) matrix where cell [i, k] counts how often id k appears in rows[i].
+    Counting (instead of flagging) keeps duplicated preferences weighted exactly as the
+    original list-membership loop did.
+    """
+    matrix = np.zeros((len(rows), width), dtype=dtype)
+    row_idx = [i for i, ids in enumerate(rows) for _ in ids]
+    col_idx = [k for ids in rows for k in ids]
+    if row_idx:
+        np.add.at(matrix, (row_idx, col_idx), 1)
+    return matrix
+
+
+class ScoreEngine:
+    """
+    Computes the (students x supervisors) pair scores used by the matching model with
+    matrix products instead of a Python loop over every pair.
+
+    Topics and programmes are encoded as integer ids and turned into incidence matrices:
+    - P (students x topics): positive preferences
+    - N (students x topics): negative preferences
+    - E (supervisors x topics): supervisor expertise
+    The M_Sij component then follows from P @ E.T and N @ E.T, and the programme (M_r)
+    component from the student-programme and supervisor-preference incidences.
+
+    Topics and programmes may be given as names or as database ids; with ids, topic_names
+    ({topic id: name}) provides the names reported by matching_topics and conflicting_topics.
+    """
+
+    def __init__(self, student_programmes, student_positive, student_negative,
+                 supervisor_first_choice, supervisor_second_choice, supervisor_expertise, topic_names=None):
+        topics = _Encoder()
+        programmes = _Encoder()
+
+        self.student_positive = [topics.encode_all(prefs) for prefs in student_positive]
+        self.student_negative = [topics.encode_all(prefs) for prefs in student_negative]
+        supervisor_topics = [topics.encode_all(expertise) for expertise in supervisor_expertise]
+
+        student_programme_ids = [[programmes.encode(p)] for p in student_programmes]
+        first_choice_ids = [programmes.encode_all(choice) for choice in supervisor_first_choice]
+        second_choice_ids = [programmes.encode_all(choice) for choice in supervisor_second_choice]
+
+        self.topic_labels = [topic_names[t] for t in topics.labels] if topic_names is not None else topics.labels
+        self.num_students = len(student_programmes)
+        self.num_supervisors = len(supervisor_expertise)
+
+        # --- Topic incidence matrices ---
+        positive = _incidence_matrix(self.student_positive, len(topics))
+        negative = _incidence_matrix(self.student_negative, len(topics))
+        self.expertise = _incidence_matrix(supervisor_topics, len(topics), dtype=bool)
+
+        # --- Student's Topic Preference Score (implements M_Sij) ---
+        expertise = self.expertise.astype(np.float64)
+        num_pos_prefs = positive.sum(axis=1, keepdims=True)
+        num_neg_prefs = negative.sum(axis=1, keepdims=True)
+        num_pos_matches = positive @ expertise.T
+        num_neg_violations = negative @ expertise.T
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # Positive Match Ratio = |P_i ∩ E_j| / |P_i| (1.0 when the student has no positive preferences)
+            positive_match_ratio = np.where(num_pos_prefs > 0, num_pos_matches / num_pos_prefs, 1.0)
+            # Negative Avoidance Success Rate = 1 - (|N_i ∩ E_j| / |N_i|)
+            violation_rate = np.where(num_neg_prefs > 0, num_neg_violations / num_neg_prefs, 0.0)
+        negative_avoidance_rate = 1.0 - violation_rate
+
+        # The M_Sij score is the average of the two components above.
+        self.m_sij = (positive_match_ratio + negative_avoidance_rate) / 2.0
+
+        # --- Supervisor's Program Preference Score (implements M_r) ---
+        student_programme = _incidence_matrix(student_programme_ids, len(programmes))
+        first_choice = _incidence_matrix(first_choice_ids, len(programmes))
+        second_choice = _incidence_matrix(second_choice_ids, len(programmes))
+
+        # Treat "No Preference" (an empty choice list) as a universal match for that choice level.
+        no_first_preference = first_choice.sum(axis=1) == 0
+        no_second_preference = second_choice.sum(axis=1) == 0
+        self.first_choice = ((student_programme @ first_choice.T) > 0) | no_first_preference[np.newaxis, :]
+        self.second_choice = ~self.first_choice & (
+            ((student_programme @ second_choice.T) > 0) | no_second_preference[np.newaxis, :]
+        )
+
+        # Pair scores are linear in the weights, so every score matrix is one weighted sum of these layers.
+        self.components = np.stack([self.first_choice, self.second_choice, self.m_sij]).astype(np.float64)
+
+    @classmethod
+    def from_dataframes(cls, students_df, supervisors_df):
+        """Builds the engine from the students/supervisors DataFrames used by optimal_matching."""
+        def column(df, name):
+            return [value if isinstance(value, list) else [] for value in df[name]] if name in df else [[] for _ in range(len(df))]
+
+        return cls(
+            student_programmes=list(students_df['programme']),
+            student_positive=column(students_df, 'positive_preferences'),
+            student_negative=column(students_df, 'negative_preferences'),
+            supervisor_first_choice=column(supervisors_df, 'programme_first_choice'),
+            supervisor_second_choice=column(supervisors_df, 'programme_second_choice'),
+            supervisor_expertise=column(supervisors_df, 'expertise'),
+        )
+
+    @property
+    def programme_match(self):
+        """(students x supervisors) matrix: 1 for first choice, 2 for second choice, 0 for other."""
+        return np.where(self.first_choice, 1, np.where(self.second_choice, 2, 0))
+
+    def score_matrix(self, score_weights):
+        """
+        Final combined score for every pair (s_i, r_j):
+        w_first * [first choice] + w_second * [second choice] + w_topic * M_Sij
+        """
+        weights = np.array([
+            score_weights.get('prog_first_choice', 10.0),
+            score_weights.get('prog_second_choice', 5.0),
+            score_weights.get('student_topic_satisfaction', 50.0),
+        ], dtype=np.float64)
+        return np.tensordot(weights, self.components, axes=1)
+
+    def matching_topics(self, i, j):
+        """Student i's positive preferences that supervisor j has expertise in."""
+        return [self.topic_labels[t] for t in self.student_positive[i] if self.expertise[j, t]]
+
+    def conflicting_topics(self, i, j):
+        """Student i's negative preferences that supervisor j has expertise in."""
+        return [self.topic_labels[t] for t in self.student_negative[i] if self.expertise[j, t]]
@@ -0,0 +1,381 @@
+# api/solvers.py
+import os
+import re
+import tempfile
+import time
+
+import networkx as nx
+import numpy as np
+from pulp import LpProblem, LpVariable, LpMinimize, lpSum, LpBinary, LpStatus, PULP_CBC_CMD
+
+# Pair scores are floats, but network simplex is only exact on integer costs,
+# so flow costs are scaled and rounded to this resolution.
+FLOW_COST_SCALE = 10**6
+
+# Relative gap below which an incumbent counts as proven optimal (CBC logs its bound to 3 decimals).
+OPTIMALITY_TOLERANCE = 1e-6
+
+
+def target_load(capacities, existing_loads, num_students):
+    """Average total load (existing + new) per supervisor that the balancing term aims for."""
+    num_supervisors = len(capacities)
+    return (sum(existing_loads) + num_students) / num_supervisors if num_supervisors > 0 else 0
+
+
+def count_reassignments(assignment, current_assignment):
+    """Number of students that already had a supervisor and are moved to a different one."""
+    if current_assignment is None:
+        return 0
+    return sum(1 for j, current in zip(assignment, current_assignment) if current is not None and j != current)
+
+
+def evaluate_objective(pair_scores, assignment, existing_loads, balancing_penalty_weight, target,
+                       current_assignment=None, churn_penalty=0):
+    """
+    Objective of the matching model for a complete assignment:
+    sum of pair scores minus the weighted absolute deviation of every supervisor from the target load,
+    minus churn_penalty for every student moved away from its current supervisor.
+    """
+    loads = np.asarray(existing_loads, dtype=np.float64).copy()
+    satisfaction_score = 0.0
+    for i, j in enumerate(assignment):
+        satisfaction_score += pair_scores[i, j]
+        loads[j] += 1
+    workload_penalty = balancing_penalty_weight * np.abs(loads - target).sum()
+    churn = churn_penalty * count_reassignments(assignment, current_assignment)
+    return float(satisfaction_score - workload_penalty - churn)
+
+
+def optimality_gap(objective, bound):
+    """Relative gap between the incumbent objective and the proven bound (0.0 means proven optimal)."""
+    if objective is None or bound is None:
+        return None
+    return abs(bound - objective) / max(abs(bound), 1e-9)
+
+
+def _read_cbc_log(log_path):
+    """
+    Extracts the result line and the best proven bound from a CBC log.
+    CBC only prints a bound line ('Lower bound' when minimising) when it stops before proving optimality.
+    """
+    try:
+        with open(log_path) as log_file:
+            log_text = log_file.read()
+    except OSError:
+        return None, None
+    result_line = re.search(r"^Result - (.+)$", log_text, re.MULTILINE)
+    bound_line = re.search(r"^(?:Upper|Lower) bound:\s+(-?[\d.eE+-]+)", log_text, re.MULTILINE)
+    return (
+        result_line.group(1).strip() if result_line else None,
+        float(bound_line.group(1)) if bound_line else None,
+    )
+
+
+def top_k_mask(pair_scores, top_k):
+    """Boolean mask flagging each row's top_k columns by score."""
+    mask = np.zeros(pair_scores.shape, dtype=bool)
+    if pair_scores.size == 0:
+        return mask
+    k = min(top_k, pair_scores.shape[1])
+    top_columns = np.argpartition(-pair_scores, k - 1, axis=1)[:, :k]
+    np.put_along_axis(mask, top_columns, True, axis=1)
+    return mask
+
+
+def greedy_assignment(pair_scores, capacities):
+    """
+    Gives every student, in row order, its best-scoring supervisor that still has room.
+    Returns one supervisor column per row, or None for rows left over once capacity runs out.
+    """
+    remaining = np.asarray(capacities, dtype=np.int64).copy()
+    assignment = [None] * pair_scores.shape[0]
+    for i in range(pair_scores.shape[0]):
+        open_scores = np.where(remaining > 0, pair_scores[i], -np.inf)
+        j = int(np.argmax(open_scores)) if open_scores.size else 0
+        if open_scores.size == 0 or remaining[j] <= 0: # Total capacity is exhausted
+            break
+        assignment[i] = j
+        remaining[j] -= 1
+    return assignment
+
+
+def select_candidates(pair_scores, capacities, top_k):
+    """
+    Sparse candidate generation: keeps each student's top_k supervisors by pair score,
+    plus the edges of a greedy capacity-respecting assignment so that the pruned model
+    stays feasible whenever the dense one is. Returns a boolean (students x supervisors) mask.
+    """
+    has_capacity = np.asarray(capacities) > 0
+    masked_scores = np.where(has_capacity[np.newaxis, :], pair_scores, -np.inf)
+    candidates = top_k_mask(masked_scores, top_k) & has_capacity[np.newaxis, :]
+
+    # Feasibility edges: give every student its best supervisor that still has room.
+    for i, j in enumerate(greedy_assignment(pair_scores, capacities)):
+        if j is not None:
+            candidates[i, j] = True
+    return candidates
+
+
+def greedy_start(pair_scores, capacities, candidates):
+    """
+    The greedy assignment restricted to the candidate pairs, usable as a MIP start,
+    or None when it leaves a student without a candidate supervisor.
+    """
+    assignment = greedy_assignment(np.where(candidates, pair_scores, -np.inf), capacities)
+    if any(j is None or not candidates[i, j] for i, j in enumerate(assignment)):
+        return None
+    return assignment
+
+
+def solve_with_cbc(pair_scores, capacities, existing_loads, balancing_penalty_weight, candidates=None,
+                   time_limit=None, mip_gap=None, threads=None,
+                   current_assignment=None, churn_penalty=0, max_reassignments=None, initial_assignment=None):
+    """
+    Solves the matching as a binary MILP with PuLP and the bundled CBC solver.
+    When a candidates mask is given, only those (student, supervisor) pairs get a decision variable.
+
+    time_limit (seconds), mip_gap (relative) and threads are passed to CBC. If the limit is hit after
+    an incumbent was found, that incumbent is returned with status 'Feasible' together with
+    the best proven bound and the resulting optimality gap.
+
+    For incremental re-matching, current_assignment holds each student's current supervisor column
+    (None for unassigned students). Moving a student costs churn_penalty, at most max_reassignments
+    students may move, and initial_assignment is handed to CBC as a MIP start.
+    Without one, a time-limited solve is seeded with greedy_start so that CBC always has an incumbent to return.
+    """
+    num_students, num_supervisors = pair_scores.shape
+    students = range(num_students)
+    supervisors = range(num_supervisors)
+    if candidates is None:
+        candidates = np.ones((num_students, num_supervisors), dtype=bool)
+    current_pairs = [(i, j) for i, j in enumerate(current_assignment or []) if j is not None]
+    if current_pairs:
+        candidates = candidates.copy()
+        for i, j in current_pairs: # Staying put must always be an option
+            candidates[i, j] = True
+    pairs = [(int(i), int(j)) for i, j in zip(*np.nonzero(candidates))]
+    student_pairs = {i: [] for i in students}
+    supervisor_pairs = {j: [] for j in supervisors}
+    for i, j in pairs:
+        student_pairs[i].append((i, j))
+        supervisor_pairs[j].append((i, j))
+
+    # --- 2. Define the Optimization Problem ---
+    # The model is stated as a minimisation of the negated objective: CBC 2.10 mis-signs the cost of a
+    # MIP start when maximising and then prunes better solutions against it.
+    problem = LpProblem("Optimal_Student_Supervisor_Matching", LpMinimize)
+
+    # Decision Variables: x_ij = 1 if student i is assigned to supervisor j
+    decision_vars = LpVariable.dicts("x", pairs, 0, 1, LpBinary)
+
+    # --- 3. Workload Balancing (Soft Constraint) ---
+    target = target_load(capacities, existing_loads, num_students)
+    print(f"\nTarget total load per supervisor (existing + new): {target:.2f}")
+
+    # Variables to measure deviation from the target load (linearizes the penalty)
+    dev_over = LpVariable.dicts("DeviationOver", supervisors, lowBound=0)
+    dev_under = LpVariable.dicts("DeviationUnder", supervisors, lowBound=0)
+
+    for j in supervisors:
+        newly_assigned_load = lpSum(decision_vars[key] for key in supervisor_pairs[j])
+        problem += (existing_loads[j] + newly_assigned_load) - target == dev_over[j] - dev_under[j], f"Define_Deviation_{j}"
+
+    # --- 4. Objective Function ---
+    # Maximize the sum of scores for all assignments, minus a penalty for workload imbalance.
+    satisfaction_score = lpSum(var * pair_scores[key] for key, var in decision_vars.items())
+    workload_penalty = balancing_penalty_weight * lpSum(dev_over[j] + dev_under[j] for j in supervisors)
+    # Churn is rewarded as a bonus for every student kept with its current supervisor, which equals
+    # penalising each move up to the constant churn_penalty * len(current_pairs).
+    stay_bonus = churn_penalty * lpSum(decision_vars[key] for key in current_pairs)
+
+    problem += -(satisfaction_score - workload_penalty + stay_bonus), "Maximize_Satisfaction_and_Balance"
+
+    # --- 5. Hard Constraints ---
+    # Constraint 1: Each student must be assigned to exactly ONE supervisor.
+    for i in students:
+        problem += lpSum(decision_vars[key] for key in student_pairs[i]) == 1, f"Assign_Student_{i}"
+
+    # Constraint 2: Each supervisor cannot exceed their maximum capacity.
+    # The number of *newly assigned* students cannot exceed the remaining capacity.
+    for j in supervisors:
+        problem += lpSum(decision_vars[key] for key in supervisor_pairs[j]) <= capacities[j], f"Capacity_Supervisor_{j}"
+
+    # Constraint 3 (incremental re-matching): bound the number of students moved.
+    if current_pairs and max_reassignments is not None:
+        problem += lpSum(decision_vars[key] for key in current_pairs) >= len(current_pairs) - max_reassignments, "Max_Reassignments"
+
+    # MIP start: seed CBC with a known feasible allocation (e.g. the current one).
+    # A time limit can run out before CBC finds its own first incumbent, so the greedy one is used then.
+    if initial_assignment is None and time_limit is not None and max_reassignments is None:
+        initial_assignment = greedy_start(pair_scores, capacities, candidates)
+    if initial_assignment is not None:
+        for (i, j), var in decision_vars.items():
+            var.setInitialValue(1 if initial_assignment[i] == j else 0)
+
+    with tempfile.TemporaryDirectory() as log_dir:
+        log_path = os.path.join(log_dir, 'cbc.log')
+        problem.solve(PULP_CBC_CMD(
+            msg=False,
+            timeLimit=time_limit,
+            gapRel=mip_gap,
+            threads=threads,
+            logPath=log_path,
+            warmStart=initial_assignment is not None,
+            # CBC 2.10 preprocessing can cut off the optimum after a MIP start, so it is skipped then.
+            options=['preprocess off'] if initial_assignment is not None else [],
+        ))
+        cbc_result, bound = _read_cbc_log(log_path)
+    if bound is not None: # Undo the negation of the objective
+        bound = -bound
+    print(f"CBC finished: {cbc_result or LpStatus[problem.status]}")
+
+    # PuLP reports status 1 both for proven optima and for incumbents found before a time or gap limit,
+    # so the incumbent is compared against the bound CBC proved to tell them apart.
+    if problem.status != 1: # No solution was found
+        return {'status': LpStatus[problem.status], 'assignment': None, 'objective': None, 'bound': bound, 'gap': None}
+
+    assignment = [None] * num_students
+    for (i, j), var in decision_vars.items():
+        if var.value() > 0.5: # If assignment was made
+            assignment[i] = j
+    objective = evaluate_objective(
+        pair_scores, assignment, existing_loads, balancing_penalty_weight, target,
+        current_assignment=current_assignment, churn_penalty=churn_penalty
+    )
+    if bound is None: # CBC only logs a bound when it stopped before closing the gap
+        bound = objective
+    else: # Express the bound without the constant part of the stay bonus, like the objective
+        bound -= churn_penalty * len(current_pairs)
+    gap = optimality_gap(objective, bound)
+    return {
+        'status': 'Optimal' if gap <= OPTIMALITY_TOLERANCE else 'Feasible',
+        'assignment': assignment,
+        'objective': objective,
+        'bound': bound,
+        'gap': gap,
+    }
+
+
+def _load_deviation_segments(existing_load, capacity, target, balancing_penalty_weight):
+    """
+    Splits the convex penalty w * |existing + n - target| for n = 0..capacity into
+    (number_of_units, marginal_cost) segments with non-decreasing marginal costs.
+    """
+    segments = []
+    for k in range(1, capacity + 1):
+        marginal_cost = balancing_penalty_weight * (
+            abs(existing_load + k - target) - abs(existing_load + k - 1 - target)
+        )
+        if segments and np.isclose(segments[-1][1], marginal_cost):
+            segments[-1][0] += 1
+        else:
+            segments.append([1, marginal_cost])
+    return segments
+
+
+def solve_with_min_cost_flow(pair_scores, capacities, existing_loads, balancing_penalty_weight, candidates=None,
+                             current_assignment=None, churn_penalty=0, max_reassignments=None, **solver_options):
+    """
+    Solves the same model as solve_with_cbc exactly as a min-cost flow.
+
+    Assign-exactly-one and capacity form a transportation problem, and the load-deviation
+    penalty is convex and piecewise linear in the number of new students per supervisor,
+    so it is modelled with parallel supervisor -> sink arcs of increasing marginal cost:
+
+        student (supply 1) --[-score]--> supervisor --[penalty segments]--> sink (demand S)
+
+    When a candidates mask is given, only those student -> supervisor arcs are added.
+    Network simplex always proves optimality, so time_limit/mip_gap/threads and MIP start options are ignored.
+    The churn penalty becomes a cheaper arc to each student's current supervisor; a hard
+    max_reassignments bound is not a flow constraint and needs the CBC backend.
+    """
+    if balancing_penalty_weight < 0:
+        raise ValueError("The min-cost flow solver requires a non-negative balancing penalty weight.")
+    if max_reassignments is not None:
+        raise ValueError("The min-cost flow solver does not support 'max_reassignments'. Use the 'cbc' solver instead.")
+
+    num_students, num_supervisors = pair_scores.shape
+    target = target_load(capacities, existing_loads, num_students)
+    print(f"\nTarget total load per supervisor (existing + new): {target:.2f}")
+
+    if sum(capacities) < num_students:
+        return {'status': 'Infeasible', 'assignment': None, 'objective': None, 'bound': None, 'gap': None}
+
+    graph = nx.MultiDiGraph()
+    graph.add_node('sink', demand=num_students)
+    for i in range(num_students):
+        graph.add_node(('student', i), demand=-1)
+    for j in range(num_supervisors):
+        graph.add_node(('supervisor', j), demand=0)
+        segments = _load_deviation_segments(existing_loads[j], int(capacities[j]), target, balancing_penalty_weight)
+        for units, marginal_cost in segments:
+            graph.add_edge(('supervisor', j), 'sink', capacity=units, weight=round(marginal_cost * FLOW_COST_SCALE))
+
+    arc_scores = pair_scores.copy()
+    if candidates is None:
+        candidates = np.ones((num_students, num_supervisors), dtype=bool)
+    candidates = candidates & (np.asarray(capacities) > 0)[np.newaxis, :]
+    for i, j in enumerate(current_assignment or []):
+        if j is not None: # Staying put is always an option, and avoids the churn penalty
+            candidates[i, j] = capacities[j] > 0
+            arc_scores[i, j] += churn_penalty
+    scaled_costs = np.rint(-arc_scores * FLOW_COST_SCALE).astype(np.int64)
+    for i, j in zip(*np.nonzero(candidates)):
+        graph.add_edge(('student', int(i)), ('supervisor', int(j)), capacity=1, weight=int(scaled_costs[i, j]))
+
+    try:
+        _, flow = nx.network_simplex(graph)
+    except nx.NetworkXUnfeasible:
+        return {'status': 'Infeasible', 'assignment': None, 'objective': None, 'bound': None, 'gap': None}
+
+    assignment = [None] * num_students
+    for i in range(num_students):
+        for (_, j), arcs in flow[('student', i)].items():
+            if any(units > 0 for units in arcs.values()):
+                assignment[i] = j
+    objective = evaluate_objective(
+        pair_scores, assignment, existing_loads, balancing_penalty_weight, target,
+        current_assignment=current_assignment, churn_penalty=churn_penalty
+    )
+    return {'status': 'Optimal', 'assignment': assignment, 'objective': objective, 'bound': objective, 'gap': 0.0}
+
+
+SOLVERS = {
+    'cbc': solve_with_cbc,
+    'flow': solve_with_min_cost_flow,
+}
+
+
+def solve_assignment(pair_scores, capacities, existing_loads, balancing_penalty_weight, solver='cbc', candidate_k=None,
+                     candidates=None, **solver_options):
+    """
+    Dispatches the matching model to one of the registered SOLVERS backends.
+    Every backend returns a dict with 'status' ('Optimal', 'Feasible' when a limit stopped the
+    search early, or a failure status), 'assignment' (one supervisor column per student row,
+    or None), 'objective', the proven 'bound' and the relative optimality 'gap'.
+
+    With candidate_k set, the model is first built over the sparse candidate edges from
+    select_candidates (O(S*K) variables instead of O(S*V)); an explicit candidates mask can be
+    given instead. If the sparse model is infeasible, it falls back to the dense model, which only
+    gets what is left of the time_limit; any other status without an assignment is returned as is.
+
+    solver_options (time_limit, mip_gap, threads, and the incremental current_assignment,
+    churn_penalty, max_reassignments and initial_assignment) are forwarded to the backend.
+    """
+    if solver not in SOLVERS:
+        raise ValueError(f"Unknown solver '{solver}'. Choose one of: {', '.join(SOLVERS)}.")
+    solve = SOLVERS[solver]
+
+    if candidates is None and candidate_k and candidate_k < pair_scores.shape[1]:
+        candidates = select_candidates(pair_scores, capacities, candidate_k)
+    if candidates is not None:
+        print(f"Sparse model: {int(candidates.sum())} candidate pairs instead of {pair_scores.size}.")
+        started = time.monotonic()
+        result = solve(pair_scores, capacities, existing_loads, balancing_penalty_weight, candidates=candidates, **solver_options)
+        if result['assignment'] is not None or result['status'] != 'Infeasible':
+            return result
+        if solver_options.get('time_limit') is not None:
+            solver_options['time_limit'] = max(solver_options['time_limit'] - (time.monotonic() - started), 1)
+        print("Sparse model is infeasible. Falling back to the dense model.")
+
+    return solve(pair_scores, capacities, existing_loads, balancing_penalty_weight, **solver_options)
@@ -5,12 +5,20 @@ import json
 import os
 import re
 import math
-import time
 
-from .models import OriginalTopic, StandardisedTopic
+import numpy as np
+
+from .models import OriginalTopic, StandardisedTopic, LabelingRun
+from .labeling import LabelingEngine, DEFAULT_MAX_CONCURRENT_BATCHES, DEFAULT_REQUESTS_PER_MINUTE, DEFAULT_TOKENS_PER_MINUTE
+from .label_cache import LabelCache, text_fingerprint, topic_set_version
+from .scoring import ScoreEngine
+from .matching_data import load_matching_data
+from .tuning import run_grid_search, recommend
+from .solvers import solve_assignment, greedy_assignment, top_k_mask, count_reassignments
 from users.models import StudentProfile, SupervisorProfile, User
 from academics.models import Semester
-from django.db.models import Q, F, Count, Sum
+from django.db.models import Q, F, Count, Sum, Exists, OuterRef
+from django.db.models.functions import Greatest
 from django.db import transaction
 
 def get_standardisation_map_from_gemini(unique_terms_list, model, prompt=""):
@@ -82,6 +90,9 @@ def get_standardisation_map_from_gemini(unique_terms_list, model, prompt=""):
             print(f"Gemini API Error Details: {e.response}")
         return None
 
+# Bump whenever create_prompt_for_batch changes, so cached labels from the old prompt are not reused.
+LABEL_PROMPT_VERSION = "1"
+
 def create_prompt_for_batch(batch_sentences_list, all_standardized_topics):
     sentences_json_for_prompt = json.dumps(batch_sentences_list, indent=2)
     prompt = f"""
@@ -126,6 +137,87 @@ def create_prompt_for_batch(batch_sentences_list, all_standardized_topics):
         """
     return prompt
 
+def split_topic_names(raw_topics):
+    """
+    Get topic names as a list of strings, cleaning them up.
+    Handles both comma-separated strings and lists from the AI.
+    """
+    if isinstance(raw_topics, str):
+        return [t.strip() for t in raw_topics.split(',') if t.strip()]
+    return [t.strip() for t in raw_topics if t.strip()]
+
+def find_students_by_id(student_ids, queryset=None):
+    """
+    Looks up many students with one exact-match query on the indexed student_id. Returns
+    {student_id: [matching profiles]}; ids without a profile are absent, and a list longer than one
+    means the id is ambiguous (students on different email domains with the same prefix).
+    """
+    queryset = StudentProfile.objects.all() if queryset is None else queryset
+    students_by_id = {}
+    for student in queryset.filter(student_id__in=list(student_ids)):
+        students_by_id.setdefault(student.student_id, []).append(student)
+    return students_by_id
+
+def apply_labels(results, fingerprints, topic_version):
+    """
+    Writes labeling results ({"SentenceID", "Gemini_Positive_Topics", "Gemini_Negative_Topics"} dicts)
+    to the students' preferences and records the text fingerprint and topic version they came from.
+    Uses a constant number of queries: students and topics are resolved in bulk, and the preference
+    through-tables are rewritten with one delete and one bulk_create each.
+    Returns the number of students updated.
+    """
+    topic_ids = dict(StandardisedTopic.objects.values_list('name', 'id'))
+
+    labels = {}
+    for result in results:
+        sentence_id = result.get("SentenceID")
+        if not sentence_id:
+            print("Warning: Result missing SentenceID, skipping this entry.")
+            continue
+        labels[str(sentence_id)] = (
+            split_topic_names(result.get("Gemini_Positive_Topics", [])),
+            split_topic_names(result.get("Gemini_Negative_Topics", [])),
+        )
+    if not labels:
+        return 0
+
+    students_by_id = find_students_by_id(labels, StudentProfile.objects.only('pk', 'student_id'))
+    for sentence_id in labels:
+        if sentence_id not in students_by_id:
+            print(f"Warning: Student with ID '{sentence_id}' does not exist. Skipping.")
+        elif len(students_by_id[sentence_id]) > 1:
+            print(f"Warning: Multiple students found for ID prefix '{sentence_id}'. Skipping to avoid data corruption.")
+    students = {sentence_id: matches[0] for sentence_id, matches in students_by_id.items() if len(matches) == 1}
+
+    PositiveThroughModel = StudentProfile.positive_preferences.through
+    NegativeThroughModel = StudentProfile.negative_preferences.through
+    positive_links = []
+    negative_links = []
+    for sentence_id, student in students.items():
+        positive_topic_names, negative_topic_names = labels[sentence_id]
+        # Only names from the standardised topic list are kept (e.g. 'No Match' is dropped).
+        positive_links.extend(
+            PositiveThroughModel(studentprofile_id=student.pk, standardisedtopic_id=topic_id)
+            for topic_id in {topic_ids[name] for name in positive_topic_names if name in topic_ids}
+        )
+        negative_links.extend(
+            NegativeThroughModel(studentprofile_id=student.pk, standardisedtopic_id=topic_id)
+            for topic_id in {topic_ids[name] for name in negative_topic_names if name in topic_ids}
+        )
+        # Remember what these labels were made from, for only_stale runs.
+        student.labeled_text_fingerprint = fingerprints.get(sentence_id)
+        student.labeled_topic_version = topic_version
+
+    student_pks = [student.pk for student in students.values()]
+    with transaction.atomic():
+        # Replace the old labels of every student in this batch at once.
+        PositiveThroughModel.objects.filter(studentprofile_id__in=student_pks).delete()
+        NegativeThroughModel.objects.filter(studentprofile_id__in=student_pks).delete()
+        PositiveThroughModel.objects.bulk_create(positive_links)
+        NegativeThroughModel.objects.bulk_create(negative_links)
+        StudentProfile.objects.bulk_update(students.values(), ['labeled_text_fingerprint', 'labeled_topic_version'])
+    return len(students)
+
 #region STANDARDISE TOPICS
 # --- TASK 1: Standardize Topics ---
 @shared_task
@@ -204,10 +296,19 @@ def standardize_all_topics():
 #region STUDENT LABELING
 # --- TASK 2: Label Student Preferences ---
 @shared_task
-def label_student_preferences_for_semester(semester):
+def label_student_preferences_for_semester(semester, only_stale=False, batch_size=50,
+                                           max_concurrent_batches=DEFAULT_MAX_CONCURRENT_BATCHES,
+                                           requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE,
+                                           tokens_per_minute=DEFAULT_TOKENS_PER_MINUTE):
     """
     Task 2: Labels student preferences for a given semester.
     It now queries the database for standardized topics itself.
+    With only_stale=True, only students that were never labeled, edited their preference text since,
+    or were labeled against a different topic list are processed.
+    Each batch of batch_size texts is saved as soon as it is labeled; re-issuing the task after
+    a crash or failed batches resumes the semester's unfinished run.
+    Up to max_concurrent_batches Gemini requests are kept in flight, within the given
+    requests-per-minute and tokens-per-minute quotas.
     """
     try:
         print(f"--- TASK: Label Preferences for semester {semester} [STARTED] ---")
@@ -226,173 +327,143 @@ def label_student_preferences_for_semester(semester):
             print("No students with preferences found for this semester. Task complete.")
             return
 
+        topic_version = topic_set_version(standardised_topics_list)
+        students = list(students)
+        fingerprints = {
+            str(student.student_id): text_fingerprint(student.preference_text)
+            for student in students
+        }
+        if only_stale:
+            students = [
+                student for student in students
+                if student.labeled_topic_version != topic_version
+                or student.labeled_text_fingerprint != fingerprints[str(student.student_id)]
+            ]
+            print(f"{len(students)} new, edited or stale student preferences to label.")
+            if not students:
+                message = f"All student preferences in semester {semester} are already labeled."
+                print(f"--- TASK: Label Preferences [SUCCESS]: {message} ---")
+                return {'status': 'SUCCESS', 'result': message}
+
         # --- Configuration ---
         GEMINI_MODEL_NAME = "gemini-2.0-flash"
-        API_RETRY_LIMIT = 3
-        API_RETRY_DELAY_SECONDS = 5
-        BATCH_SIZE = 50
-        DELAY_BETWEEN_BATCHES_SECONDS = 2
-        
-        try:
-            api_key = os.getenv("GOOGLE_API_KEY")
-            if not api_key:
-                raise ValueError("GOOGLE_API_KEY environment variable not set.")
-            genai.configure(api_key=api_key)
-        except Exception as e:
-            print(f"Error configuring Gemini API: {e}")
-            raise
-
-        model = genai.GenerativeModel(GEMINI_MODEL_NAME)
-        all_gemini_results = []
-
-        num_batches = math.ceil(students.count() / BATCH_SIZE)
-        print(f"Processing in {num_batches} batches of size up to {BATCH_SIZE}.")
-
-
-        for i in range(num_batches):
-            start_index = i * BATCH_SIZE
-            end_index = start_index + BATCH_SIZE
-            batch = students[start_index:end_index]
-
-            print(f"\n--- Processing Batch {i+1}/{num_batches} ({len(batch)} sentences) ---")
-
-            if not batch:
-                print("Batch is empty, skipping.")
+        BATCH_SIZE = batch_size
+
+        # --- Label cache lookup ---
+        # Identical texts labeled against the same topics, model and prompt are served from the cache;
+        # only the remaining unique texts are sent to Gemini.
+        label_cache = LabelCache(standardised_topics_list, GEMINI_MODEL_NAME, LABEL_PROMPT_VERSION)
+        student_ids_by_key = {}
+        texts_by_key = {}
+        for student in students:
+            if not student.preference_text or not student.preference_text.strip():
+                print(f"Warning: Student {student.student_id} has no preference text. Skipping.")
                 continue
-
-            # Prepare list of sentences for the current batch's prompt
-            batch_sentences_to_label_list = []
-            for student in batch:
-                if not student.preference_text:
-                    print(f"Warning: Student {student.student_id} has no preference text. Skipping.")
-                    continue
-                
-                # Create a sentence object for the batch
-                sentence_object = {
-                    "SentenceID": str(student.student_id),
-                    "SentenceText": student.preference_text.strip()
-                }
-                batch_sentences_to_label_list.append(sentence_object)
-
-            batch_prompt = create_prompt_for_batch(batch_sentences_to_label_list, standardised_topics_list)
-            gemini_output_json_str = None
-            current_batch_results = None
-
-            for attempt in range(API_RETRY_LIMIT):
-                try:
-                    print(f"Attempt {attempt + 1}/{API_RETRY_LIMIT} for batch {i+1}...")
-                    response = model.generate_content(
-                        batch_prompt,
-                        generation_config=genai.types.GenerationConfig(
-                            # temperature=0.1
-                        )
+            key = label_cache.key(student.preference_text)
+            student_ids_by_key.setdefault(key, []).append(str(student.student_id))
+            texts_by_key.setdefault(key, student.preference_text.strip())
+
+        cached_labels = label_cache.get_many(student_ids_by_key)
+        missing_keys = [key for key in student_ids_by_key if key not in cached_labels]
+        print(f"Label cache: {len(cached_labels)} hits, {len(missing_keys)} unique texts to label.")
+
+        def labels_to_results(labels):
+            return [
+                {"SentenceID": student_id, "Gemini_Positive_Topics": positive, "Gemini_Negative_Topics": negative}
+                for key, (positive, negative) in labels.items()
+                for student_id in student_ids_by_key[key]
+            ]
+
+        # --- Checkpointing ---
+        # Every batch is cached and applied as soon as it succeeds, and its progress recorded on a LabelingRun.
+        # A re-issued task resumes the semester's unfinished run: completed batches are then cache hits,
+        # so only the batches that never finished are sent to Gemini again.
+        run = LabelingRun.objects.filter(
+            semester_id=semester, topic_version=topic_version
+        ).exclude(status=LabelingRun.COMPLETED).order_by('-started_at').first()
+        if run:
+            print(f"Resuming labeling run {run.pk}: {run.completed_batches}/{run.total_batches} batches were already completed.")
+        else:
+            run = LabelingRun.objects.create(semester_id=semester, topic_version=topic_version)
+
+        updated_student_count = apply_labels(labels_to_results(cached_labels), fingerprints, topic_version)
+        run.status = LabelingRun.RUNNING
+        run.total_batches = run.completed_batches + math.ceil(len(missing_keys) / BATCH_SIZE)
+        run.failed_batches = 0
+        run.save()
+
+        if missing_keys:
+            try:
+                api_key = os.getenv("GOOGLE_API_KEY")
+                if not api_key:
+                    raise ValueError("GOOGLE_API_KEY environment variable not set.")
+                genai.configure(api_key=api_key)
+            except Exception as e:
+                print(f"Error configuring Gemini API: {e}")
+                run.status = LabelingRun.INCOMPLETE
+                run.save(update_fields=['status', 'updated_at'])
+                raise
+
+            model = genai.GenerativeModel(GEMINI_MODEL_NAME)
+
+            # Each unique text is sent once, under the id of the first student who wrote it.
+            key_by_sentence_id = {student_ids_by_key[key][0]: key for key in missing_keys}
+            batch_prompts = []
+            for i in range(0, len(missing_keys), BATCH_SIZE):
+                batch_sentences_to_label_list = [
+                    {"SentenceID": student_ids_by_key[key][0], "SentenceText": texts_by_key[key]}
+                    for key in missing_keys[i:i + BATCH_SIZE]
+                ]
+                batch_prompts.append(create_prompt_for_batch(batch_sentences_to_label_list, standardised_topics_list))
+            print(f"Processing in {len(batch_prompts)} batches of size up to {BATCH_SIZE}.")
+
+            def save_batch(index, batch_results):
+                nonlocal updated_student_count
+                if batch_results is None:
+                    run.failed_batches += 1
+                    run.save(update_fields=['failed_batches', 'updated_at'])
+                    return
+                batch_labels = {}
+                for result in batch_results:
+                    key = key_by_sentence_id.get(str(result.get("SentenceID")))
+                    if key is None:
+                        continue
+                    batch_labels[key] = (
+                        split_topic_names(result.get("Gemini_Positive_Topics", [])),
+                        split_topic_names(result.get("Gemini_Negative_Topics", [])),
                     )
-                    if not response.parts:
-                        if response.prompt_feedback and response.prompt_feedback.block_reason:
-                            print(f"Warning: Prompt for batch {i+1} was blocked. Reason: {response.prompt_feedback.block_reason}")
-                        else:
-                            print(f"Warning: Gemini response for batch {i+1} has no parts.")
-                        if attempt < API_RETRY_LIMIT - 1:
-                            print(f"Retrying batch {i+1} in {API_RETRY_DELAY_SECONDS} seconds...")
-                            time.sleep(API_RETRY_DELAY_SECONDS)
-                            continue
-                        else:
-                            print(f"Max retries reached for problematic response for batch {i+1}. Skipping this batch.")
-                            break # Break from retry loop for this batch
-
-                    gemini_output_json_str = response.text.strip()
-
-                    if gemini_output_json_str.startswith("```json"):
-                        gemini_output_json_str = gemini_output_json_str[len("```json"):].strip()
-                    if gemini_output_json_str.endswith("```"):
-                        gemini_output_json_str = gemini_output_json_str[:-len("```")].strip()
-
-                    first_char = gemini_output_json_str[0] if gemini_output_json_str else ''
-                    last_char = gemini_output_json_str[-1] if gemini_output_json_str else ''
-                    if not ((first_char == '[' and last_char == ']')):
-                        json_start_index = gemini_output_json_str.find('[')
-                        json_end_index = gemini_output_json_str.rfind(']')
-                        if json_start_index != -1 and json_end_index > json_start_index :
-                            gemini_output_json_str = gemini_output_json_str[json_start_index : json_end_index+1]
-                        else:
-                            raise ValueError("Could not reliably extract JSON array from Gemini response for this batch.")
-
-                    current_batch_results = json.loads(gemini_output_json_str)
-                    if not isinstance(current_batch_results, list):
-                        raise ValueError("Gemini's output for batch was not a JSON list as expected.")
-                    
-                    print(f"Successfully processed batch {i+1}. Received {len(current_batch_results)} results.")
-                    all_gemini_results.extend(current_batch_results)
-                    break # Successful processing of this batch
-
-                except json.JSONDecodeError as e:
-                    print(f"Error parsing Gemini's JSON output for batch {i+1} (attempt {attempt+1}): {e}")
-                    print("Raw output snippet:", gemini_output_json_str[:200] if gemini_output_json_str else "None")
-                    if attempt < API_RETRY_LIMIT - 1:
-                        time.sleep(API_RETRY_DELAY_SECONDS)
-                    else:
-                        print(f"Failed to parse JSON for batch {i+1} after {API_RETRY_LIMIT} attempts. Skipping this batch.")
-                except Exception as e:
-                    print(f"Error during Gemini API call or processing for batch {i+1} (attempt {attempt+1}): {e}")
-                    if hasattr(response, 'prompt_feedback') and response.prompt_feedback:
-                        print(f"Prompt Feedback: {response.prompt_feedback}")
-                    if attempt < API_RETRY_LIMIT - 1:
-                        time.sleep(API_RETRY_DELAY_SECONDS)
-                    else:
-                        print(f"Failed to process batch {i+1} after {API_RETRY_LIMIT} attempts. Skipping this batch.")
-            
-            # Optional: Add a small delay between batch calls to be polite to the API
-            if i < num_batches - 1: # Don't sleep after the last batch
-                print(f"Waiting {DELAY_BETWEEN_BATCHES_SECONDS}s before next batch...")
-                time.sleep(DELAY_BETWEEN_BATCHES_SECONDS)
-
-        if not all_gemini_results:
-            print("\nNo results were successfully processed from Gemini. Exiting.")
-            exit()
-
-        print("\n--- Updating student profiles in the database ---")
-        updated_student_count = 0
-        with transaction.atomic():
-            for result in all_gemini_results:
-                sentence_id = result.get("SentenceID")
-                
-                # Get topic names as a list of strings, cleaning them up.
-                # Handles both comma-separated strings and lists from the AI.
-                raw_positive = result.get("Gemini_Positive_Topics", [])
-                raw_negative = result.get("Gemini_Negative_Topics", [])
-
-                positive_topic_names = [t.strip() for t in raw_positive.split(',') if t.strip()] if isinstance(raw_positive, str) else [t.strip() for t in raw_positive if t.strip()]
-                negative_topic_names = [t.strip() for t in raw_negative.split(',') if t.strip()] if isinstance(raw_negative, str) else [t.strip() for t in raw_negative if t.strip()]
-
-                if not sentence_id:
-                    print("Warning: Result missing SentenceID, skipping this entry.")
-                    continue
-
-                try:
-                    # Find the student profile. The `student_id` property is based on the email prefix.
-                    student = StudentProfile.objects.get(user__email__startswith=f"{sentence_id}@")
-
-                    # Find the StandardisedTopic objects that match the names from the AI
-                    positive_topics_qs = standardised_topics_qs.filter(name__in=positive_topic_names)
-                    negative_topics_qs = standardised_topics_qs.filter(name__in=negative_topic_names)
-
-                    # Use .set() to update the ManyToMany relationships.
-                    # This clears old relations and adds the new ones.
-                    student.positive_preferences.set(positive_topics_qs)
-                    student.negative_preferences.set(negative_topics_qs)
-                    
-                    updated_student_count += 1
+                label_cache.set_many(batch_labels)
+                updated_student_count += apply_labels(labels_to_results(batch_labels), fingerprints, topic_version)
+                run.completed_batches += 1
+                run.save(update_fields=['completed_batches', 'updated_at'])
+
+            # Batches are sent concurrently under the RPM/TPM limits, with backoff and jitter on retries (see api/labeling.py).
+            engine = LabelingEngine(
+                model,
+                max_concurrent_batches=max_concurrent_batches,
+                requests_per_minute=requests_per_minute,
+                tokens_per_minute=tokens_per_minute,
+                generation_config=genai.types.GenerationConfig(
+                    # temperature=0.1
+                ),
+            )
+            engine.run(batch_prompts, on_batch_done=save_batch)
 
-                except StudentProfile.DoesNotExist:
-                    print(f"Warning: Student with ID '{sentence_id}' does not exist. Skipping.")
-                except StudentProfile.MultipleObjectsReturned:
-                    print(f"Warning: Multiple students found for ID prefix '{sentence_id}'. Skipping to avoid data corruption.")
-        
+        run.status = LabelingRun.INCOMPLETE if run.failed_batches else LabelingRun.COMPLETED
+        run.save(update_fields=['status', 'updated_at'])
         print(f"Successfully updated preferences for {updated_student_count} students.")
 
+        if run.failed_batches:
+            if not updated_student_count:
+                raise ValueError("No results were successfully processed from Gemini.")
+            message = (f"Labeled preferences for {updated_student_count} students in semester {semester}, "
+                       f"but {run.failed_batches} of {run.total_batches} batches failed. Run the task again to resume.")
+            print(f"--- TASK: Label Preferences [INCOMPLETE]: {message} ---")
+            return {'status': 'SUCCESS', 'result': message}
+
         # Return the results
         print("--- TASK: Label Preferences [SUCCESS] ---")
-        message = f"Successfully labeled preferences for {students.count()} students in semester {semester}."
+        message = f"Successfully labeled preferences for {len(students)} students in semester {semester}."
         print(f"--- TASK: Label Preferences [SUCCESS]: {message} ---")
         return {'status': 'SUCCESS', 'result': message}
 
@@ -401,16 +472,31 @@ def label_student_preferences_for_semester(semester):
         raise
 
 #region OPTIMAL MATCHING
-from pulp import LpProblem, LpVariable, LpMaximize, lpSum, LpBinary
-import pandas as pd
-
-def get_preferences_list(preferences_manager):
-    return list(preferences_manager.all().values_list('name', flat=True))
+# Incremental re-matching defaults: moving an already-matched student costs DEFAULT_CHURN_PENALTY
+# (half a first-choice programme match), and only supervisors among the new students'
+# DEFAULT_NEIGHBOURHOOD_K best options are re-optimised.
+DEFAULT_CHURN_PENALTY = 10.0
+DEFAULT_NEIGHBOURHOOD_K = 5
+
+def accepting_supervisors():
+    """Supervisors accepting students, annotated with current_student_count and remaining_capacity."""
+    return SupervisorProfile.objects.filter(
+        accepting_students=True
+    ).annotate(
+        current_student_count=Count('students'),
+        remaining_capacity=F('supervision_capacity') - Count('students')
+    )
 
-#region OPTIMAL MATCHING
 # --- TASK 3: Match Students to Supervisors ---
 @shared_task
-def match_students_for_semester(semester, weightage):
+def match_students_for_semester(semester, weightage, solver='cbc', candidate_k=None, time_limit=None, mip_gap=None, threads=None,
+                                incremental=False, max_reassignments=None, churn_penalty=DEFAULT_CHURN_PENALTY):
+    """
+    Allocates the semester's unassigned students. With incremental=True, students that are already
+    matched may also be moved (at churn_penalty each, at most max_reassignments of them) when that
+    makes room for the new students; only the supervisors those new students are likely to get are
+    re-optimised, and the current allocation is used as the solver's starting point.
+    """
     try:
         print(f"--- TASK: Allocate Students for semester {Semester.objects.get(pk=semester)} [STARTED] ---")
 
@@ -419,7 +505,7 @@ def match_students_for_semester(semester, weightage):
             semester=semester, 
             supervisor__isnull=True,
             preference_text__isnull=False
-        ).distinct()
+        )
 
         if not students.exists():
             raise ValueError("No unassigned students with labeled preferences found for this semester. "
@@ -434,221 +520,351 @@ def match_students_for_semester(semester, weightage):
         if students_no_label_count > 0:
             print(f"Warning: There are {students_no_label_count} unassigned students who have no labels. They will be ignored in this matching process.")
 
-        supervisors = SupervisorProfile.objects.filter(
-            accepting_students=True
-        ).annotate(
-            current_student_count=Count('students'),
-            remaining_capacity=F('supervision_capacity') - Count('students')
-        ).filter(
-            remaining_capacity__gt=0 # Only include supervisors with available slots
-        )
+        supervisors = accepting_supervisors()
+        if incremental:
+            # Full supervisors stay in the model: their students may be moved to free a slot.
+            supervisors = supervisors.filter(
+                Q(remaining_capacity__gt=0) | Exists(StudentProfile.objects.filter(supervisor=OuterRef('pk'), semester=semester))
+            )
+        else:
+            supervisors = supervisors.filter(
+                remaining_capacity__gt=0 # Only include supervisors with available slots
+            )
 
-        total_available_capacity = supervisors.aggregate(total_capacity=Sum('remaining_capacity'))['total_capacity'] or 0
+        # Full and overfull supervisors of an incremental match add no seats (rather than negative ones)
+        total_available_capacity = supervisors.aggregate(
+            total_capacity=Sum(Greatest('remaining_capacity', 0))
+        )['total_capacity'] or 0
         if total_available_capacity < students.count():
             raise ValueError(f"There is not enough supervisor capacity ({total_available_capacity}) to allocate all students ({students.count()}).")
 
 
-        students_data = []
-        for student in students:
-            students_data.append({
-                "student_id": student.student_id,
-                "programme": student.programme.name,
-                "positive_preferences": get_preferences_list(student.positive_preferences),
-                "negative_preferences": get_preferences_list(student.negative_preferences)
-            })
-        students_df = pd.DataFrame(students_data)
-
-        supervisors_data = []
-        for supervisor in supervisors:
-            supervisors_data.append({
-                "supervisor_id": supervisor.user.email,
-                "name": supervisor.user.full_name,
-                "programme_first_choice": list(supervisor.preferred_programmes_first_choice.programme.all().values_list('name', flat=True)) if supervisor.preferred_programmes_first_choice else [],
-                "programme_second_choice": list(supervisor.preferred_programmes_second_choice.programme.all().values_list('name', flat=True)) if supervisor.preferred_programmes_second_choice else [],
-                "capacity": supervisor.remaining_capacity,
-                "student_count": supervisor.current_student_count,
-                "expertise": get_preferences_list(supervisor.standardised_expertise)
-            })
-        supervisors_df = pd.DataFrame(supervisors_data)
-        assignments = optimal_matching(students_df,supervisors_df,float(weightage))
-        all_topics_map = {topic.name: topic for topic in StandardisedTopic.objects.all()}
-
-        with transaction.atomic(): # Use a transaction for safer, faster updates
-            for assignment in assignments:
-                if not assignment.get('student_id') or not assignment.get('supervisor_id'):
-                    print(f"Warning: Skipping assignment with missing student or supervisor ID: {assignment}")
-                    continue
-                try:
-                    student = StudentProfile.objects.select_for_update().get(user__email__startswith=f"{assignment['student_id']}@")
-                    supervisor = SupervisorProfile.objects.get(user__email=assignment['supervisor_id'])
-
-                    matching_topic_names = assignment.get('matching_topics', [])
-                    conflicting_topic_names = assignment.get('conflicting_topics', [])
-
-                    matching_topic_objects = [all_topics_map[name] for name in matching_topic_names if name in all_topics_map]
-                    conflicting_topic_objects = [all_topics_map[name] for name in conflicting_topic_names if name in all_topics_map]
-
-                    student.matching_topics.set(matching_topic_objects)
-                    student.conflicting_topics.set(conflicting_topic_objects)
-                    
-                    student.supervisor = supervisor
-                    student.programme_match_type = assignment['programme_match']
-                    
-                    student.save()
-
-                except StudentProfile.DoesNotExist:
-                    print(f"Warning: Could not find student with ID {assignment['student_id']}. Skipping assignment.")
-                except SupervisorProfile.DoesNotExist:
-                    print(f"Warning: Could not find supervisor with ID {assignment['supervisor_id']}. Skipping assignment for student {assignment['student_id']}.")
-            message = f"Successfully match {students.count()} students in semester {Semester.objects.get(pk=semester)} to {supervisors.count()} supervisors."
-            return {'status': 'SUCCESS', 'result': message}
+        # Already-matched students whose supervisor takes part in the model are candidates for moving.
+        matching_students = students
+        if incremental:
+            matching_students = students | StudentProfile.objects.filter(
+                semester=semester,
+                supervisor__in=supervisors.values('pk'),
+                preference_text__isnull=False
+            )
+        students_df, supervisors_df, engine = load_matching_data(matching_students, supervisors)
+        if incremental:
+            assignments, solver_result = solve_incremental_matching(
+                students_df, supervisors_df, float(weightage),
+                solver=solver, max_reassignments=max_reassignments, churn_penalty=churn_penalty, engine=engine,
+                time_limit=time_limit, mip_gap=mip_gap, threads=threads
+            )
+            # Students kept with their current supervisor need no update.
+            assignments = [a for a in assignments if a['supervisor_id'] != a['previous_supervisor_id']]
+        else:
+            assignments, solver_result = solve_matching(
+                students_df, supervisors_df, float(weightage),
+                solver=solver, candidate_k=candidate_k, engine=engine,
+                time_limit=time_limit, mip_gap=mip_gap, threads=threads
+            )
+        if solver_result['assignment'] is None:
+            raise ValueError(f"The solver did not find an allocation (status: {solver_result['status']}).")
+        new_student_count = students.count() # Count before saving: the saved students no longer match the filter
+        saved_count = save_assignments(assignments)
+        print(f"Saved {saved_count} assignments.")
+        message = f"Successfully match {new_student_count} students in semester {Semester.objects.get(pk=semester)} to {supervisors.count()} supervisors."
+        if incremental:
+            message += f" {solver_result['reassigned']} previously matched students were reassigned."
+        if solver_result['status'] == 'Feasible':
+            message += f" The solver stopped at its limit; the allocation is within {solver_result['gap']:.2%} of optimal."
+        return {
+            'status': 'SUCCESS',
+            'result': message,
+            'solver_status': solver_result['status'],
+            'objective': solver_result['objective'],
+            'bound': solver_result['bound'],
+            'gap': solver_result['gap'],
+            'reassigned': solver_result.get('reassigned', 0),
+        }
         
     except Exception as e:
         print(f"!!! ERROR in match_student_preferences task: {e}")
         raise
         
+@shared_task
+def tune_matching_weights_for_semester(semester, solver='flow', max_workers=None, configs=None):
+    """
+    Grid search over score_weights x balancing_penalty_weight for the semester's unassigned students,
+    as in the Algorithm/gemini.ipynb study. Nothing is saved: every configuration is solved on the
+    same pre-computed scores (see api/tuning.py) and the KPIs of its allocation are compared.
+    configs is a list of (balancing_penalty_weight, score_weights) pairs; the default is the 256-point grid.
+    Returns the results, their Pareto front and the recommended configuration.
+    """
+    try:
+        print(f"--- TASK: Tune Matching Weights for semester {Semester.objects.get(pk=semester)} [STARTED] ---")
+        students = StudentProfile.objects.filter(
+            semester=semester,
+            supervisor__isnull=True,
+            preference_text__isnull=False
+        )
+        supervisors = accepting_supervisors().filter(remaining_capacity__gt=0)
+        students_df, supervisors_df, engine = load_matching_data(students, supervisors)
+        if students_df.empty:
+            raise ValueError("No unassigned students with labeled preferences found for this semester.")
+
+        results, front = run_grid_search(
+            engine,
+            capacities=supervisors_df['capacity'],
+            existing_loads=supervisors_df['student_count'],
+            configs=[(balance, weights) for balance, weights in configs] if configs else None,
+            solver=solver,
+            max_workers=max_workers,
+        )
+        if not results:
+            raise ValueError("The solver did not find an allocation for any configuration.")
+        best = recommend(front)
+        message = (f"Evaluated {len(results)} configurations for {len(students_df)} students; "
+                   f"{len(front)} are on the Pareto front.")
+        print(f"--- TASK: Tune Matching Weights [SUCCESS]: {message} ---")
+        return {
+            'status': 'SUCCESS',
+            'result': message,
+            'results': results,
+            'pareto_front': front,
+            'recommended': best,
+        }
+
+    except Exception as e:
+        print(f"!!! ERROR in tune_matching_weights task: {e}")
+        raise
+
+def save_assignments(assignments):
+    """
+    Persists solver assignments in a constant number of queries: students and supervisors are
+    pre-loaded by id, supervisor and programme match are written with one bulk_update, and the
+    matching/conflicting topic through-rows are replaced with one delete and one bulk_create each.
+    Students are found by the assignment's 'student_pk' when it has one, otherwise by 'student_id';
+    an id shared by several students (same prefix on different email domains) is skipped.
+    Returns the number of students saved.
+    """
+    valid_assignments = []
+    for assignment in assignments:
+        if not assignment.get('student_id') or not assignment.get('supervisor_id'):
+            print(f"Warning: Skipping assignment with missing student or supervisor ID: {assignment}")
+            continue
+        valid_assignments.append(assignment)
+    if not valid_assignments:
+        return 0
+
+    topic_ids = dict(StandardisedTopic.objects.values_list('name', 'id'))
+    supervisors = dict(
+        SupervisorProfile.objects.filter(
+            user__email__in={a['supervisor_id'] for a in valid_assignments}
+        ).values_list('user__email', 'pk')
+    )
+
+    MatchingThroughModel = StudentProfile.matching_topics.through
+    ConflictingThroughModel = StudentProfile.conflicting_topics.through
+    with transaction.atomic(): # Use a transaction for safer, faster updates
+        # Assignments from load_matching_data carry the profile pk; others are looked up by student id
+        queryset = StudentProfile.objects.select_for_update().only('pk', 'student_id', 'supervisor', 'programme_match_type')
+        students_by_pk = queryset.in_bulk({a['student_pk'] for a in valid_assignments if a.get('student_pk') is not None})
+        students_by_id = find_students_by_id(
+            {a['student_id'] for a in valid_assignments if a.get('student_pk') is None}, queryset,
+        )
+        students = []
+        matching_links = []
+        conflicting_links = []
+        for assignment in valid_assignments:
+            if assignment.get('student_pk') is not None:
+                matches = [students_by_pk[assignment['student_pk']]] if assignment['student_pk'] in students_by_pk else []
+            else:
+                matches = students_by_id.get(assignment['student_id'], [])
+            if not matches:
+                print(f"Warning: Could not find student with ID {assignment['student_id']}. Skipping assignment.")
+                continue
+            if len(matches) > 1:
+                print(f"Warning: Multiple students found for ID {assignment['student_id']}. Skipping assignment.")
+                continue
+            student = matches[0]
+            if assignment['supervisor_id'] not in supervisors:
+                print(f"Warning: Could not find supervisor with ID {assignment['supervisor_id']}. Skipping assignment for student {assignment['student_id']}.")
+                continue
+            student.supervisor_id = supervisors[assignment['supervisor_id']]
+            student.programme_match_type = assignment['programme_match']
+            students.append(student)
+
+            # Placeholders such as "No Matches" are not topics and are dropped here.
+            matching_links.extend(
+                MatchingThroughModel(studentprofile_id=student.pk, standardisedtopic_id=topic_id)
+                for topic_id in {topic_ids[name] for name in assignment.get('matching_topics', []) if name in topic_ids}
+            )
+            conflicting_links.extend(
+                ConflictingThroughModel(studentprofile_id=student.pk, standardisedtopic_id=topic_id)
+                for topic_id in {topic_ids[name] for name in assignment.get('conflicting_topics', []) if name in topic_ids}
+            )
+
+        student_pks = [student.pk for student in students]
+        MatchingThroughModel.objects.filter(studentprofile_id__in=student_pks).delete()
+        ConflictingThroughModel.objects.filter(studentprofile_id__in=student_pks).delete()
+        MatchingThroughModel.objects.bulk_create(matching_links)
+        ConflictingThroughModel.objects.bulk_create(conflicting_links)
+        StudentProfile.objects.bulk_update(students, ['supervisor', 'programme_match_type'])
+    return len(students)
+
 def optimal_matching(students_df, supervisors_df, balancing_penalty_weight=5, score_weights={
         'prog_first_choice': 20.0,
         'prog_second_choice': 10.0,
         'student_topic_satisfaction': 50.0
-    }):
+    }, solver='cbc', candidate_k=None, **solver_options):
+    assignments, _ = solve_matching(
+        students_df, supervisors_df, balancing_penalty_weight, score_weights,
+        solver=solver, candidate_k=candidate_k, **solver_options
+    )
+    return assignments
 
-    # --- 1. Pre-calculate a Unified Score for Each (Student, Supervisor) Pair ---
-    # This step implements the M_r and M_Sij logic before defining the optimization problem.
-    all_pair_scores = {}
-    for _, student in students_df.iterrows():
-        s_id = student['student_id']
-        for _, supervisor in supervisors_df.iterrows():
-            v_id = supervisor['supervisor_id']
-            
-            # --- Supervisor's Program Preference Score (implements M_r) ---
-            prog_score = 0
-            # Treat "No Preference" as a universal match for that choice level.
-            if not supervisor.get('programme_first_choice', []) or \
-               student['programme'] in supervisor.get('programme_first_choice', []):
-                prog_score = score_weights.get('prog_first_choice', 10.0)
-            elif not supervisor.get('programme_second_choice', []) or \
-                 student['programme'] in supervisor.get('programme_second_choice', []):
-                prog_score = score_weights.get('prog_second_choice', 5.0)
-
-            # --- Student's Topic Preference Score (implements M_Sij) ---
-            # Positive Match Ratio = |P_i ∩ E_j| / |P_i|
-            pos_prefs = student.get('positive_preferences', [])
-            num_pos_prefs = len(pos_prefs)
-            num_pos_matches = sum(1 for topic in pos_prefs if topic in supervisor.get('expertise', []))
-            positive_match_ratio = (num_pos_matches / num_pos_prefs) if num_pos_prefs > 0 else 1.0
-
-            # Negative Avoidance Success Rate = 1 - (|N_i ∩ E_j| / |N_i|)
-            neg_prefs = student.get('negative_preferences', [])
-            num_neg_prefs = len(neg_prefs)
-            num_neg_violations = sum(1 for topic in neg_prefs if topic in supervisor.get('expertise', []))
-            violation_rate = (num_neg_violations / num_neg_prefs) if num_neg_prefs > 0 else 0.0
-            negative_avoidance_rate = 1.0 - violation_rate
-            
-            # The M_Sij score is the average of the two components above.
-            m_sij_score = (positive_match_ratio + negative_avoidance_rate) / 2.0
-            
-            # Weight the student's overall topic satisfaction score.
-            student_topic_score = score_weights.get('student_topic_satisfaction', 50.0) * m_sij_score
-
-            # --- Final Combined Score for the pair (s_i, r_j) ---
-            final_score = prog_score + student_topic_score
-            all_pair_scores[(s_id, v_id)] = final_score
-
-    # --- 2. Define the Optimization Problem ---
-    problem = LpProblem("Optimal_Student_Supervisor_Matching", LpMaximize)
-
-    # Decision Variables: x_ij = 1 if student i is assigned to supervisor j
-    decision_vars = LpVariable.dicts("x", all_pair_scores.keys(), 0, 1, LpBinary)
-
-    # --- 3. Workload Balancing (Soft Constraint) ---
-    num_new_students = len(students_df)
-    num_existing_students = supervisors_df['student_count'].sum()
-    num_supervisors = len(supervisors_df)
-    target_load = (num_existing_students + num_new_students) / num_supervisors if num_supervisors > 0 else 0
-    print(f"\nTarget total load per supervisor (existing + new): {target_load:.2f}")
-
-    # Variables to measure deviation from the target load (linearizes the penalty)
-    dev_over = LpVariable.dicts("DeviationOver", [s['supervisor_id'] for _, s in supervisors_df.iterrows()], lowBound=0)
-    dev_under = LpVariable.dicts("DeviationUnder", [s['supervisor_id'] for _, s in supervisors_df.iterrows()], lowBound=0)
-
-    for _, supervisor in supervisors_df.iterrows():
-        v_id = supervisor['supervisor_id']
-        existing_load = supervisor.get('student_count', 0)
-        newly_assigned_load = lpSum(decision_vars[(s_id, v_id)] for s_id in students_df['student_id'])
-        problem += (existing_load + newly_assigned_load) - target_load == dev_over[v_id] - dev_under[v_id], f"Define_Deviation_{v_id}"
-
-    # --- 4. Objective Function ---
-    # Maximize the sum of scores for all assignments, minus a penalty for workload imbalance.
-    satisfaction_score = lpSum(decision_vars[key] * all_pair_scores[key] for key in all_pair_scores)
-    workload_penalty = balancing_penalty_weight * lpSum(dev_over[v_id] + dev_under[v_id] for v_id in supervisors_df['supervisor_id'])
-    
-    problem += satisfaction_score - workload_penalty, "Maximize_Satisfaction_and_Balance"
+def solve_matching(students_df, supervisors_df, balancing_penalty_weight=5, score_weights={
+        'prog_first_choice': 20.0,
+        'prog_second_choice': 10.0,
+        'student_topic_satisfaction': 50.0
+    }, solver='cbc', candidate_k=None, engine=None, **solver_options):
+    """
+    Same as optimal_matching, but also returns the solver result
+    (status, objective, proven bound and optimality gap).
+    A prebuilt ScoreEngine (see load_matching_data) replaces the preference columns of the DataFrames.
+    """
 
-    # --- 5. Hard Constraints ---
-    # Constraint 1: Each student must be assigned to exactly ONE supervisor.
-    for s_id in students_df['student_id']:
-        problem += lpSum(decision_vars[(s_id, v_id)] for v_id in supervisors_df['supervisor_id']) == 1, f"Assign_Student_{s_id}"
+    # --- 1. Pre-calculate a Unified Score for Each (Student, Supervisor) Pair ---
+    # The score engine implements the M_r and M_Sij logic as matrix operations,
+    # giving a (students x supervisors) matrix indexed by row position in the DataFrames.
+    if engine is None:
+        engine = ScoreEngine.from_dataframes(students_df, supervisors_df)
+    pair_scores = engine.score_matrix(score_weights)
+    student_ids = list(students_df['student_id'])
+    supervisor_ids = list(supervisors_df['supervisor_id'])
+
+    # --- 2. Solve the assignment model with the selected backend (see api/solvers.py) ---
+    # With candidate_k set, only each student's top-K supervisors (plus feasibility edges) are modelled.
+    # solver_options (time_limit, mip_gap, threads) bound how long the solver may search.
+    result = solve_assignment(
+        pair_scores,
+        capacities=list(supervisors_df['capacity']),
+        existing_loads=list(supervisors_df['student_count']),
+        balancing_penalty_weight=balancing_penalty_weight,
+        solver=solver,
+        candidate_k=candidate_k,
+        **solver_options
+    )
 
-    # Constraint 2: Each supervisor cannot exceed their maximum capacity.
-    for _, supervisor in supervisors_df.iterrows():
-        v_id = supervisor['supervisor_id']
-        # The number of *newly assigned* students cannot exceed the remaining capacity.
-        remaining_capacity = supervisor.get('capacity', 0)
-        problem += lpSum(decision_vars[(s_id, v_id)] for s_id in students_df['student_id']) <= remaining_capacity, f"Capacity_Supervisor_{v_id}"
+    # --- Result Extraction ---
+    # A 'Feasible' result is the best incumbent found before a time limit; it is reported like an optimal one.
+    assignments = []
+    if result['assignment'] is not None:
+        assignments = build_assignments(engine, pair_scores, students_df, supervisors_df, range(len(student_ids)), result['assignment'])
+    return assignments, result
 
-    problem.solve()
+def solve_incremental_matching(students_df, supervisors_df, balancing_penalty_weight=5, score_weights={
+        'prog_first_choice': 20.0,
+        'prog_second_choice': 10.0,
+        'student_topic_satisfaction': 50.0
+    }, solver='cbc', max_reassignments=None, churn_penalty=DEFAULT_CHURN_PENALTY,
+        neighbourhood_k=DEFAULT_NEIGHBOURHOOD_K, engine=None, **solver_options):
+    """
+    Re-matches after late arrivals without rebuilding the whole allocation.
+    students_df holds both the new students and the already-matched ones, whose supervisor_id is in
+    the 'current_supervisor' column (None for new students). supervisors_df has the usual layout:
+    'capacity' is the remaining capacity and 'student_count' includes the matched students.
+
+    Only the neighbourhood of the new students is re-optimised: the supervisors among each new
+    student's neighbourhood_k best options, and the matched students of those supervisors. Everyone
+    else keeps their supervisor. Moving a matched student costs churn_penalty and at most
+    max_reassignments of them may move. The current allocation (plus a greedy placement of the new
+    students) is passed to the solver as a warm start.
+
+    Returns (assignments, result) like solve_matching, for the re-optimised students only; every
+    assignment also carries 'previous_supervisor_id'. result['reassigned'] counts the moved students.
+    As in solve_matching, engine may be a prebuilt ScoreEngine.
+    """
+    if engine is None:
+        engine = ScoreEngine.from_dataframes(students_df, supervisors_df)
+    pair_scores = engine.score_matrix(score_weights)
+    supervisor_index = {supervisor_id: j for j, supervisor_id in enumerate(supervisors_df['supervisor_id'])}
+    current_supervisors = students_df['current_supervisor'] if 'current_supervisor' in students_df else [None] * len(students_df)
+    current = [supervisor_index.get(value) if isinstance(value, str) else None for value in current_supervisors]
+
+    # --- 1. Find the neighbourhood affected by the new students ---
+    new_rows = [i for i, j in enumerate(current) if j is None]
+    affected = np.zeros(len(supervisor_index), dtype=bool)
+    if new_rows:
+        affected = top_k_mask(pair_scores[new_rows], neighbourhood_k or len(supervisor_index)).any(axis=0)
+    movable_rows = [i for i, j in enumerate(current) if j is not None and affected[j]]
+    rows = new_rows + movable_rows
+
+    # --- 2. Free the seats of the movable students ---
+    # An overfull supervisor (negative remaining capacity) keeps their students but takes no new ones
+    capacities = np.maximum(np.asarray(supervisors_df['capacity'], dtype=np.int64), 0)
+    existing_loads = np.asarray(supervisors_df['student_count'], dtype=np.int64)
+    moved_off = np.bincount([current[i] for i in movable_rows], minlength=len(supervisor_index))
+    sub_capacities = list(capacities + moved_off)
+    sub_loads = list(existing_loads - moved_off)
+
+    # New students may go anywhere; matched students only move within the affected neighbourhood.
+    sub_scores = pair_scores[rows]
+    candidates = np.ones(sub_scores.shape, dtype=bool)
+    candidates[len(new_rows):] = affected[np.newaxis, :]
+    sub_current = [None] * len(new_rows) + [current[i] for i in movable_rows]
+
+    # --- 3. Warm start: keep everyone in place and seat the new students greedily ---
+    initial_assignment = greedy_assignment(sub_scores[:len(new_rows)], capacities) + sub_current[len(new_rows):]
+    if None in initial_assignment: # Not enough free seats for a trivial start; let the solver find one
+        initial_assignment = None
+
+    result = solve_assignment(
+        sub_scores,
+        capacities=sub_capacities,
+        existing_loads=sub_loads,
+        balancing_penalty_weight=balancing_penalty_weight,
+        solver=solver,
+        candidates=candidates,
+        current_assignment=sub_current,
+        churn_penalty=churn_penalty,
+        max_reassignments=max_reassignments,
+        initial_assignment=initial_assignment if solver == 'cbc' else None,
+        **solver_options
+    )
 
-    # --- Result Extraction ---
     assignments = []
-    if problem.status == 1: # If an optimal solution was found
-        for key, var in decision_vars.items():
-            if var.value() > 0.5: # If assignment was made
-                student_id, supervisor_id = key
-                
-                # Retrieve student and supervisor info for detailed reporting
-                student = students_df[students_df['student_id'] == student_id].iloc[0]
-                supervisor = supervisors_df[supervisors_df['supervisor_id'] == supervisor_id].iloc[0]
-
-                # Determine match details for reporting
-                programme_match_type = 0
-                if not supervisor.get('programme_first_choice', []) or student['programme'] in supervisor.get('programme_first_choice', []):
-                    programme_match_type = 1
-                elif not supervisor.get('programme_second_choice', []) or student['programme'] in supervisor.get('programme_second_choice', []):
-                    programme_match_type = 2
-
-                matching_topics = [t for t in student.get('positive_preferences', []) if t in supervisor.get('expertise', [])]
-                conflicting_topics = [t for t in student.get('negative_preferences', []) if t in supervisor.get('expertise', [])]
-                
-                assignments.append({
-                    'student_id': student_id,
-                    'supervisor_id': supervisor_id,
-                    'supervisor_name': supervisor.get('name', 'N/A'),
-                    'programme_match': programme_match_type, # 1 for first choice, 2 for second, 0 for other
-                    'matching_topics': matching_topics if matching_topics else ["No Matches"],
-                    'conflicting_topics': conflicting_topics if conflicting_topics else ["No Conflicts"],
-                    'match_score': all_pair_scores[key] # Report the exact score used by the optimizer
-                })
+    result['reassigned'] = 0
+    if result['assignment'] is not None:
+        result['reassigned'] = count_reassignments(result['assignment'], sub_current)
+        assignments = build_assignments(engine, pair_scores, students_df, supervisors_df, rows, result['assignment'])
+        supervisor_ids = list(supervisors_df['supervisor_id'])
+        for assignment, j in zip(assignments, sub_current):
+            assignment['previous_supervisor_id'] = supervisor_ids[j] if j is not None else None
+    return assignments, result
+
+def build_assignments(engine, pair_scores, students_df, supervisors_df, rows, assignment):
+    """Turns solver output (one supervisor column per entry of rows) into assignment dicts."""
+    student_ids = list(students_df['student_id'])
+    # Profile pks, when the DataFrame comes from load_matching_data
+    student_pks = list(students_df['student_pk']) if 'student_pk' in students_df else None
+    supervisor_ids = list(supervisors_df['supervisor_id'])
+    names = list(supervisors_df['name']) if 'name' in supervisors_df else ['N/A'] * len(supervisor_ids)
+    programme_match = engine.programme_match
+    assignments = []
+    for i, j in zip(rows, assignment):
+        matching_topics = engine.matching_topics(i, j)
+        conflicting_topics = engine.conflicting_topics(i, j)
+
+        assignment = {
+            'student_id': student_ids[i],
+            'supervisor_id': supervisor_ids[j],
+            'supervisor_name': names[j],
+            'programme_match': int(programme_match[i, j]), # 1 for first choice, 2 for second, 0 for other
+            'matching_topics': matching_topics if matching_topics else ["No Matches"],
+            'conflicting_topics': conflicting_topics if conflicting_topics else ["No Conflicts"],
+            'match_score': float(pair_scores[i, j]) # Report the exact score used by the optimizer
+        }
+        if student_pks is not None:
+            assignment['student_pk'] = int(student_pks[i])
+        assignments.append(assignment)
     return assignments
 
-def safe_list(val):
-    if isinstance(val, list):
-        return val
-    if isinstance(val, float) or pd.isna(val):
-        return []
-    if isinstance(val, str):
-        try:
-            # Try to parse stringified list
-            if val.strip().startswith("[") and val.strip().endswith("]"):
-                parsed = eval(val)
-                if isinstance(parsed, list):
-                    return [str(t).strip() for t in parsed if str(t).strip()]
-            # Otherwise, split by comma or semicolon
-            return [t.strip() for t in val.split(',') if t.strip()]
-        except Exception:
-            return [val.strip()] if val.strip() else []
-    return []
-
 #region RESET STUFF
 @shared_task
 def reset_students_for_semester(semester):
@@ -1,3 +1,595 @@
-from django.test import TestCase
+import ast
+import json
+import random
+import threading
+from datetime import date
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+import billiard
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.db.models import Count, F
+from django.test import SimpleTestCase, TestCase
+from pulp import PULP_CBC_CMD
+
+from academics.models import Department, Programme, ProgrammePreferenceGroup, Semester
+from users.models import StudentProfile, SupervisorProfile, User
+
+from .label_cache import LRUCache, memory_cache
+from .labeling import LabelingEngine, RateLimiter
+from .matching_data import load_matching_data
+from .models import LabelCacheEntry, LabelingRun, StandardisedTopic
+from .scoring import ScoreEngine
+from .solvers import SOLVERS, greedy_start, select_candidates, solve_assignment, solve_with_cbc
+from .tasks import (
+    apply_labels, create_prompt_for_batch, label_student_preferences_for_semester, match_students_for_semester,
+    save_assignments, solve_matching, solve_incremental_matching, tune_matching_weights_for_semester,
+)
+from .tuning import grid_configs, matching_kpis, pareto_front, run_grid_search
+
+ALGORITHM_DATA_DIR = settings.BASE_DIR.parent / 'Algorithm' / 'data'
+PROGRAMMES = ['BCS', 'BSE', 'BIT', 'BSDA', 'BCNS']
+
+
+def parse_topic_list(value):
+    """Topic names from a stringified list ("['a', 'b']") or a comma-separated cell of the Algorithm CSVs."""
+    if not isinstance(value, str) or not value.strip():
+        return []
+    value = value.strip()
+    if value.startswith('[') and value.endswith(']'):
+        try:
+            parsed = ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            parsed = None
+        if isinstance(parsed, list):
+            return [str(topic).strip() for topic in parsed if str(topic).strip()]
+    return [topic.strip() for topic in value.split(',') if topic.strip()]
+
+
+def load_algorithm_datasets(seed=0):
+    """
+    Loads the labeled students and standardised supervisors from Algorithm/data into the
+    DataFrame layout used by optimal_matching, with seeded programmes and capacities.
+    """
+    rng = random.Random(seed)
+
+    def topics(value):
+        return [topic for topic in parse_topic_list(value) if topic != 'No Match']
+
+    def programme_choice(value):
+        if not isinstance(value, str) or value.strip() == 'No Preference':
+            return []
+        return [name.strip() for name in value.split('/') if name.strip()]
+
+    supervisors = pd.read_csv(ALGORITHM_DATA_DIR / 'supervisors_standardised_gemini.csv')
+    supervisors_df = pd.DataFrame({
+        'supervisor_id': supervisors['Name'],
+        'name': supervisors['Name'],
+        'programme_first_choice': supervisors['Preferred Programme for Supervision (1st Choice)'].apply(programme_choice),
+        'programme_second_choice': supervisors['Preferred Programme for Supervision (2nd Choice)'].apply(programme_choice),
+        'capacity': [rng.randint(5, 10) for _ in range(len(supervisors))],
+        'student_count': [rng.randint(0, 2) for _ in range(len(supervisors))],
+        'expertise': supervisors['standardised Topics'].apply(topics),
+    })
+
+    students = pd.read_csv(ALGORITHM_DATA_DIR / 'gemini_labeled_preferences.csv')
+    students_df = pd.DataFrame({
+        'student_id': [f"s{sentence_id}" for sentence_id in students['SentenceID']],
+        'programme': [rng.choice(PROGRAMMES) for _ in range(len(students))],
+        'positive_preferences': students['Gemini_Positive_Topics_Str'].apply(topics),
+        'negative_preferences': students['Gemini_Negative_Topics_Str'].apply(topics),
+    })
+    return students_df, supervisors_df
+
+
+class SolverBackendTests(SimpleTestCase):
+    score_weights = {
+        'prog_first_choice': 20.0,
+        'prog_second_choice': 10.0,
+        'student_topic_satisfaction': 50.0,
+    }
+
+    def test_flow_and_cbc_objectives_match_on_algorithm_datasets(self):
+        for seed in (0, 1):
+            students_df, supervisors_df = load_algorithm_datasets(seed)
+            pair_scores = ScoreEngine.from_dataframes(students_df, supervisors_df).score_matrix(self.score_weights)
+            for balancing_penalty_weight in (0, 1, 5, 10):
+                with self.subTest(seed=seed, balancing_penalty_weight=balancing_penalty_weight):
+                    results = {
+                        solver: solve_assignment(
+                            pair_scores,
+                            capacities=list(supervisors_df['capacity']),
+                            existing_loads=list(supervisors_df['student_count']),
+                            balancing_penalty_weight=balancing_penalty_weight,
+                            solver=solver,
+                        )
+                        for solver in ('cbc', 'flow')
+                    }
+                    self.assertEqual(results['cbc']['status'], 'Optimal')
+                    self.assertEqual(results['flow']['status'], 'Optimal')
+                    self.assertAlmostEqual(results['cbc']['objective'], results['flow']['objective'], places=6)
+
+    def test_flow_respects_capacity(self):
+        students_df, supervisors_df = load_algorithm_datasets()
+        pair_scores = ScoreEngine.from_dataframes(students_df, supervisors_df).score_matrix(self.score_weights)
+        capacities = list(supervisors_df['capacity'])
+        result = solve_assignment(pair_scores, capacities, list(supervisors_df['student_count']), 5, solver='flow')
+
+        self.assertNotIn(None, result['assignment'])
+        for j, capacity in enumerate(capacities):
+            self.assertLessEqual(result['assignment'].count(j), capacity)
+
+    def test_sparse_candidates_stay_feasible_at_full_capacity(self):
+        students_df, supervisors_df = load_algorithm_datasets()
+        pair_scores = ScoreEngine.from_dataframes(students_df, supervisors_df).score_matrix(self.score_weights)
+        # Shrink capacities so that every single seat has to be used.
+        capacities = [0] * len(supervisors_df)
+        for j in range(len(students_df)):
+            capacities[j % len(capacities)] += 1
+
+        candidates = select_candidates(pair_scores, capacities, top_k=2)
+        self.assertLess(candidates.sum(), pair_scores.size)
+        for solver in ('cbc', 'flow'):
+            with self.subTest(solver=solver):
+                result = solve_assignment(pair_scores, capacities, [0] * len(capacities), 5, solver=solver, candidate_k=2)
+                self.assertEqual(result['status'], 'Optimal')
+                self.assertTrue(all(candidates[i, j] for i, j in enumerate(result['assignment'])))
+
+    def test_time_limited_cbc_is_seeded_with_the_greedy_start(self):
+        pair_scores = np.array([[3.0, 1.0], [2.0, 1.0]])
+        candidates = np.ones(pair_scores.shape, dtype=bool)
+        self.assertEqual(greedy_start(pair_scores, [1, 1], candidates), [0, 1])
+        self.assertIsNone(greedy_start(pair_scores, [1, 1], np.array([[True, False], [True, False]])))
+
+        with mock.patch('api.solvers.PULP_CBC_CMD', wraps=PULP_CBC_CMD) as cbc:
+            result = solve_with_cbc(pair_scores, [1, 1], [0, 0], 0, time_limit=10)
+        self.assertTrue(cbc.call_args.kwargs['warmStart'])
+        self.assertEqual(result['assignment'], [0, 1])
+
+    def test_sparse_model_falls_back_only_when_infeasible(self):
+        pair_scores = np.array([[3.0, 1.0, 0.0], [2.0, 1.0, 0.0]])
+        for sparse_status, expected_calls in (('Not Solved', 1), ('Infeasible', 2)):
+            with self.subTest(sparse_status=sparse_status):
+                backend = mock.Mock(side_effect=[
+                    {'status': sparse_status, 'assignment': None, 'objective': None, 'bound': None, 'gap': None},
+                    {'status': 'Optimal', 'assignment': [0, 1], 'objective': 4.0, 'bound': 4.0, 'gap': 0.0},
+                ])
+                with mock.patch.dict(SOLVERS, {'cbc': backend}):
+                    result = solve_assignment(pair_scores, [1, 1, 1], [0, 0, 0], 0, candidate_k=1, time_limit=60)
+                self.assertEqual(backend.call_count, expected_calls)
+                self.assertEqual(result['status'], 'Optimal' if expected_calls == 2 else sparse_status)
+                if expected_calls == 2: # The dense model only gets the remaining time budget
+                    self.assertNotIn('candidates', backend.call_args.kwargs)
+                    self.assertLessEqual(backend.call_args.kwargs['time_limit'], 60)
+
+
+def grid_search_in_process(queue, *args):
+    queue.put(run_grid_search(*args, max_workers=2)[0])
+
+
+class GridSearchTests(SimpleTestCase):
+    levels = {
+        'balancing_penalty_weight': [1.0, 10.0],
+        'prog_first_choice': [10, 100],
+        'prog_second_choice': [5],
+        'student_topic_satisfaction': [10, 100],
+    }
+
+    def test_pareto_front_drops_dominated_results(self):
+        results = [
+            {'first_choice_pct': 80, 'workload_std_dev': 1.0, 'avg_student_satisfaction_rate': 70},
+            {'first_choice_pct': 70, 'workload_std_dev': 1.0, 'avg_student_satisfaction_rate': 70}, # dominated by 0
+            {'first_choice_pct': 60, 'workload_std_dev': 0.5, 'avg_student_satisfaction_rate': 70},
+            {'first_choice_pct': 80, 'workload_std_dev': 1.0, 'avg_student_satisfaction_rate': 70}, # tie with 0
+        ]
+        self.assertEqual(pareto_front(results), [results[0], results[2], results[3]])
+
+    def test_pool_and_serial_sweeps_agree_with_direct_solves(self):
+        students_df, supervisors_df = load_algorithm_datasets()
+        students_df = students_df.head(100)
+        engine = ScoreEngine.from_dataframes(students_df, supervisors_df)
+        capacities = list(supervisors_df['capacity'])
+        existing_loads = list(supervisors_df['student_count'])
+        configs = grid_configs(self.levels)
+        self.assertEqual(len(configs), 8)
+
+        serial, serial_front = run_grid_search(engine, capacities, existing_loads, configs, max_workers=1)
+        pooled, pooled_front = run_grid_search(engine, capacities, existing_loads, configs, max_workers=2)
+        self.assertEqual(serial, pooled)
+        self.assertEqual(serial_front, pooled_front)
+        self.assertTrue(serial_front)
+        # A prefork Celery worker runs tasks in daemonic billiard processes, where the sweep uses a billiard pool
+        queue = billiard.Queue()
+        worker = billiard.Process(target=grid_search_in_process, args=(queue, engine, capacities, existing_loads, configs), daemon=True)
+        worker.start()
+        self.assertEqual(queue.get(timeout=120), serial)
+        worker.join()
+
+        balance, weights = configs[-1]
+        result = solve_assignment(engine.score_matrix(weights), capacities, existing_loads, balance, solver='flow')
+        assignments = pd.Series(result['assignment'])
+        loads = pd.Series(existing_loads) + assignments.value_counts().reindex(range(len(capacities)), fill_value=0)
+        kpis = matching_kpis(engine, result['assignment'], existing_loads)
+        self.assertEqual({key: serial[-1][key] for key in kpis}, kpis)
+        self.assertAlmostEqual(kpis['workload_std_dev'], loads.std())
+        self.assertAlmostEqual(
+            kpis['first_choice_pct'],
+            100 * sum(engine.programme_match[i, j] == 1 for i, j in enumerate(result['assignment'])) / len(students_df),
+        )
+
+
+class IncrementalMatchingTests(SimpleTestCase):
+    def setUp(self):
+        students_df, supervisors_df = load_algorithm_datasets()
+        supervisors_df['student_count'] = 0
+        late_students = students_df.iloc[:15]
+        matched_students = students_df.iloc[15:].reset_index(drop=True)
+        assignments, _ = solve_matching(matched_students, supervisors_df, 5, solver='flow')
+        current = {a['student_id']: a['supervisor_id'] for a in assignments}
+
+        loads = pd.Series(list(current.values())).value_counts()
+        supervisors_df['student_count'] = [int(loads.get(s, 0)) for s in supervisors_df['supervisor_id']]
+        supervisors_df['capacity'] -= supervisors_df['student_count']
+        self.supervisors_df = supervisors_df
+        self.students_df = pd.concat([
+            late_students.assign(current_supervisor=None),
+            matched_students.assign(current_supervisor=[current[s] for s in matched_students['student_id']]),
+        ], ignore_index=True)
+        self.num_late = len(late_students)
+
+    def test_flow_and_cbc_agree_on_churn_penalty(self):
+        for churn_penalty in (0, 2):
+            with self.subTest(churn_penalty=churn_penalty):
+                results = {
+                    solver: solve_incremental_matching(self.students_df, self.supervisors_df, 5, solver=solver, churn_penalty=churn_penalty)[1]
+                    for solver in ('cbc', 'flow')
+                }
+                self.assertAlmostEqual(results['cbc']['objective'], results['flow']['objective'], places=6)
+
+    def test_max_reassignments_is_respected(self):
+        assignments, result = solve_incremental_matching(
+            self.students_df, self.supervisors_df, 5, solver='cbc', churn_penalty=0, max_reassignments=2
+        )
+        self.assertEqual(result['status'], 'Optimal')
+        moved = [a for a in assignments if a['previous_supervisor_id'] and a['previous_supervisor_id'] != a['supervisor_id']]
+        self.assertLessEqual(len(moved), 2)
+        self.assertEqual(result['reassigned'], len(moved))
+        placed = {a['student_id'] for a in assignments if a['previous_supervisor_id'] is None}
+        self.assertEqual(len(placed), self.num_late)
+
+
+class StubGeminiModel:
+    """Local stand-in for genai.GenerativeModel that labels every sentence with its first topic."""
+
+    def __init__(self, failures=0, delay=0.0, fail_ids=()):
+        self.failures = failures
+        self.fail_ids = set(fail_ids)
+        self.delay = delay
+        self.calls = 0
+        self.sentence_ids = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def generate_content(self, prompt, generation_config=None):
+        with self.lock:
+            self.calls += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            fail = self.failures > 0
+            self.failures -= 1
+        try:
+            threading.Event().wait(self.delay)
+            if fail:
+                raise RuntimeError("429 Resource has been exhausted")
+            sentences = json.loads(prompt[prompt.index('['):prompt.index('Instructions:')].strip())
+            self.sentence_ids.extend(s["SentenceID"] for s in sentences)
+            if self.fail_ids & {s["SentenceID"] for s in sentences}:
+                raise RuntimeError("503 The service is currently unavailable")
+            labels = [{"SentenceID": s["SentenceID"], "Gemini_Positive_Topics": "AI", "Gemini_Negative_Topics": "No Match"} for s in sentences]
+            return SimpleNamespace(parts=[1], text=f"```json\n{json.dumps(labels)}\n```", prompt_feedback=None)
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+
+class LabelingEngineTests(SimpleTestCase):
+    def prompts(self, num_batches, batch_size=3):
+        return [
+            create_prompt_for_batch(
+                [{"SentenceID": f"s{b}_{i}", "SentenceText": "I like AI"} for i in range(batch_size)], ['AI', 'Web']
+            )
+            for b in range(num_batches)
+        ]
+
+    def test_labels_every_batch_with_bounded_concurrency(self):
+        model = StubGeminiModel(delay=0.05)
+        engine = LabelingEngine(model, max_concurrent_batches=3, requests_per_minute=None, tokens_per_minute=None)
+        done = []
+        results = engine.run(self.prompts(8), on_batch_done=lambda index, _: done.append(index))
+
+        self.assertEqual(sorted(done), list(range(8)))
+        self.assertEqual([r[0]["SentenceID"] for r in results], [f"s{b}_0" for b in range(8)])
+        self.assertLessEqual(model.max_in_flight, 3)
+        self.assertGreater(model.max_in_flight, 1)
+
+    def test_retries_with_backoff_then_gives_up(self):
+        delays = []
+        engine = LabelingEngine(StubGeminiModel(failures=2), max_concurrent_batches=1, requests_per_minute=None,
+                                tokens_per_minute=None, retry_limit=3, base_delay=1.0, sleep=delays.append)
+        self.assertEqual(len(engine.run(self.prompts(1))[0]), 3)
+        self.assertEqual(len(delays), 2)
+        self.assertLessEqual(delays[0], 1.0)
+        self.assertLessEqual(delays[1], 2.0)
+
+        engine = LabelingEngine(StubGeminiModel(failures=5), max_concurrent_batches=1, requests_per_minute=None,
+                                tokens_per_minute=None, retry_limit=3, sleep=lambda _: None)
+        self.assertEqual(engine.run(self.prompts(1)), [None])
+
+    def test_rate_limiter_waits_for_both_buckets(self):
+        clock = SimpleNamespace(now=0.0)
+        waits = []
+
+        def sleep(seconds):
+            waits.append(seconds)
+            clock.now += seconds
+
+        limiter = RateLimiter(requests_per_minute=2, tokens_per_minute=600, clock=lambda: clock.now, sleep=sleep)
+        limiter.acquire(100)
+        limiter.acquire(100)
+        self.assertEqual(waits, [])
+        limiter.acquire(100) # Request bucket is empty: one request refills in 30 seconds
+        self.assertAlmostEqual(sum(waits), 30.0)
+
+        limiter = RateLimiter(tokens_per_minute=600, clock=lambda: clock.now, sleep=sleep)
+        limiter.acquire(500)
+        limiter.acquire(300) # 100 tokens left; 200 more refill in 20 seconds
+        self.assertAlmostEqual(sum(waits), 30.0 + 20.0)
+
+
+class LabelingTaskTests(TestCase):
+    def setUp(self):
+        memory_cache.clear()
+        self.ai = StandardisedTopic.objects.create(name='AI')
+        StandardisedTopic.objects.create(name='Web')
+        self.semester = Semester.objects.create(name='Test', start_date=date(2025, 1, 1), end_date=date(2025, 6, 1))
+        for student_id, text in (('s1', 'I like AI'), ('s2', '  I like   AI '), ('s3', 'Anything but web')):
+            user = User.objects.create_user(f'{student_id}@example.com', 'password', user_type='student', full_name=student_id)
+            StudentProfile.objects.create(user=user, semester=self.semester, preference_text=text)
+
+    def label(self, only_stale=False, model=None, batch_size=50):
+        model = model or StubGeminiModel()
+        with mock.patch('api.tasks.genai.configure'), mock.patch('api.tasks.genai.GenerativeModel', return_value=model), \
+                mock.patch('api.labeling.backoff_delay', return_value=0):
+            label_student_preferences_for_semester(self.semester.pk, only_stale=only_stale, batch_size=batch_size)
+        return model
+
+    def test_relabeling_unchanged_text_is_served_from_the_cache(self):
+        model = self.label()
+        self.assertEqual(model.calls, 1)
+        self.assertEqual(LabelCacheEntry.objects.count(), 2) # 's1' and 's2' only differ in whitespace
+        for student in StudentProfile.objects.all():
+            self.assertEqual(list(student.positive_preferences.all()), [self.ai])
+
+        memory_cache.clear() # Force the lookup through the database table
+        StudentProfile.objects.get(user__email='s1@example.com').positive_preferences.clear()
+        self.assertEqual(self.label().calls, 0)
+        self.assertEqual(list(StudentProfile.objects.get(user__email='s1@example.com').positive_preferences.all()), [self.ai])
+
+        StandardisedTopic.objects.create(name='Cloud') # A new topic list invalidates every entry
+        self.assertEqual(self.label().calls, 1)
+        self.assertEqual(LabelCacheEntry.objects.count(), 4)
+
+    def test_only_stale_relabels_new_and_edited_students(self):
+        self.label()
+        self.assertEqual(self.label(only_stale=True).calls, 0)
+
+        student = StudentProfile.objects.get(user__email='s3@example.com')
+        student.preference_text = 'Anything but web or mobile'
+        student.save()
+        self.assertEqual(self.label(only_stale=True).sentence_ids, ['s3'])
+
+        StandardisedTopic.objects.create(name='Cloud') # Every label is stale against a new topic list
+        self.assertEqual(sorted(self.label(only_stale=True).sentence_ids), ['s1', 's3'])
+
+    def test_failed_batches_are_resumed_without_relabeling_completed_ones(self):
+        self.label(model=StubGeminiModel(fail_ids={'s3'}), batch_size=1)
+        run = LabelingRun.objects.get()
+        self.assertEqual((run.status, run.completed_batches, run.failed_batches), (LabelingRun.INCOMPLETE, 1, 1))
+        self.assertEqual(list(StudentProfile.objects.get(user__email='s1@example.com').positive_preferences.all()), [self.ai])
+
+        model = self.label(batch_size=1)
+        self.assertEqual(model.sentence_ids, ['s3'])
+        run.refresh_from_db()
+        self.assertEqual((run.status, run.completed_batches, run.failed_batches), (LabelingRun.COMPLETED, 2, 0))
+
+    def test_raises_instead_of_exiting_when_every_batch_fails(self):
+        with self.assertRaises(ValueError):
+            self.label(model=StubGeminiModel(fail_ids={'s1', 's3'}))
+        self.assertEqual(LabelingRun.objects.get().status, LabelingRun.INCOMPLETE)
+
+    def test_applying_labels_takes_a_constant_number_of_queries(self):
+        web = StandardisedTopic.objects.get(name='Web')
+        results = [
+            {"SentenceID": student_id, "Gemini_Positive_Topics": "AI, Web", "Gemini_Negative_Topics": ["No Match"]}
+            for student_id in ('s1', 's2', 's3', 'unknown')
+        ]
+        # topics, students, 2 deletes, positive bulk_create, bulk_update, and the savepoint pair
+        with self.assertNumQueries(8):
+            self.assertEqual(apply_labels(results, {}, 'v1'), 3)
+        for student in StudentProfile.objects.all():
+            self.assertEqual(set(student.positive_preferences.all()), {self.ai, web})
+            self.assertFalse(student.negative_preferences.exists())
+            self.assertEqual(student.labeled_topic_version, 'v1')
+
+    def test_ambiguous_student_ids_are_skipped(self):
+        user = User.objects.create_user('s1@imail.sunway.edu.my', None, user_type='student', full_name='s1')
+        StudentProfile.objects.create(user=user, semester=self.semester, preference_text='Web')
+        results = [{"SentenceID": student_id, "Gemini_Positive_Topics": "AI"} for student_id in ('s1', 's2')]
+        self.assertEqual(apply_labels(results, {}, 'v1'), 1)
+        self.assertFalse(StudentProfile.objects.filter(student_id='s1', positive_preferences=self.ai).exists())
+
+
+class MatchingPersistenceTests(TestCase):
+    def setUp(self):
+        topics = {name: StandardisedTopic.objects.create(name=name) for name in ('AI', 'Web', 'Security')}
+        self.semester = Semester.objects.create(name='Test', start_date=date(2025, 1, 1), end_date=date(2025, 6, 1))
+        department = Department.objects.create(name='Computing')
+        programme = Programme.objects.create(name='BCS', department=department)
+        group = ProgrammePreferenceGroup.objects.create(name='BCS only')
+        group.programme.add(programme)
+
+        self.supervisors = []
+        for index, expertise in enumerate((['AI'], ['Web', 'Security'])):
+            user = User.objects.create_user(f'lecturer{index}@example.com', 'password', user_type='supervisor', full_name=f'Lecturer {index}')
+            supervisor = SupervisorProfile.objects.create(
+                user=user, supervision_capacity=3,
+                preferred_programmes_first_choice=group, preferred_programmes_second_choice=group,
+            )
+            supervisor.standardised_expertise.set([topics[name] for name in expertise])
+            self.supervisors.append(supervisor)
+
+        for index, (positive, negative) in enumerate(((['AI'], ['Web']), (['Web'], []), (['Security'], ['AI']), (['AI'], []))):
+            user = User.objects.create_user(f's{index}@example.com', 'password', user_type='student', full_name=f'Student {index}')
+            student = StudentProfile.objects.create(user=user, semester=self.semester, programme=programme, preference_text='...')
+            student.positive_preferences.set([topics[name] for name in positive])
+            student.negative_preferences.set([topics[name] for name in negative])
+
+    def test_save_assignments_takes_a_constant_number_of_queries(self):
+        assignments = [
+            {'student_id': f's{index}', 'supervisor_id': self.supervisors[index % 2].user.email, 'programme_match': 1,
+             'matching_topics': ['AI'], 'conflicting_topics': ['No Conflicts']}
+            for index in range(4)
+        ]
+        # topics, supervisors, students, 2 deletes, matching bulk_create, bulk_update, and the savepoint pair
+        with self.assertNumQueries(9):
+            self.assertEqual(save_assignments(assignments), 4)
+        student = StudentProfile.objects.get(user__email='s1@example.com')
+        self.assertEqual(student.supervisor, self.supervisors[1])
+        self.assertEqual(student.programme_match_type, 1)
+        self.assertEqual(list(student.matching_topics.values_list('name', flat=True)), ['AI'])
+        self.assertFalse(student.conflicting_topics.exists())
+
+    def test_match_students_for_semester_assigns_everyone(self):
+        result = match_students_for_semester(self.semester.pk, 5, solver='flow')
+        self.assertEqual(result['solver_status'], 'Optimal')
+        self.assertIn('Successfully match 4 students', result['result'])
+        self.assertFalse(StudentProfile.objects.filter(semester=self.semester, supervisor__isnull=True).exists())
+        student = StudentProfile.objects.get(user__email='s0@example.com')
+        self.assertEqual(student.supervisor, self.supervisors[0])
+        self.assertEqual(list(student.matching_topics.values_list('name', flat=True)), ['AI'])
+
+    def test_time_limited_match_saves_the_incumbent_and_reports_its_gap(self):
+        # CBC logs a bound only when it stops before proving optimality; the objective is negated in the model
+        with mock.patch('api.solvers._read_cbc_log', return_value=('Stopped on time', -1000.0)):
+            result = match_students_for_semester(self.semester.pk, 5, solver='cbc', time_limit=5)
+        self.assertEqual(result['solver_status'], 'Feasible')
+        self.assertEqual(result['bound'], 1000.0)
+        self.assertAlmostEqual(result['gap'], (1000.0 - result['objective']) / 1000.0)
+        self.assertIn(f"within {result['gap']:.2%} of optimal", result['result'])
+        self.assertFalse(StudentProfile.objects.filter(semester=self.semester, supervisor__isnull=True).exists())
+
+    def test_students_sharing_an_id_prefix_are_both_matched(self):
+        programme = Programme.objects.get()
+        for email in ('s9@example.com', 's9@imail.sunway.edu.my'):
+            user = User.objects.create_user(email, None, user_type='student', full_name=email)
+            student = StudentProfile.objects.create(user=user, semester=self.semester, programme=programme, preference_text='...')
+            student.positive_preferences.set(StandardisedTopic.objects.filter(name='Web'))
+        self.assertEqual(StudentProfile.objects.filter(student_id='s9').count(), 2)
+
+        result = match_students_for_semester(self.semester.pk, 5, solver='flow')
+        self.assertIn('Successfully match 6 students', result['result'])
+        self.assertFalse(StudentProfile.objects.filter(semester=self.semester, supervisor__isnull=True).exists())
+
+    def matching_querysets(self):
+        students = StudentProfile.objects.filter(semester=self.semester, supervisor__isnull=True, preference_text__isnull=False)
+        supervisors = SupervisorProfile.objects.annotate(
+            current_student_count=Count('students'),
+            remaining_capacity=F('supervision_capacity') - Count('students'),
+        )
+        return students, supervisors
+
+    def test_load_matching_data_takes_a_constant_number_of_queries(self):
+        students, supervisors = self.matching_querysets()
+        # supervisors, students, group programmes, three through-tables and the topic names
+        with self.assertNumQueries(7):
+            students_df, supervisors_df, engine = load_matching_data(students, supervisors)
+        self.assertEqual(len(students_df), 4)
+
+        programme = Programme.objects.get()
+        for index in range(4, 10):
+            user = User.objects.create_user(f's{index}@example.com', 'password', user_type='student', full_name=f'Student {index}')
+            student = StudentProfile.objects.create(user=user, semester=self.semester, programme=programme, preference_text='...')
+            student.positive_preferences.set(StandardisedTopic.objects.all())
+        with self.assertNumQueries(7):
+            students_df, supervisors_df, engine = load_matching_data(students, supervisors)
+        self.assertEqual(len(students_df), 10)
+
+    def test_load_matching_data_scores_like_the_dataframe_path(self):
+        students, supervisors = self.matching_querysets()
+        students_df, supervisors_df, engine = load_matching_data(students, supervisors)
+        by_name = ScoreEngine(
+            student_programmes=['BCS'] * 4,
+            student_positive=[['AI'], ['Web'], ['Security'], ['AI']],
+            student_negative=[['Web'], [], ['AI'], []],
+            supervisor_first_choice=[['BCS'], ['BCS']],
+            supervisor_second_choice=[['BCS'], ['BCS']],
+            supervisor_expertise=[['AI'], ['Web', 'Security']],
+        )
+        self.assertEqual(list(students_df['student_id']), ['s0', 's1', 's2', 's3'])
+        self.assertEqual(list(supervisors_df['capacity']), [3, 3])
+        weights = {'prog_first_choice': 20.0, 'prog_second_choice': 10.0, 'student_topic_satisfaction': 50.0}
+        self.assertTrue((engine.score_matrix(weights) == by_name.score_matrix(weights)).all())
+        self.assertEqual(engine.conflicting_topics(2, 0), ['AI'])
+
+    def test_score_engine_is_reused_until_the_data_changes(self):
+        students, supervisors = self.matching_querysets()
+        cache = LRUCache()
+        _, _, engine = load_matching_data(students, supervisors, cache=cache)
+        _, _, same_engine = load_matching_data(students, supervisors, cache=cache)
+        self.assertIs(same_engine, engine)
+
+        StudentProfile.objects.get(user__email='s1@example.com').positive_preferences.add(StandardisedTopic.objects.get(name='AI'))
+        _, _, new_engine = load_matching_data(students, supervisors, cache=cache)
+        self.assertIsNot(new_engine, engine)
+        self.assertEqual(new_engine.matching_topics(1, 0), ['AI'])
+
+    def test_score_matrix_is_the_weighted_sum_of_its_components(self):
+        students, supervisors = self.matching_querysets()
+        _, _, engine = load_matching_data(students, supervisors, cache=None)
+        weights = {'prog_first_choice': 7.0, 'prog_second_choice': 3.0, 'student_topic_satisfaction': 11.0}
+        expected = 7.0 * engine.first_choice + 3.0 * engine.second_choice + 11.0 * engine.m_sij
+        self.assertTrue(np.allclose(engine.score_matrix(weights), expected))
+
+    def test_incremental_match_keeps_matched_students_in_the_model(self):
+        student = StudentProfile.objects.get(user__email='s0@example.com')
+        student.supervisor = self.supervisors[0]
+        student.save()
+        result = match_students_for_semester(self.semester.pk, 5, solver='flow', incremental=True)
+        self.assertIn('Successfully match 3 students', result['result'])
+        self.assertFalse(StudentProfile.objects.filter(semester=self.semester, supervisor__isnull=True).exists())
+
+    def test_incremental_match_ignores_the_deficit_of_overfull_supervisors(self):
+        # Lecturer 0 supervises 5 students for 3 places; lecturer 1 alone has room for the 4 new students
+        programme = Programme.objects.get()
+        for index in range(5):
+            user = User.objects.create_user(f'old{index}@example.com', None, user_type='student', full_name=f'Old {index}')
+            StudentProfile.objects.create(user=user, semester=self.semester, programme=programme, supervisor=self.supervisors[0])
+        self.supervisors[1].supervision_capacity = 4
+        self.supervisors[1].save()
+
+        result = match_students_for_semester(self.semester.pk, 5, solver='flow', incremental=True)
+        self.assertIn('Successfully match 4 students', result['result'])
+        self.assertEqual(self.supervisors[1].students.count(), 4)
+
+    def test_tuning_task_reports_a_pareto_front_without_saving(self):
+        configs = [(1.0, {'prog_first_choice': 20, 'prog_second_choice': 10, 'student_topic_satisfaction': 50}),
+                   (10.0, {'prog_first_choice': 20, 'prog_second_choice': 10, 'student_topic_satisfaction': 0})]
+        result = tune_matching_weights_for_semester(self.semester.pk, configs=configs, max_workers=1)
+        self.assertEqual(len(result['results']), 2)
+        self.assertIn(result['recommended'], result['pareto_front'])
+        # With no topic weight, only the balance counts: the 4 students are split 2/2.
+        self.assertEqual(result['results'][1]['workload_std_dev'], 0.0)
+        self.assertFalse(StudentProfile.objects.filter(semester=self.semester, supervisor__isnull=False).exists())
@@ -0,0 +1,141 @@
+# api/tuning.py
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+
+import billiard
+import numpy as np
+
+from .solvers import solve_assignment
+
+# Grid from the Algorithm/gemini.ipynb study: 4 levels per parameter, 4^4 = 256 configurations.
+PARAMETER_LEVELS = {
+    'balancing_penalty_weight': [1.0, 2.0, 5.0, 10.0],
+    'prog_first_choice': [10, 20, 50, 100],
+    'prog_second_choice': [5, 10, 25, 50],
+    'student_topic_satisfaction': [10, 20, 50, 100],
+}
+
+KPI_GOALS = {
+    'first_choice_pct': 'maximize',
+    'workload_std_dev': 'minimize',
+    'avg_student_satisfaction_rate': 'maximize',
+}
+
+
+def grid_configs(levels=PARAMETER_LEVELS):
+    """Every (balancing_penalty_weight, score_weights) combination of the parameter levels."""
+    configs = []
+    for balance, first, second, topic in itertools.product(
+        levels['balancing_penalty_weight'], levels['prog_first_choice'],
+        levels['prog_second_choice'], levels['student_topic_satisfaction'],
+    ):
+        configs.append((balance, {
+            'prog_first_choice': first,
+            'prog_second_choice': second,
+            'student_topic_satisfaction': topic,
+        }))
+    return configs
+
+
+def matching_kpis(engine, assignment, existing_loads):
+    """
+    KPIs of one allocation, as defined in the grid-search notebook:
+    - first_choice_pct: % of students matched to one of their supervisor's first-choice programmes
+    - avg_student_satisfaction_rate: mean M_Sij of the assigned pairs, in %
+    - workload_std_dev: sample standard deviation of the supervisors' final loads
+    """
+    rows = np.arange(len(assignment))
+    columns = np.asarray(assignment)
+    loads = np.asarray(existing_loads, dtype=np.float64) + np.bincount(columns, minlength=len(existing_loads))
+    return {
+        'first_choice_pct': float(engine.first_choice[rows, columns].mean() * 100) if len(rows) else 0.0,
+        'avg_student_satisfaction_rate': float(engine.m_sij[rows, columns].mean() * 100) if len(rows) else 0.0,
+        'workload_std_dev': float(loads.std(ddof=1)) if len(loads) > 1 else 0.0,
+    }
+
+
+def pareto_front(results, kpi_goals=KPI_GOALS):
+    """
+    The results (dicts holding every KPI in kpi_goals) that no other result dominates, in input order.
+    A result is dominated when another one is at least as good on every KPI and better on one.
+    """
+    if not results:
+        return []
+    signs = np.array([1.0 if goal == 'maximize' else -1.0 for goal in kpi_goals.values()])
+    values = np.array([[result[kpi] for kpi in kpi_goals] for result in results], dtype=np.float64) * signs
+    # [a, b] is True when result b dominates result a.
+    at_least_as_good = (values[np.newaxis, :, :] >= values[:, np.newaxis, :]).all(axis=2)
+    better_somewhere = (values[np.newaxis, :, :] > values[:, np.newaxis, :]).any(axis=2)
+    dominated = (at_least_as_good & better_somewhere).any(axis=1)
+    return [result for result, is_dominated in zip(results, dominated) if not is_dominated]
+
+
+def recommend(front):
+    """The notebook's pick from a Pareto front: most first choices, then the most balanced workload."""
+    return min(front, key=lambda result: (-result['first_choice_pct'], result['workload_std_dev']), default=None)
+
+
+# Message of the AssertionError multiprocessing raises when a daemonic process starts a pool.
+DAEMONIC_CHILDREN_ERROR = 'daemonic processes are not allowed to have children'
+
+# Set once per pool worker by _init_worker so each configuration only ships its weights.
+_worker_state = {}
+
+
+def _init_worker(engine, capacities, existing_loads, solver, solver_options):
+    _worker_state.update(
+        engine=engine, capacities=capacities, existing_loads=existing_loads,
+        solver=solver, solver_options=solver_options,
+    )
+
+
+def _evaluate_config(config):
+    balancing_penalty_weight, score_weights = config
+    state = _worker_state
+    result = solve_assignment(
+        state['engine'].score_matrix(score_weights),
+        capacities=state['capacities'],
+        existing_loads=state['existing_loads'],
+        balancing_penalty_weight=balancing_penalty_weight,
+        solver=state['solver'],
+        **state['solver_options']
+    )
+    if result['assignment'] is None:
+        return None
+    return {
+        'balancing_penalty_weight': balancing_penalty_weight,
+        'score_weights': score_weights,
+        **matching_kpis(state['engine'], result['assignment'], state['existing_loads']),
+    }
+
+
+def run_grid_search(engine, capacities, existing_loads, configs=None, solver='flow', max_workers=None, **solver_options):
+    """
+    Solves the matching model for every (balancing_penalty_weight, score_weights) configuration and
+    returns (results, front): the KPIs of every solvable configuration and its Pareto front.
+
+    The programme masks and M_Sij matrix of the ScoreEngine are computed once and sent to each pool
+    worker once; a configuration only re-weights them. Configurations run in a pool of max_workers
+    processes (default: one per CPU), or serially with max_workers=1. The pool is a ProcessPoolExecutor,
+    which works in a solo or threaded Celery worker. A prefork Celery worker runs tasks in daemonic
+    processes, which multiprocessing refuses to let start children; when that happens the sweep runs in
+    a billiard pool instead (Celery's fork of multiprocessing, which allows it).
+    """
+    configs = grid_configs() if configs is None else configs
+    initargs = (engine, list(capacities), list(existing_loads), solver, solver_options)
+    chunksize = max(1, len(configs) // 64)
+    if max_workers == 1:
+        _init_worker(*initargs)
+        results = [_evaluate_config(config) for config in configs]
+    else:
+        try:
+            with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=initargs) as executor:
+                results = list(executor.map(_evaluate_config, configs, chunksize=chunksize))
+        except AssertionError as e:
+            if DAEMONIC_CHILDREN_ERROR not in str(e):
+                raise
+            print("The grid search runs in a daemonic process (e.g. a prefork Celery worker); using a billiard pool.")
+            with billiard.Pool(max_workers, initializer=_init_worker, initargs=initargs) as pool:
+                results = pool.map(_evaluate_config, configs, chunksize=chunksize)
+    results = [result for result in results if result is not None]
+    return results, pareto_front(results)
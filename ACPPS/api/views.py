@@ -5,7 +5,25 @@ from rest_framework.permissions import IsAdminUser
 from celery.result import AsyncResult
 
 # Import the two independent tasks
-from .tasks import standardize_all_topics, label_student_preferences_for_semester, match_students_for_semester, reset_students_for_semester, reset_topic_mappings
+from .tasks import standardize_all_topics, label_student_preferences_for_semester, match_students_for_semester, tune_matching_weights_for_semester, reset_students_for_semester, reset_topic_mappings, DEFAULT_CHURN_PENALTY
+from .solvers import SOLVERS
+
+def parse_optional_number(data, name, cast=int, minimum=0, maximum=None):
+    """
+    Reads an optional numeric request parameter.
+    Returns None when it is missing or empty, and raises ValueError when it is out of range.
+    """
+    value = data.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        value = cast(value)
+    except (ValueError, TypeError):
+        raise ValueError(f"The '{name}' parameter must be a number.")
+    if value < minimum or (maximum is not None and value > maximum):
+        bounds = f"between {minimum} and {maximum}" if maximum is not None else f"at least {minimum}"
+        raise ValueError(f"The '{name}' parameter must be {bounds}.")
+    return value
 
 class StartStandardizationView(APIView):
     """API endpoint to trigger the topic standardization task."""
@@ -33,7 +51,8 @@ class StartLabelingView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        task = label_student_preferences_for_semester.delay(semester=semester)
+        only_stale = str(request.data.get('only_stale', '')).lower() in ('1', 'true', 'on')
+        task = label_student_preferences_for_semester.delay(semester=semester, only_stale=only_stale)
         return Response(
             {
                 "message": f"Student preference labeling for semester '{semester}' has been initiated.",
@@ -61,8 +80,42 @@ class StartMatchingView(APIView):
                 {"error": "A 'weightage' parameter is required."},
                 status=status.HTTP_400_BAD_REQUEST
             )
+        solver = request.data.get('solver', 'cbc')
+        if solver not in SOLVERS:
+            return Response(
+                {"error": f"Unknown 'solver' parameter. Choose one of: {', '.join(SOLVERS)}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        # Optional solver tuning: sparse candidates per student, and CBC time limit (seconds), relative MIP gap and threads.
+        try:
+            candidate_k = parse_optional_number(request.data, 'candidate_k', int, minimum=1)
+            time_limit = parse_optional_number(request.data, 'time_limit', float, minimum=1)
+            mip_gap = parse_optional_number(request.data, 'mip_gap', float, minimum=0, maximum=1)
+            threads = parse_optional_number(request.data, 'threads', int, minimum=1)
+            # Incremental re-matching: keep the current allocation and only move students when worth churn_penalty.
+            max_reassignments = parse_optional_number(request.data, 'max_reassignments', int, minimum=0)
+            churn_penalty = parse_optional_number(request.data, 'churn_penalty', float, minimum=0)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        incremental = str(request.data.get('incremental', '')).lower() in ('1', 'true', 'on')
+        if incremental and solver != 'cbc' and max_reassignments is not None:
+            return Response(
+                {"error": "'max_reassignments' is only supported by the 'cbc' solver."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        task = match_students_for_semester.delay(semester=semester,weightage=weightage)
+        task = match_students_for_semester.delay(
+            semester=semester,
+            weightage=weightage,
+            solver=solver,
+            candidate_k=candidate_k,
+            time_limit=time_limit,
+            mip_gap=mip_gap,
+            threads=threads,
+            incremental=incremental,
+            max_reassignments=max_reassignments,
+            churn_penalty=churn_penalty if churn_penalty is not None else DEFAULT_CHURN_PENALTY,
+        )
         return Response(
             {
                 "message": f"Student matching for semester '{semester}' has been initiated",
@@ -71,6 +124,39 @@ class StartMatchingView(APIView):
             status=status.HTTP_202_ACCEPTED
         )
 
+class StartWeightTuningView(APIView):
+    """
+    Grid-search the matching weights and return the Pareto front of the configurations
+    """
+    permission_classes = [IsAdminUser]
+
+    def post(self, request, *format):
+        semester = request.data.get('semester')
+        if not semester:
+            return Response(
+                {"error": "A 'semester' parameter is required."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        solver = request.data.get('solver', 'flow')
+        if solver not in SOLVERS:
+            return Response(
+                {"error": f"Unknown 'solver' parameter. Choose one of: {', '.join(SOLVERS)}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            max_workers = parse_optional_number(request.data, 'max_workers', int, minimum=1)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        task = tune_matching_weights_for_semester.delay(semester=semester, solver=solver, max_workers=max_workers)
+        return Response(
+            {
+                "message": f"Matching weight tuning for semester '{semester}' has been initiated",
+                "task_id": task.id
+            },
+            status=status.HTTP_202_ACCEPTED
+        )
+
 class ResetMatchingView(APIView):
     """
     Reset student and supervisor allocations
@@ -131,6 +217,9 @@ class TaskStatusView(APIView):
             # The result of a failed task is the Exception object.
             # Convert it to a string for the JSON response.
             response_data['result'] = str(task_result.result)
+        elif task_result.state == 'PROGRESS':
+            # Metadata a running task reported with update_state (e.g. rows imported so far).
+            response_data['result'] = task_result.info
         
         # If status is PENDING, result will be None, which is correct.
         return Response(response_data, status=status.HTTP_200_OK)
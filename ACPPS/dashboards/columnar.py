@@ -0,0 +1,79 @@
+# dashboards/columnar.py
+"""
+Parquet support for the coordinator import/export pages.
+
+Topic columns are stored as native list<string> columns, so a Parquet round trip never joins
+or re-parses "a; b" or "['a', 'b']" strings. pyarrow is optional and only imported when a
+Parquet file is actually read or written.
+"""
+import tempfile
+
+PARQUET_CONTENT_TYPE = 'application/vnd.apache.parquet'
+PARQUET_MAGIC = b'PAR1'
+PARQUET_BATCH_SIZE = 2000
+
+# Exports larger than this spill from memory to a temporary file while the Parquet file is written.
+SPOOL_MAX_SIZE = 16 * 1024 * 1024
+
+
+class ColumnarFormatUnavailable(Exception):
+    """Raised when a Parquet file is requested but pyarrow is not installed."""
+
+
+def import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ColumnarFormatUnavailable("Parquet files need the optional 'pyarrow' package. Install it or use CSV instead.")
+    return pyarrow, pyarrow.parquet
+
+
+def is_parquet(uploaded_file):
+    """Checks the file's magic bytes (not just its name) and rewinds it."""
+    position = uploaded_file.tell()
+    magic = uploaded_file.read(len(PARQUET_MAGIC))
+    uploaded_file.seek(position)
+    return magic == PARQUET_MAGIC
+
+
+def write_parquet(columns, row_chunks):
+    """
+    Writes row chunks to a Parquet file, one row group per chunk, and returns the file rewound.
+    columns is a list of (name, type) pairs with type 'string', 'int', 'bool' or 'list'
+    (a list of strings); rows hold their values in that order.
+    """
+    pa, pq = import_pyarrow()
+    types = {'string': pa.string(), 'int': pa.int64(), 'bool': pa.bool_(), 'list': pa.list_(pa.string())}
+    schema = pa.schema([(name, types[kind]) for name, kind in columns])
+
+    output = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    with pq.ParquetWriter(output, schema) as writer:
+        for chunk in row_chunks:
+            arrays = [pa.array(values, type=field.type) for values, field in zip(zip(*chunk), schema)]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+    output.seek(0)
+    return output
+
+
+def read_parquet_rows(uploaded_file):
+    """
+    Returns (headers, rows) for a Parquet upload, where rows yields one dict per record.
+    List columns stay Python lists; other values are turned into the strings a csv.DictReader would give
+    (None becomes ''), so the importers treat both formats alike: users.importers.split_topic_cell reads
+    a topic cell either as a list or as a semicolon-separated string.
+    """
+    _, pq = import_pyarrow()
+    parquet_file = pq.ParquetFile(uploaded_file)
+    headers = [name.strip() for name in parquet_file.schema_arrow.names]
+
+    def rows():
+        for batch in parquet_file.iter_batches(batch_size=PARQUET_BATCH_SIZE):
+            for record in batch.to_pylist():
+                yield {
+                    name.strip(): value if isinstance(value, list) else ('' if value is None else str(value))
+                    for name, value in record.items()
+                }
+
+    return headers, rows()
+
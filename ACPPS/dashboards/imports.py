@@ -0,0 +1,117 @@
+# dashboards/imports.py
+"""
+Reading and importing the coordinator's user uploads, shared by the import page and the background
+import task. Rows are imported IMPORT_CHUNK_SIZE at a time and per-row errors go to an error report
+file, so memory stays flat however large the file is.
+"""
+import csv
+import io
+import itertools
+import os
+import tempfile
+import time
+import uuid
+
+from django.conf import settings
+
+from users.importers import StudentImporter, SupervisorImporter
+from .columnar import is_parquet, read_parquet_rows
+
+IMPORTERS = {'students': StudentImporter, 'supervisors': SupervisorImporter}
+
+# Rows parsed, resolved and written together (one transaction and one progress report per chunk).
+IMPORT_CHUNK_SIZE = 1000
+
+# Error reports older than this are deleted when a new one is started.
+REPORT_MAX_AGE = 7 * 24 * 60 * 60
+
+
+def read_rows(uploaded_file):
+    """
+    Returns (headers, rows) for an uploaded CSV or Parquet file; rows yields one dict per record.
+    Parquet list columns arrive as lists, everything else as strings like csv.DictReader gives.
+    """
+    if is_parquet(uploaded_file):
+        headers, rows = read_parquet_rows(uploaded_file)
+        return set(headers), rows
+    reader = csv.DictReader(io.TextIOWrapper(uploaded_file, 'utf-8-sig'))
+    return set(map(str.strip, reader.fieldnames or [])), reader
+
+
+def create_importer(user_type, headers, semester=None):
+    """The IMPORTERS bulk importer for 'students' (into the given semester) or 'supervisors'."""
+    importer_class = IMPORTERS[user_type]
+    if importer_class is StudentImporter:
+        return importer_class(semester, headers)
+    return importer_class(headers)
+
+
+def spool_upload(uploaded_file):
+    """Copies an upload to a file in IMPORT_SPOOL_DIR, chunk by chunk, and returns its path."""
+    os.makedirs(settings.IMPORT_SPOOL_DIR, exist_ok=True)
+    suffix = os.path.splitext(uploaded_file.name)[1]
+    with tempfile.NamedTemporaryFile(dir=settings.IMPORT_SPOOL_DIR, suffix=suffix, delete=False) as spool:
+        for chunk in uploaded_file.chunks():
+            spool.write(chunk)
+    return spool.name
+
+
+def report_path(report_id):
+    return os.path.join(settings.IMPORT_REPORT_DIR, f"{report_id}.txt")
+
+
+class ErrorReport:
+    """
+    Per-row import errors, written line by line to a text file in IMPORT_REPORT_DIR that the coordinator
+    downloads from CoordinatorImportReportView. The file is only created once there is an error; count
+    is the number of errors written so far.
+    """
+    def __init__(self):
+        self.report_id = uuid.uuid4()
+        self.count = 0
+        self._file = None
+
+    def write(self, errors):
+        for error in errors:
+            if self._file is None:
+                self._open()
+            self._file.write(f"{error}\n")
+            self.count += 1
+
+    def _open(self):
+        os.makedirs(settings.IMPORT_REPORT_DIR, exist_ok=True)
+        expired = time.time() - REPORT_MAX_AGE
+        for entry in os.scandir(settings.IMPORT_REPORT_DIR):
+            if entry.is_file() and entry.stat().st_mtime < expired:
+                os.remove(entry.path)
+        self._file = open(report_path(self.report_id), 'w', encoding='utf-8')
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def run_import(importer, rows, error_report, on_chunk=None, chunk_size=None):
+    """
+    Imports rows chunk_size (default IMPORT_CHUNK_SIZE) at a time. Each chunk is parsed, resolved and
+    written in bulk in its own transaction, its errors are moved from importer.errors to error_report,
+    and on_chunk(rows processed so far) is called. Returns the number of rows processed.
+    Rows are numbered from 2, like the lines of a CSV file with a header.
+    """
+    chunk_size = chunk_size or IMPORT_CHUNK_SIZE
+    numbered = enumerate(rows, start=2)
+    processed = 0
+    while chunk := list(itertools.islice(numbered, chunk_size)):
+        importer.import_rows(chunk)
+        error_report.write(importer.errors)
+        importer.errors.clear()
+        processed += len(chunk)
+        if on_chunk is not None:
+            on_chunk(processed)
+    return processed
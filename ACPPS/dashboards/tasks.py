@@ -0,0 +1,56 @@
+# dashboards/tasks.py
+import contextlib
+import os
+
+from celery import shared_task
+from django.urls import reverse
+
+from academics.models import Semester
+from .imports import ErrorReport, create_importer, read_rows, run_import
+
+
+def import_progress(importer, processed):
+    return {
+        'processed': processed,
+        'created': importer.created_count,
+        'updated': importer.updated_count,
+        'failed': importer.failed_count,
+    }
+
+
+@shared_task(bind=True)
+def import_users_file(self, user_type, path, semester=None):
+    """
+    Imports a spooled student or supervisor upload (see CoordinatorImportView) chunk by chunk and deletes the file.
+    After each chunk the task's state is PROGRESS with the rows processed, created, updated and failed so far
+    as its metadata, which TaskStatusView reports.
+    Returns the final counts, the number of errors and the URL of their error report (None without errors).
+    """
+    try:
+        print(f"--- TASK: Import {user_type} from {path} [STARTED] ---")
+        with open(path, 'rb') as upload, ErrorReport() as report:
+            headers, rows = read_rows(upload)
+            importer = create_importer(user_type, headers, Semester.objects.get(pk=semester) if semester else None)
+
+            def on_chunk(processed):
+                self.update_state(state='PROGRESS', meta=import_progress(importer, processed))
+
+            processed = run_import(importer, rows, report, on_chunk=on_chunk)
+
+        message = (f"Processed {processed} rows: {importer.created_count} {user_type} created, "
+                   f"{importer.updated_count} updated, {importer.failed_count} failed.")
+        print(f"--- TASK: Import {user_type} [SUCCESS]: {message} ---")
+        return {
+            'status': 'SUCCESS',
+            'result': message,
+            **import_progress(importer, processed),
+            'error_count': report.count,
+            'error_report': reverse('coordinator_import_report', kwargs={'report_id': report.report_id}) if report.count else None,
+        }
+
+    except Exception as e:
+        print(f"!!! ERROR in import_users_file task: {e}")
+        raise
+    finally:
+        with contextlib.suppress(FileNotFoundError): # Already gone, e.g. when the task is redelivered
+            os.remove(path)
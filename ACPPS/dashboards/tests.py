@@ -1,3 +1,237 @@
-from django.test import TestCase
+import csv
+import importlib.util
+import io
+import os
+import re
+import tempfile
+from datetime import date
+from unittest import mock, skipIf, skipUnless
 
-# Create your tests here.
+from django.core.files.uploadedfile import SimpleUploadedFile
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from academics.models import Department, Programme, Semester
+from api.models import StandardisedTopic
+from users.models import StudentProfile, SupervisorProfile, User
+
+HAS_PYARROW = importlib.util.find_spec('pyarrow') is not None
+
+
+class CoordinatorExportTests(TestCase):
+    def setUp(self):
+        self.coordinator = User.objects.create_superuser('coordinator@example.com', None, user_type='supervisor', full_name='Coordinator')
+        self.client.force_login(self.coordinator)
+        topics = {name: StandardisedTopic.objects.create(name=name) for name in ('AI', 'Web')}
+        department = Department.objects.create(name='Computing')
+        programme = Programme.objects.create(name='BCS', department=department)
+        user = User.objects.create_user('lecturer@example.com', None, user_type='supervisor', full_name='Lecturer')
+        self.supervisor = SupervisorProfile.objects.create(
+            user=user, department=department, supervision_capacity=4, expertise='"Machine learning", "Web"',
+        )
+        self.supervisor.standardised_expertise.set(topics.values())
+
+        # Two semesters, so the export spans more than one chunk when chunks hold two students.
+        for year in (2024, 2025):
+            semester = Semester.objects.create(name=str(year), start_date=date(year, 1, 1), end_date=date(year, 6, 1))
+            self.semester = semester
+            for index in range(3):
+                user = User.objects.create_user(f's{year}{index}@imail.sunway.edu.my', None, user_type='student', full_name=f'Student {index}')
+                student = StudentProfile.objects.create(
+                    user=user, semester=semester, programme=programme, preference_text='I like AI',
+                    supervisor=self.supervisor if index == 0 else None,
+                )
+                student.positive_preferences.set([topics['AI']])
+                student.negative_preferences.set([topics['Web']] if index == 1 else [])
+
+    def export(self, user_type, query=''):
+        response = self.client.get(reverse('coordinator_export', kwargs={'user_type': user_type}) + query)
+        self.assertTrue(response.streaming)
+        return list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+
+    def parquet_export(self, user_type):
+        response = self.client.get(reverse('coordinator_export', kwargs={'user_type': user_type}) + '?format=parquet')
+        self.assertEqual(response['Content-Type'], 'application/vnd.apache.parquet')
+        return b''.join(response.streaming_content)
+
+    def test_students_export_streams_every_semester_in_chunks(self):
+        with mock.patch('dashboards.views.EXPORT_CHUNK_SIZE', 2):
+            rows = self.export('students')
+        self.assertEqual(rows[0][0], 'Student ID')
+        self.assertEqual([row[0] for row in rows[1:]], [f's{year}{index}' for year in (2024, 2025) for index in range(3)])
+        self.assertEqual(rows[1], ['s20240', 'Student 0', 'BCS', 'lecturer@example.com', 'I like AI', 'AI', '', '', '', ''])
+        self.assertEqual(rows[2][6], 'Web')
+
+    def test_students_export_queries_do_not_grow_with_each_row(self):
+        url = reverse('coordinator_export', kwargs={'user_type': 'students'})
+        with mock.patch('dashboards.views.EXPORT_CHUNK_SIZE', 3):
+            response = self.client.get(url)
+            # topic names, the student cursor, and four through-table queries for each of the two chunks
+            with self.assertNumQueries(10):
+                b''.join(response.streaming_content)
+
+    def test_supervisors_export_streams_formatted_rows(self):
+        rows = self.export('supervisors')
+        self.assertEqual(rows[1], [
+            'lecturer@example.com', 'Lecturer', 'Computing', '4', 'Yes',
+            'Machine learning; Web', 'AI; Web', '', '',
+        ])
+
+    def test_assignments_export_lists_matched_students_of_a_semester(self):
+        rows = self.export('assignments', f'?semester={self.semester.pk}')
+        self.assertEqual(rows, [
+            ['student_id', 'supervisor_id', 'supervisor_name', 'programme_match', 'matching_topics', 'conflicting_topics'],
+            ['s20250', 'lecturer@example.com', 'Lecturer', '', '', ''],
+        ])
+
+    @skipIf(HAS_PYARROW, "pyarrow is installed")
+    def test_parquet_export_without_pyarrow_explains_the_missing_dependency(self):
+        response = self.client.get(reverse('coordinator_export', kwargs={'user_type': 'students'}) + '?format=parquet', follow=True)
+        self.assertContains(response, 'pyarrow')
+
+    @skipUnless(HAS_PYARROW, "Parquet support needs pyarrow")
+    def test_parquet_export_keeps_topics_as_lists(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pq.read_table(io.BytesIO(self.parquet_export('students')))
+        self.assertEqual(table.num_rows, 6)
+        self.assertTrue(pa.types.is_list(table.schema.field('Positive Preferences').type))
+        self.assertEqual(table.column('Negative Preferences').to_pylist()[:2], [[], ['Web']])
+
+    @skipUnless(HAS_PYARROW, "Parquet support needs pyarrow")
+    def test_parquet_round_trip_restores_students_and_supervisors(self):
+        students = self.parquet_export('students')
+        supervisors = self.parquet_export('supervisors')
+        StudentProfile.objects.get(student_id='s20241').negative_preferences.clear()
+        self.supervisor.standardised_expertise.clear()
+
+        self.client.post(reverse('coordinator_import'), {
+            'import_students': '', 'semester': self.semester.pk,
+            'csv_file': SimpleUploadedFile('students.parquet', students),
+        })
+        self.client.post(reverse('coordinator_import'), {
+            'import_supervisors': '', 'csv_file': SimpleUploadedFile('supervisors.parquet', supervisors),
+        })
+        self.assertEqual(StudentProfile.objects.count(), 6)
+        student = StudentProfile.objects.get(student_id='s20241')
+        self.assertEqual(list(student.negative_preferences.values_list('name', flat=True)), ['Web'])
+        self.assertEqual(student.semester, self.semester)
+        self.supervisor.refresh_from_db()
+        self.assertEqual(sorted(self.supervisor.standardised_expertise.values_list('name', flat=True)), ['AI', 'Web'])
+        self.assertEqual(self.supervisor.expertise, '"Machine learning", "Web"')
+
+
+class ImportPipelineTests(TestCase):
+    def setUp(self):
+        spool_dir, report_dir = tempfile.TemporaryDirectory(), tempfile.TemporaryDirectory()
+        self.addCleanup(spool_dir.cleanup)
+        self.addCleanup(report_dir.cleanup)
+        self.spool_dir = spool_dir.name
+        self.enterContext(override_settings(IMPORT_SPOOL_DIR=self.spool_dir, IMPORT_REPORT_DIR=report_dir.name))
+        self.client.force_login(User.objects.create_superuser('coordinator@example.com', None, user_type='supervisor', full_name='Coordinator'))
+        self.semester = Semester.objects.create(name='2025', start_date=date(2025, 1, 1), end_date=date(2025, 6, 1))
+        Programme.objects.create(name='BCS', department=Department.objects.create(name='Computing'))
+
+    def upload(self, content, follow=False, **data):
+        return self.client.post(reverse('coordinator_import'), {
+            'import_students': '', 'background': '1', 'semester': self.semester.pk,
+            'csv_file': SimpleUploadedFile('students.csv', content.encode()), **data,
+        }, follow=follow)
+
+    def test_import_page_links_one_error_report_instead_of_a_message_per_row(self):
+        content = 'Full Name,Student ID,Programme\nStudent,s1,BCS\n' + ''.join(f'Student,x{index},Unknown\n' for index in range(4))
+        with mock.patch('dashboards.imports.IMPORT_CHUNK_SIZE', 2):
+            response = self.upload(content, background='', follow=True)
+        warnings = [message for message in response.context['messages'] if message.level_tag == 'warning']
+        self.assertEqual(len(response.context['messages']), 2)
+        self.assertIn('(4 in total)', warnings[0].message)
+        self.assertEqual(StudentProfile.objects.count(), 1)
+
+        report_url = re.search(r'href="([^"]+)"', warnings[0].message).group(1)
+        report = b''.join(self.client.get(report_url).streaming_content).decode().splitlines()
+        self.assertEqual(report[0], "Row 3: Programme 'Unknown' not found. Skipping.")
+        self.assertEqual(len(report), 4)
+
+    def test_upload_is_spooled_and_imported_by_the_task(self):
+        from dashboards.tasks import import_users_file
+
+        content = 'Full Name,Student ID,Programme\n' + ''.join(f'Student {index},s{index},BCS\n' for index in range(5)) + ',,\n'
+        with mock.patch('dashboards.views.import_users_file.delay', return_value=mock.Mock(id='task-1')) as delay:
+            response = self.upload(content)
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()['task_id'], 'task-1')
+        user_type, path, semester = delay.call_args.args
+        self.assertEqual((user_type, semester), ('students', self.semester.pk))
+        with open(path) as spooled:
+            self.assertEqual(spooled.read(), content)
+
+        with mock.patch('dashboards.imports.IMPORT_CHUNK_SIZE', 2), \
+                mock.patch.object(import_users_file, 'update_state') as update_state:
+            result = import_users_file(user_type, path, semester)
+        self.assertEqual(
+            [(call.kwargs['meta']['processed'], call.kwargs['meta']['created']) for call in update_state.call_args_list],
+            [(2, 2), (4, 4), (6, 5)],
+        )
+        self.assertEqual(update_state.call_args.kwargs['state'], 'PROGRESS')
+        self.assertEqual(
+            {key: result[key] for key in ('processed', 'created', 'updated', 'failed', 'error_count')},
+            {'processed': 6, 'created': 5, 'updated': 0, 'failed': 1, 'error_count': 1},
+        )
+        report = self.client.get(result['error_report'])
+        self.assertEqual(b''.join(report.streaming_content), b"Row 7: Missing required data (Full Name, Student ID, or Programme).\n")
+        self.assertEqual(StudentProfile.objects.filter(semester=self.semester).count(), 5)
+        self.assertFalse(os.path.exists(path))
+
+    def test_missing_headers_are_rejected_before_a_task_is_queued(self):
+        with mock.patch('dashboards.views.import_users_file.delay') as delay:
+            response = self.upload('Name,Programme\nStudent,BCS\n')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('must have headers', response.json()['error'])
+        delay.assert_not_called()
+        self.assertEqual(os.listdir(self.spool_dir), [])
+
+    def test_task_status_reports_import_progress(self):
+        progress = {'processed': 500, 'created': 0, 'updated': 0, 'failed': 3}
+        running = mock.Mock(status='PROGRESS', state='PROGRESS', info=progress)
+        running.successful.return_value = running.failed.return_value = False
+        with mock.patch('api.views.AsyncResult', return_value=running):
+            response = self.client.get(reverse('task_status', kwargs={'task_id': 'task-1'}))
+        self.assertEqual(response.json(), {'task_id': 'task-1', 'status': 'PROGRESS', 'result': progress})
+
+
+class CoordinatorMatchingViewTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser('coordinator@example.com', None, user_type='supervisor', full_name='Coordinator'))
+        self.semester = Semester.objects.create(name='2025', start_date=date(2025, 1, 1), end_date=date(2025, 6, 1))
+        department = Department.objects.create(name='Computing')
+        self.programme = Programme.objects.create(name='BCS', department=department)
+        self.topics = [StandardisedTopic.objects.create(name=name) for name in ('AI', 'Web', 'Security')]
+        user = User.objects.create_user('lecturer@example.com', None, user_type='supervisor', full_name='Lecturer')
+        self.supervisor = SupervisorProfile.objects.create(user=user, department=department)
+        self.add_students(0, 3)
+
+    def add_students(self, start, stop):
+        for index in range(start, stop):
+            user = User.objects.create_user(f's{index}@imail.sunway.edu.my', None, user_type='student', full_name=f'Student {index}')
+            student = StudentProfile.objects.create(
+                user=user, semester=self.semester, programme=self.programme,
+                supervisor=self.supervisor, programme_match_type=1,
+            )
+            student.matching_topics.set(self.topics[:2])
+            student.conflicting_topics.set(self.topics[2:])
+
+    def test_query_count_does_not_grow_with_the_cohort(self):
+        url = reverse('coordinator_match') + f'?semester={self.semester.pk}'
+        # session, user, coordinator check, semesters, students with their user, programme and supervisor,
+        # and one query per topic list
+        with self.assertNumQueries(7):
+            response = self.client.get(url)
+        self.assertContains(response, 'Lecturer - (lecturer@example.com)', count=3)
+        self.assertContains(response, '<li>Security</li>', count=3)
+
+        self.add_students(3, 10)
+        with self.assertNumQueries(7):
+            response = self.client.get(url)
+        self.assertContains(response, '<li>AI</li>', count=10)
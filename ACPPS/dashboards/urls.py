@@ -10,6 +10,7 @@ from .views import (
     UpdateProfileView,
     CoordinatorMatchingView,
     CoordinatorImportView,
+    CoordinatorImportReportView,
     CoordinatorExportView,
     DeleteStudentsBySemesterView,
     ToggleSupervisorAcceptanceView,
@@ -26,6 +27,7 @@ urlpatterns = [
     path('coordinator/label/', CoordinatorLabelingView.as_view(), name='coordinator_label'),
     path('coordinator/match/', CoordinatorMatchingView.as_view(), name='coordinator_match'),
     path('coordinator/import/', CoordinatorImportView.as_view(), name='coordinator_import'),
+    path('coordinator/import/report/<uuid:report_id>/', CoordinatorImportReportView.as_view(), name='coordinator_import_report'),
     path('export/<str:user_type>/', CoordinatorExportView.as_view(), name='coordinator_export'),
     path('students/delete-by-semester/', DeleteStudentsBySemesterView.as_view(), name='delete_students_by_semester'),
 
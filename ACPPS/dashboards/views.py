@@ -1,9 +1,10 @@
 import csv
-import io
 import datetime
+import itertools
 import json
+import os
 import re
-from django.http import HttpResponse, JsonResponse
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.db import transaction
 from django.shortcuts import render, redirect, get_object_or_404, render
 from django.urls import reverse
@@ -12,7 +13,8 @@ from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.decorators import login_required
 from django.utils.decorators import method_decorator
-from django.db.models import Count, Exists, OuterRef
+from django.utils.html import format_html
+from django.db.models import Count, Exists, OuterRef, Prefetch
 from django.core.exceptions import ValidationError
 
 # Import your forms and models
@@ -22,8 +24,36 @@ from users.forms import (
 )
 from users.models import User, StudentProfile, SupervisorProfile, CoordinatorProfile
 from users.forms import CsvImportForm
-from academics.models import Programme, Department, School, Semester, ProgrammePreferenceGroup
+from academics.models import Programme, Semester
 from api.models import OriginalTopic, StandardisedTopic
+from .columnar import PARQUET_CONTENT_TYPE, ColumnarFormatUnavailable, write_parquet
+from .imports import IMPORTERS, ErrorReport, create_importer, read_rows, report_path, run_import, spool_upload
+from .tasks import import_users_file
+
+# Rows fetched per database round trip by the exports (and rows per Parquet row group).
+EXPORT_CHUNK_SIZE = 2000
+
+class Echo:
+    """File-like object whose write() returns the value, so csv.writer can feed a StreamingHttpResponse."""
+    def write(self, value):
+        return value
+
+def chunked(iterable, size):
+    """Yields lists of up to size consecutive items."""
+    iterator = iter(iterable)
+    while chunk := list(itertools.islice(iterator, size)):
+        yield chunk
+
+def topic_names_by_owner(through_model, owner_field, owner_ids, topic_names):
+    """
+    Reads one ManyToMany through-table for the given owners and returns {owner id: [topic names]},
+    naming topics from the pre-loaded {topic id: name} mapping instead of joining the topic table.
+    """
+    names = {}
+    rows = through_model.objects.filter(**{f'{owner_field}__in': owner_ids}).order_by('pk').values_list(owner_field, 'standardisedtopic_id')
+    for owner_id, topic_id in rows:
+        names.setdefault(owner_id, []).append(topic_names[topic_id])
+    return names
 
 # --- Mixin for security ---
 class CoordinatorRequiredMixin(LoginRequiredMixin):
@@ -243,8 +273,15 @@ class CoordinatorMatchingView(CoordinatorRequiredMixin, View):
         selected_semester_id_str = request.GET.get('semester')
         selected_semester_id = None
 
-        # Base query for student profiles
-        student_profiles_query = StudentProfile.objects.select_related('user', 'semester')
+        # Base query for student profiles, with everything the table shows loaded up front:
+        # one joined query for the profiles plus one query per topic list, however many students there are.
+        topics = StandardisedTopic.objects.only('name')
+        student_profiles_query = StudentProfile.objects.select_related(
+            'user', 'semester', 'programme', 'supervisor__user',
+        ).prefetch_related(
+            Prefetch('matching_topics', queryset=topics),
+            Prefetch('conflicting_topics', queryset=topics),
+        )
 
         if selected_semester_id_str:
             try:
@@ -275,7 +312,8 @@ class CoordinatorImportView(CoordinatorRequiredMixin, View):
     """
     Provides a page for coordinators to import students and supervisors
     from separate CSV files. Handles both creation of new users and
-    updates to existing users.
+    updates to existing users, either within the request or, for large
+    files, in a background task.
     """
     template_name = 'dashboard/coordinator_import.html'
 
@@ -290,6 +328,8 @@ class CoordinatorImportView(CoordinatorRequiredMixin, View):
 
     def post(self, request, *args, **kwargs):
         """Handles the form submission for either students or supervisors."""
+        if request.POST.get('background') and ('import_students' in request.POST or 'import_supervisors' in request.POST):
+            return self._start_background_import(request)
         if 'import_students' in request.POST:
             return self._handle_student_import(request)
         elif 'import_supervisors' in request.POST:
@@ -298,19 +338,72 @@ class CoordinatorImportView(CoordinatorRequiredMixin, View):
             messages.error(request, "Invalid submission.")
             return redirect('coordinator_import')
 
-    def _parse_boolean(self, value):
-        """Helper to interpret various string representations of a boolean."""
-        if isinstance(value, str):
-            val = value.lower().strip()
-            if val in ('true', '1', 't', 'y', 'yes'):
-                return True
-            if val in ('false', '0', 'f', 'n', 'no'):
-                return False
-        return None # Return None for empty or ambiguous values
+    def _start_background_import(self, request):
+        """
+        Spools the upload to IMPORT_SPOOL_DIR and imports it in a Celery task, so the request returns
+        as soon as the file is saved. Answers with JSON holding the task id; TaskStatusView reports the
+        rows processed, created, updated and failed while the task runs.
+        """
+        user_type = 'students' if 'import_students' in request.POST else 'supervisors'
+        form = CsvImportForm(request.POST, request.FILES)
+        if not form.is_valid():
+            return JsonResponse({'error': "Please upload a valid CSV or Parquet file."}, status=400)
+
+        semester_pk = None
+        if user_type == 'students':
+            try:
+                semester_pk = Semester.objects.get(pk=request.POST.get('semester')).pk
+            except (Semester.DoesNotExist, ValueError, TypeError):
+                return JsonResponse({'error': "A valid semester must be selected before importing students."}, status=400)
+
+        path = spool_upload(form.cleaned_data['csv_file'])
+        error = None
+        try:
+            with open(path, 'rb') as spooled:
+                headers, _ = read_rows(spooled)
+            required_headers = IMPORTERS[user_type].required_headers
+            if not required_headers.issubset(headers):
+                error = f"CSV for {user_type} must have headers: {', '.join(required_headers)}"
+        except ColumnarFormatUnavailable as e:
+            error = str(e)
+        except Exception:
+            error = "Could not read the uploaded file. Ensure it is a valid, UTF-8 encoded CSV or a Parquet file."
+        if error:
+            os.remove(path)
+            return JsonResponse({'error': error}, status=400)
+
+        task = import_users_file.delay(user_type, path, semester_pk)
+        return JsonResponse(
+            {'message': f"The {user_type} import has been started in the background.", 'task_id': task.id},
+            status=202,
+        )
+
+    def _run_import(self, request, user_type, importer, rows):
+        """
+        Imports the rows chunk by chunk and reports the outcome with a few messages. Per-row errors are
+        written to an error report the coordinator can download, not turned into one message each.
+        """
+        with ErrorReport() as report:
+            try:
+                run_import(importer, rows, report)
+            except Exception as e:
+                messages.error(request, f"An unexpected database error occurred while importing {user_type}: {e}")
+        created_count, updated_count = importer.created_count, importer.updated_count
+
+        # Provide feedback
+        if created_count > 0: messages.success(request, f"Successfully created {created_count} new {user_type}.")
+        if updated_count > 0: messages.info(request, f"Successfully updated {updated_count} existing {user_type}.")
+        if report.count:
+            messages.warning(request, format_html(
+                'Some rows could not be imported or had warnings ({} in total). <a href="{}" class="alert-link">Download the error report</a>.',
+                report.count, reverse('coordinator_import_report', kwargs={'report_id': report.report_id}),
+            ))
+        if created_count == 0 and updated_count == 0 and not report.count:
+            messages.info(request, f"The file did not contain any new or updated {user_type[:-1]} information.")
 
     def _handle_student_import(self, request):
         """
-        Processes the uploaded CSV file for students. Creates or updates records.
+        Processes the uploaded CSV file for students. Creates or updates records in bulk.
         
         Required CSV Headers:
         - 'Full Name'
@@ -334,14 +427,16 @@ class CoordinatorImportView(CoordinatorRequiredMixin, View):
         csv_file = form.cleaned_data['csv_file']
         
         try:
-            reader = csv.DictReader(io.TextIOWrapper(csv_file, 'utf-8-sig'))
-            headers = set(map(str.strip, reader.fieldnames or []))
-            required_headers = {'Full Name', 'Student ID', 'Programme'}
+            headers, reader = read_rows(csv_file)
+            required_headers = IMPORTERS['students'].required_headers
             if not required_headers.issubset(headers):
                 messages.error(request, f"CSV for students must have headers: {', '.join(required_headers)}")
                 return redirect('coordinator_import')
+        except ColumnarFormatUnavailable as e:
+            messages.error(request, str(e))
+            return redirect('coordinator_import')
         except Exception:
-            messages.error(request, "Could not read the uploaded file. Ensure it is a valid, UTF-8 encoded CSV.")
+            messages.error(request, "Could not read the uploaded file. Ensure it is a valid, UTF-8 encoded CSV or a Parquet file.")
             return redirect('coordinator_import')
 
         try:
@@ -350,111 +445,14 @@ class CoordinatorImportView(CoordinatorRequiredMixin, View):
             messages.error(request, "A valid semester must be selected before importing students.")
             return redirect('coordinator_import')
 
-        created_count, updated_count, errors = 0, 0, []
-        
-        # Define mappings for M2M fields to their CSV headers
-        m2m_field_map = {
-            'positive_preferences': 'Positive Preferences',
-            'negative_preferences': 'Negative Preferences',
-            'matching_topics': 'Matching Topics',
-            'conflicting_topics': 'Conflicting Topics',
-        }
-
-        for i, row in enumerate(reader, start=2):
-            try:
-                with transaction.atomic():
-                    full_name = row.get('Full Name', '').strip()
-                    student_id = row.get('Student ID', '').strip().lower()
-                    programme_name = row.get('Programme', '').strip()
-
-                    if not all([full_name, student_id, programme_name]):
-                        errors.append(f"Row {i}: Missing required data (Full Name, Student ID, or Programme).")
-                        continue
-
-                    programme = Programme.objects.get(name__iexact=programme_name)
-                    email = f"{student_id}@imail.sunway.edu.my"
-                    
-                    # --- Prepare data for direct fields and ForeignKeys ---
-                    profile_data = {
-                        'preference_text': row.get('Preference Text', '').strip() if 'Preference Text' in headers else None
-                    }
-
-                    if 'Supervisor Email' in headers and row.get('Supervisor Email', '').strip():
-                        supervisor_email = row.get('Supervisor Email').strip()
-                        profile_data['supervisor'] = SupervisorProfile.objects.get(user__email__iexact=supervisor_email)
-                    
-                    if 'Programme Match Type' in headers and row.get('Programme Match Type', '').strip():
-                        profile_data['programme_match_type'] = int(row.get('Programme Match Type').strip())
-
-                    # --- Create/Update User and StudentProfile (main object) ---
-                    user, user_created = User.objects.get_or_create(
-                        email=email,
-                        defaults={'full_name': full_name, 'user_type': 'student'}
-                    )
-                    
-                    if user_created:
-                        user.set_password("defaultPassword123!") # Consider a more secure default password strategy
-                        user.save()
-                    else:
-                        # Update existing user info if needed
-                        user.full_name = full_name
-                        user.user_type = 'student'
-                        user.save()
-                    
-                    profile, profile_created = StudentProfile.objects.update_or_create(
-                        user=user,
-                        defaults={'programme': programme, 'semester': semester, **profile_data}
-                    )
-                    
-                    # --- Handle ManyToManyFields post-creation/update ---
-                    for field_name, header_name in m2m_field_map.items():
-                        if header_name in headers:
-                            topic_names_str = row.get(header_name, '').strip()
-                            m2m_manager = getattr(profile, field_name)
-
-                            if not topic_names_str:
-                                m2m_manager.clear() # Clear relationship if cell is empty
-                                continue
-
-                            # Split by semicolon and strip whitespace from each topic name
-                            topic_names = [name.strip() for name in topic_names_str.split(';') if name.strip()]
-                            
-                            # Find existing topics and set the relationship
-                            topics = StandardisedTopic.objects.filter(name__in=topic_names)
-                            m2m_manager.set(topics)
-                            
-                            found_topic_names = {topic.name for topic in topics}
-                            missing_topics = set(topic_names) - found_topic_names
-                            if missing_topics:
-                                errors.append(f"Row {i}: For student {email}, could not find topics: {', '.join(missing_topics)}")
-
-                    if profile_created: created_count += 1
-                    else: updated_count += 1
-
-            except Programme.DoesNotExist:
-                errors.append(f"Row {i}: Programme '{programme_name}' not found. Skipping.")
-            except SupervisorProfile.DoesNotExist:
-                errors.append(f"Row {i}: Supervisor with email '{row.get('Supervisor Email')}' not found. Skipping.")
-            except (ValueError, TypeError) as e:
-                errors.append(f"Row {i}: Invalid data. Check 'Programme Match Type' is a number. Details: {e}")
-            except Exception as e:
-                errors.append(f"Row {i}: An unexpected database error occurred for student ID {student_id}: {e}")
-
-        # Provide feedback
-        if created_count > 0: messages.success(request, f"Successfully created {created_count} new students.")
-        if updated_count > 0: messages.info(request, f"Successfully updated {updated_count} existing students.")
-        if errors:
-            messages.warning(request, "Some rows could not be imported or had warnings. See details below:")
-            for error in errors: messages.error(request, error)
-        if created_count == 0 and updated_count == 0 and not errors:
-            messages.info(request, "The file did not contain any new or updated student information.")
-        
+        # Rows are imported in chunks, each parsed, resolved and written in bulk (see dashboards/imports.py).
+        self._run_import(request, 'students', create_importer('students', headers, semester), reader)
         return redirect('coordinator_import')
 
     
     def _handle_supervisor_import(self, request):
         """
-        Processes the uploaded CSV file for supervisors. Creates or updates records.
+        Processes the uploaded CSV file for supervisors. Creates or updates records in bulk.
         
         Required CSV Headers:
         - 'Full Name'
@@ -477,239 +475,191 @@ class CoordinatorImportView(CoordinatorRequiredMixin, View):
         csv_file = form.cleaned_data['csv_file']
 
         try:
-            reader = csv.DictReader(io.TextIOWrapper(csv_file, 'utf-8-sig'))
-            headers = set(map(str.strip, reader.fieldnames or []))
-            required_headers = {'Full Name', 'Department', 'Email'}
+            headers, reader = read_rows(csv_file)
+            required_headers = IMPORTERS['supervisors'].required_headers
             if not required_headers.issubset(headers):
                 messages.error(request, f"CSV for supervisors must have headers: {', '.join(required_headers)}")
                 return redirect('coordinator_import')
+        except ColumnarFormatUnavailable as e:
+            messages.error(request, str(e))
+            return redirect('coordinator_import')
         except Exception:
-            messages.error(request, "Could not read the uploaded file. Ensure it is a valid, UTF-8 encoded CSV.")
+            messages.error(request, "Could not read the uploaded file. Ensure it is a valid, UTF-8 encoded CSV or a Parquet file.")
             return redirect('coordinator_import')
 
-        created_count, updated_count, errors = 0, 0, []
+        # Rows are imported in chunks, each parsed, resolved and written in bulk (see dashboards/imports.py).
+        self._run_import(request, 'supervisors', create_importer('supervisors', headers), reader)
+        return redirect('coordinator_import')
 
-        for i, row in enumerate(reader, start=2):
-            try:
-                with transaction.atomic():
-                    full_name = row.get('Full Name', '').strip()
-                    email = row.get('Email', '').strip().lower()
-                    org_unit_name = row.get('Department', '').strip()
-
-                    if not all([full_name, email, org_unit_name]):
-                        errors.append(f"Row {i}: Missing required data (Full Name, Department, or Email).")
-                        continue
-                    
-                    department, school = None, None
-                    try:
-                        department = Department.objects.get(name__iexact=org_unit_name)
-                        school = department.school
-                    except Department.DoesNotExist:
-                        school = School.objects.get(name__iexact=org_unit_name)
-                    
-                    # --- Prepare data for direct fields and ForeignKeys ---
-                    profile_data = {}
-
-                    if 'Expertise' in headers:
-                        expertise_str = row.get('Expertise', '').strip()
-                        # Convert simple semicolon-separated list to the required quoted format
-                        expertise_items = [f'"{item.strip()}"' for item in expertise_str.split(';') if item.strip()]
-                        profile_data['expertise'] = ", ".join(expertise_items)
-
-                    if 'Supervision Capacity' in headers and row.get('Supervision Capacity', '').strip():
-                        profile_data['supervision_capacity'] = int(row.get('Supervision Capacity').strip())
-                    
-                    if 'Accepting Students' in headers:
-                        accepting = self._parse_boolean(row.get('Accepting Students'))
-                        if accepting is not None: profile_data['accepting_students'] = accepting
-                    
-                    if 'Preferred Programmes First Choice' in headers and row.get('Preferred Programmes First Choice', '').strip():
-                        group_name = row.get('Preferred Programmes First Choice').strip()
-                        profile_data['preferred_programmes_first_choice'] = ProgrammePreferenceGroup.objects.get(name__iexact=group_name)
-                    
-                    if 'Preferred Programmes Second Choice' in headers and row.get('Preferred Programmes Second Choice', '').strip():
-                        group_name = row.get('Preferred Programmes Second Choice').strip()
-                        profile_data['preferred_programmes_second_choice'] = ProgrammePreferenceGroup.objects.get(name__iexact=group_name)
-
-                    # --- Create/Update User and SupervisorProfile (main object) ---
-                    user, user_created = User.objects.get_or_create(
-                        email=email,
-                        defaults={'full_name': full_name, 'user_type': 'supervisor'}
-                    )
-                    if user_created:
-                        user.set_password("defaultPassword123!")
-                        user.save()
-                    else:
-                        user.full_name = full_name
-                        user.user_type = 'supervisor'
-                        user.save()
-                    
-                    profile, profile_created = SupervisorProfile.objects.update_or_create(
-                        user=user,
-                        defaults={'department': department, 'school': school, **profile_data}
-                    )
-
-                    # --- Handle ManyToManyField ('standardised_expertise') post-creation/update ---
-                    if 'Standardised Expertise' in headers:
-                        topic_names_str = row.get('Standardised Expertise', '').strip()
-                        if not topic_names_str:
-                            profile.standardised_expertise.clear()
-                        else:
-                            topic_names = [name.strip() for name in topic_names_str.split(';') if name.strip()]
-                            topics = StandardisedTopic.objects.filter(name__in=topic_names)
-                            profile.standardised_expertise.set(topics)
-                            
-                            found_topic_names = {topic.name for topic in topics}
-                            missing_topics = set(topic_names) - found_topic_names
-                            if missing_topics:
-                                errors.append(f"Row {i}: For supervisor {email}, could not find standardised topics: {', '.join(missing_topics)}")
-
-                    if profile_created: created_count += 1
-                    else: updated_count += 1
-
-            except (Department.DoesNotExist, School.DoesNotExist):
-                errors.append(f"Row {i}: Department/School '{org_unit_name}' not found. Skipping.")
-            except ProgrammePreferenceGroup.DoesNotExist as e:
-                errors.append(f"Row {i}: A Programme Preference Group was not found. Details: {e}")
-            except (ValueError, TypeError):
-                errors.append(f"Row {i}: Invalid 'Supervision Capacity'. It must be a whole number. Skipping.")
-            except Exception as e:
-                errors.append(f"Row {i}: An unexpected database error occurred for supervisor {email}: {e}")
+class CoordinatorImportReportView(CoordinatorRequiredMixin, View):
+    """Downloads the per-row error report of an import (see dashboards/imports.py)."""
 
-        # Provide feedback
-        if created_count > 0: messages.success(request, f"Successfully created {created_count} new supervisors.")
-        if updated_count > 0: messages.info(request, f"Successfully updated {updated_count} existing supervisors.")
-        if errors:
-            messages.warning(request, "Some rows could not be imported or had warnings. See details below:")
-            for error in errors: messages.error(request, error)
-        if created_count == 0 and updated_count == 0 and not errors:
-            messages.info(request, "The file did not contain any new or updated supervisor information.")
-            
-        return redirect('coordinator_import')
+    def get(self, request, report_id):
+        path = report_path(report_id)
+        if not os.path.exists(path):
+            raise Http404("This error report no longer exists.")
+        return FileResponse(open(path, 'rb'), as_attachment=True, filename=f"import-errors-{report_id}.txt", content_type='text/plain')
 
 class CoordinatorExportView(CoordinatorRequiredMixin, View):
     """
-    Handles exporting student or supervisor data to a CSV file.
-    The exported file is formatted to be re-importable by CoordinatorImportView.
+    Handles exporting student, supervisor or assignment data to a CSV file, or with
+    ?format=parquet to a Parquet file whose topic columns are native lists.
+    Student and supervisor files are formatted to be re-importable by CoordinatorImportView.
     """
+    # (column, Parquet type) pairs; CSV files use the same column names.
+    student_columns = [
+        ('Student ID', 'string'), ('Full Name', 'string'), ('Programme', 'string'), ('Supervisor Email', 'string'),
+        ('Preference Text', 'string'), ('Positive Preferences', 'list'), ('Negative Preferences', 'list'),
+        ('Programme Match Type', 'int'), ('Matching Topics', 'list'), ('Conflicting Topics', 'list'),
+    ]
+    supervisor_columns = [
+        ('Email', 'string'), ('Full Name', 'string'), ('Department', 'string'), ('Supervision Capacity', 'int'),
+        ('Accepting Students', 'bool'), ('Expertise', 'list'), ('Standardised Expertise', 'list'),
+        ('Preferred Programmes First Choice', 'string'), ('Preferred Programmes Second Choice', 'string'),
+    ]
+    # Same layout as the matching task's assignments (e.g. assignments_semester_2.csv), minus the solver's match_score.
+    assignment_columns = [
+        ('student_id', 'string'), ('supervisor_id', 'string'), ('supervisor_name', 'string'),
+        ('programme_match', 'int'), ('matching_topics', 'list'), ('conflicting_topics', 'list'),
+    ]
 
     def get(self, request, *args, **kwargs):
         """
-        Determines whether to export students or supervisors based on the URL.
+        Determines whether to export students, supervisors or assignments based on the URL.
+        Assignments can be limited to one semester with ?semester=<pk>.
         """
         user_type = kwargs.get('user_type')
         if user_type == 'students':
-            return self._export_students(request)
+            columns, chunks = self.student_columns, self._student_chunks()
         elif user_type == 'supervisors':
-            return self._export_supervisors(request)
+            columns, chunks = self.supervisor_columns, self._supervisor_chunks()
+        elif user_type == 'assignments':
+            columns, chunks = self.assignment_columns, self._assignment_chunks(request.GET.get('semester'))
         else:
             messages.error(request, "Invalid export type specified.")
             return redirect('dashboard') # Or some other appropriate page
 
-    def _export_students(self, request):
+        filename = f"{user_type}_export_{datetime.date.today()}"
+        if request.GET.get('format') == 'parquet':
+            try:
+                output = write_parquet(columns, chunks)
+            except ColumnarFormatUnavailable as e:
+                messages.error(request, str(e))
+                return redirect('coordinator_import')
+            return FileResponse(output, as_attachment=True, filename=f"{filename}.parquet", content_type=PARQUET_CONTENT_TYPE)
+        return self._streaming_csv_response(f"{filename}.csv", [name for name, _ in columns], chunks)
+
+    def _streaming_csv_response(self, filename, header, chunks):
         """
-        Generates and returns a CSV file of all student data.
+        Streams the CSV while it is being generated: the header goes out immediately and each
+        row is written as the queryset iterator reaches it, so memory use does not grow with the export.
+        List cells are joined with "; " and booleans written as Yes/No, as the importer expects.
         """
-        response = HttpResponse(
+        def _format_cell(value):
+            if isinstance(value, list):
+                return "; ".join(value)
+            if isinstance(value, bool):
+                return 'Yes' if value else 'No'
+            return '' if value is None else value
+
+        writer = csv.writer(Echo())
+        rows = (writer.writerow([_format_cell(value) for value in row]) for chunk in chunks for row in chunk)
+        return StreamingHttpResponse(
+            itertools.chain([writer.writerow(header)], rows),
             content_type='text/csv',
-            headers={'Content-Disposition': f'attachment; filename="students_export_{datetime.date.today()}.csv"'},
+            headers={'Content-Disposition': f'attachment; filename="{filename}"'},
         )
 
-        writer = csv.writer(response)
-        header = [
-            'Student ID', 'Full Name', 'Programme', 'Supervisor Email',
-            'Preference Text', 'Positive Preferences', 'Negative Preferences',
-            'Programme Match Type', 'Matching Topics', 'Conflicting Topics'
-        ]
-        writer.writerow(header)
-
-        def _format_m2m_for_csv(manager):
-            """Helper to format a ManyToMany related manager into a semicolon-separated string."""
-            return "; ".join([topic.name for topic in manager.all()])
-
-        # Optimize query to fetch related data in one go
-        # Use select_related for FK/OneToOne and prefetch_related for M2M/Reverse FK
-        students = StudentProfile.objects.select_related(
-            'user', 'programme', 'supervisor__user'
-        ).prefetch_related(
-            'positive_preferences',
-            'negative_preferences',
-            'matching_topics',
-            'conflicting_topics'
-        ).all()
-
-        for profile in students:
-            writer.writerow([
-                profile.student_id,
-                profile.user.full_name,
-                profile.programme.name if profile.programme else '',
-                profile.supervisor.user.email if profile.supervisor and profile.supervisor.user else '',
-                profile.preference_text or '',
-                _format_m2m_for_csv(profile.positive_preferences),
-                _format_m2m_for_csv(profile.negative_preferences),
-                profile.programme_match_type if profile.programme_match_type is not None else '',
-                _format_m2m_for_csv(profile.matching_topics),
-                _format_m2m_for_csv(profile.conflicting_topics),
-            ])
-
-        return response
-
-    def _export_supervisors(self, request):
+    def _student_chunks(self):
         """
-        Generates and returns a CSV file of all supervisor data.
+        Yields the student rows in chunks of EXPORT_CHUNK_SIZE. Students are read through a
+        server-side cursor where the database supports one; the four topic fields of a chunk are
+        fetched with one through-table query each and named from a single topic lookup.
         """
-        response = HttpResponse(
-            content_type='text/csv',
-            headers={'Content-Disposition': f'attachment; filename="supervisors_export_{datetime.date.today()}.csv"'},
-        )
-
-        writer = csv.writer(response)
-        header = [
-            'Email', 'Full Name', 'Department', 'Supervision Capacity',
-            'Accepting Students', 'Expertise', 'Standardised Expertise',
-            'Preferred Programmes First Choice', 'Preferred Programmes Second Choice'
-        ]
-        writer.writerow(header)
-
-        def _format_expertise_for_csv(expertise_str):
-            """
-            Parses the database format ' "item1", "item2" ' into 'item1; item2'.
-            """
-            if not expertise_str:
-                return ""
-            # Find all content within quotes
-            items = re.findall(r'"([^"]*)"', expertise_str)
-            return "; ".join(items)
-        
-        def _format_m2m_for_csv(manager):
-            """Helper to format a ManyToMany related manager into a semicolon-separated string."""
-            return "; ".join([item.name for item in manager.all()])
-
-        # Optimize query to fetch all related data efficiently
-        supervisors = SupervisorProfile.objects.select_related(
-            'user', 'department', 'school',
-            'preferred_programmes_first_choice', 'preferred_programmes_second_choice'
-        ).prefetch_related('standardised_expertise').all()
-
-        for profile in supervisors:
-            # The import function checks for Department name first, then School name.
-            # Export the Department name if it exists, otherwise the School name.
-            org_unit_name = profile.department.name if profile.department else \
-                            (profile.school.name if profile.school else '')
-
-            writer.writerow([
-                profile.user.email,
-                profile.user.full_name,
-                org_unit_name,
-                profile.supervision_capacity,
-                'Yes' if profile.accepting_students else 'No',
-                _format_expertise_for_csv(profile.expertise),
-                _format_m2m_for_csv(profile.standardised_expertise),
-                profile.preferred_programmes_first_choice.name if profile.preferred_programmes_first_choice else '',
-                profile.preferred_programmes_second_choice.name if profile.preferred_programmes_second_choice else '',
-            ])
-            
-        return response
+        topic_names = dict(StandardisedTopic.objects.values_list('id', 'name'))
+        students = StudentProfile.objects.order_by('pk').values_list(
+            'pk', 'student_id', 'user__full_name', 'programme__name', 'supervisor__user__email',
+            'preference_text', 'programme_match_type',
+        ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+        topic_fields = ('positive_preferences', 'negative_preferences', 'matching_topics', 'conflicting_topics')
+
+        for chunk in chunked(students, EXPORT_CHUNK_SIZE):
+            pks = [row[0] for row in chunk]
+            topics = {
+                field: topic_names_by_owner(getattr(StudentProfile, field).through, 'studentprofile_id', pks, topic_names)
+                for field in topic_fields
+            }
+            yield [
+                [
+                    student_id,
+                    full_name,
+                    programme or '',
+                    supervisor_email or '',
+                    preference_text or '',
+                    topics['positive_preferences'].get(pk, []),
+                    topics['negative_preferences'].get(pk, []),
+                    match_type,
+                    topics['matching_topics'].get(pk, []),
+                    topics['conflicting_topics'].get(pk, []),
+                ]
+                for pk, student_id, full_name, programme, supervisor_email, preference_text, match_type in chunk
+            ]
+
+    def _supervisor_chunks(self):
+        """
+        Yields the supervisor rows in chunks, like _student_chunks.
+        """
+        topic_names = dict(StandardisedTopic.objects.values_list('id', 'name'))
+        supervisors = SupervisorProfile.objects.order_by('pk').values_list(
+            'pk', 'user__email', 'user__full_name', 'department__name', 'school__name', 'supervision_capacity',
+            'accepting_students', 'expertise',
+            'preferred_programmes_first_choice__name', 'preferred_programmes_second_choice__name',
+        ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+        for chunk in chunked(supervisors, EXPORT_CHUNK_SIZE):
+            expertise = topic_names_by_owner(
+                SupervisorProfile.standardised_expertise.through, 'supervisorprofile_id',
+                [row[0] for row in chunk], topic_names,
+            )
+            yield [
+                [
+                    email,
+                    full_name,
+                    # The import function checks for Department name first, then School name.
+                    # Export the Department name if it exists, otherwise the School name.
+                    department or school or '',
+                    capacity,
+                    accepting,
+                    # The database format ' "item1", "item2" ' becomes ['item1', 'item2'].
+                    re.findall(r'"([^"]*)"', expertise_text or ''),
+                    expertise.get(pk, []),
+                    first_choice or '',
+                    second_choice or '',
+                ]
+                for (pk, email, full_name, department, school, capacity, accepting,
+                     expertise_text, first_choice, second_choice) in chunk
+            ]
+
+    def _assignment_chunks(self, semester=None):
+        """
+        Yields the matched students' assignments in chunks, like _student_chunks.
+        """
+        topic_names = dict(StandardisedTopic.objects.values_list('id', 'name'))
+        students = StudentProfile.objects.filter(supervisor__isnull=False)
+        if semester:
+            students = students.filter(semester=semester)
+        students = students.order_by('pk').values_list(
+            'pk', 'student_id', 'supervisor__user__email', 'supervisor__user__full_name', 'programme_match_type',
+        ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+        for chunk in chunked(students, EXPORT_CHUNK_SIZE):
+            pks = [row[0] for row in chunk]
+            matching = topic_names_by_owner(StudentProfile.matching_topics.through, 'studentprofile_id', pks, topic_names)
+            conflicting = topic_names_by_owner(StudentProfile.conflicting_topics.through, 'studentprofile_id', pks, topic_names)
+            yield [
+                [student_id, email, full_name, match_type, matching.get(pk, []), conflicting.get(pk, [])]
+                for pk, student_id, email, full_name, match_type in chunk
+            ]
 
 class DeleteStudentsBySemesterView(CoordinatorRequiredMixin, View):
     """
@@ -32,10 +32,28 @@ document.addEventListener('DOMContentLoaded', function() {
                 const response = await fetch(`/api/coordinator/task-status/${taskId}/`);
                 const data = await response.json();
 
+                if (data.status === 'PROGRESS' && data.result) {
+                    // Import tasks report their row counts while they run
+                    const progress = data.result;
+                    statusElement.innerHTML = `Processed ${progress.processed} rows: ${progress.created} created, ${progress.updated} updated, ${progress.failed} failed. <span class="spinner-border spinner-border-sm"></span>`;
+                }
+
                 if (data.status === 'SUCCESS' || data.status === 'FAILURE') {
                     clearInterval(pollingInterval); 
 
-                    if (data.status === 'SUCCESS') {
+                    if (data.status === 'SUCCESS' && data.result?.error_report) {
+                        // Keep the link to the error report on screen instead of reloading
+                        statusElement.className = 'mt-3 alert alert-warning';
+                        statusElement.textContent = `Success: ${data.result.result} ${data.result.error_count} errors or warnings were recorded. `;
+                        const reportLink = document.createElement('a');
+                        reportLink.href = data.result.error_report;
+                        reportLink.className = 'alert-link';
+                        reportLink.textContent = 'Download the error report';
+                        statusElement.appendChild(reportLink);
+                        button.disabled = false;
+                        button.innerHTML = originalButtonText;
+
+                    } else if (data.status === 'SUCCESS') {
                         statusElement.className = 'mt-3 alert alert-success';
                         let successMessage = `Success: ${data.result?.result || 'Task completed.'}`;
                         statusElement.textContent = `${successMessage} The page will now reload.`;
@@ -72,10 +90,12 @@ document.addEventListener('DOMContentLoaded', function() {
         button.innerHTML = `<span class="spinner-border spinner-border-sm"></span> Starting...`;
         
         try {
+            // FormData bodies (file uploads) are sent as multipart, anything else as JSON
+            const isFormData = body instanceof FormData;
             const response = await fetch(url, {
                 method: 'POST',
-                headers: { 'Content-Type': 'application/json', 'X-CSRFToken': csrftoken },
-                body: body ? JSON.stringify(body) : null,
+                headers: isFormData ? { 'X-CSRFToken': csrftoken } : { 'Content-Type': 'application/json', 'X-CSRFToken': csrftoken },
+                body: isFormData ? body : (body ? JSON.stringify(body) : null),
             });
 
             const data = await response.json();
@@ -118,10 +138,12 @@ document.addEventListener('DOMContentLoaded', function() {
     if (labelBtn) {
         const labelStatus = document.getElementById('label-status-message');
         const semesterInput = document.getElementById('semester-input');
+        const onlyStaleInput = document.getElementById('only-stale-input');
         labelBtn.addEventListener('click', function() {
             const semester = semesterInput.value;
             if (!semester) { alert('Please select a semester.'); return; }
             const body = { semester: semester };
+            if (onlyStaleInput && onlyStaleInput.checked) { body.only_stale = true; }
             // Get the API url from the button's data attribute
             const url = labelBtn.dataset.url;
             startTask(labelBtn, labelStatus, url, body);
@@ -133,6 +155,10 @@ document.addEventListener('DOMContentLoaded', function() {
         const status = document.getElementById('status-message');
         const semesterInput = document.getElementById('semester-input');
         const weightageInput = document.getElementById('weightage-input')
+        const solverInput = document.getElementById('solver-input');
+        const timeLimitInput = document.getElementById('time-limit-input');
+        const incrementalInput = document.getElementById('incremental-input');
+        const maxReassignmentsInput = document.getElementById('max-reassignments-input');
         matchBtn.addEventListener('click', function(){
             const semester = semesterInput.value;
             const weightage = weightageInput.value;
@@ -141,6 +167,12 @@ document.addEventListener('DOMContentLoaded', function() {
                 semester: semester,
                 weightage: weightage,
              };
+            if (solverInput) { body.solver = solverInput.value; }
+            if (timeLimitInput && timeLimitInput.value) { body.time_limit = timeLimitInput.value; }
+            if (incrementalInput && incrementalInput.checked) {
+                body.incremental = true;
+                if (maxReassignmentsInput && maxReassignmentsInput.value) { body.max_reassignments = maxReassignmentsInput.value; }
+            }
             // Get the API url from the button's data attribute
             const url = matchBtn.dataset.url;
             startTask(matchBtn, status, url, body);
@@ -161,6 +193,17 @@ document.addEventListener('DOMContentLoaded', function() {
         })
     }
 
+    document.querySelectorAll('.background-import-btn').forEach(function(importBtn) {
+        importBtn.addEventListener('click', function() {
+            const form = importBtn.closest('form');
+            if (!form.reportValidity()) { return; }
+            const body = new FormData(form);
+            body.append(importBtn.dataset.import, '');
+            body.append('background', '1');
+            startTask(importBtn, form.querySelector('.background-import-status'), importBtn.dataset.url, body);
+        });
+    });
+
     const deleteBtn = document.getElementById('delete-btn');
     if (deleteBtn) {
         deleteBtn.addEventListener('click', function(){
@@ -110,10 +110,10 @@ class CoordinatorProfileForm(forms.ModelForm):
 
 class CsvImportForm(forms.Form):
     """
-    A simple form for uploading a CSV file.
+    A simple form for uploading a CSV (or Parquet) file.
     """
     csv_file = forms.FileField(
         label='Select a CSV file',
-        help_text='The file must be in CSV format.',
-        widget=forms.FileInput(attrs={'class': 'form-control', 'accept': '.csv'})
+        help_text='The file must be in CSV or Parquet format.',
+        widget=forms.FileInput(attrs={'class': 'form-control', 'accept': '.csv,.parquet'})
     )
\ No newline at end of file
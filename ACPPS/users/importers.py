@@ -0,0 +1,422 @@
+# users/importers.py
+from django.contrib.auth.hashers import make_password
+from django.db import DatabaseError, transaction
+
+from academics.models import Department, Programme, ProgrammePreferenceGroup, School
+from api.models import StandardisedTopic
+from .models import StudentProfile, SupervisorProfile, User, student_id_from_email
+
+STUDENT_EMAIL_DOMAIN = 'imail.sunway.edu.my'
+DEFAULT_PASSWORD = "defaultPassword123!" # Consider a more secure default password strategy
+
+
+def default_password_hash():
+    """
+    DEFAULT_PASSWORD encoded by the configured password hasher. Imports call this once and assign the
+    result to every user they create, so the hashing cost does not grow with the number of rows.
+    """
+    return make_password(DEFAULT_PASSWORD)
+
+
+def parse_boolean(value):
+    """Interprets the usual string spellings of a boolean; None for empty or ambiguous values."""
+    if isinstance(value, str):
+        val = value.lower().strip()
+        if val in ('true', '1', 't', 'y', 'yes'):
+            return True
+        if val in ('false', '0', 'f', 'n', 'no'):
+            return False
+    return None
+
+
+def split_topic_cell(value):
+    """Topic names from a native list cell (Parquet) or a semicolon-separated cell (CSV)."""
+    if isinstance(value, list):
+        return [str(name).strip() for name in value if name is not None and str(name).strip()]
+    return [name.strip() for name in (value or '').split(';') if name.strip()]
+
+
+class BulkImporter:
+    """
+    Shared driver of the bulk importers. Subclasses implement _parse(i, row) (a record dict with its 'row'
+    number, or None after reporting the error), optionally _resolve(records), and _write(records), which
+    writes the records with bulk queries and returns how many profiles it created and updated.
+
+    Each import_rows call is written in one transaction. If the database rejects it, the records are
+    written again one by one, each in its own savepoint, so only the offending rows are skipped.
+    Errors are reported in self.errors in row order.
+    """
+    def __init__(self, headers):
+        self.headers = set(headers)
+        self.created_count = 0
+        self.updated_count = 0
+        self.failed_count = 0
+        self.errors = []
+
+    def import_rows(self, rows):
+        """
+        Imports (row number, row dict) pairs. Can be called once per chunk of a file,
+        each chunk being written in its own transaction.
+        """
+        self._row_errors = []
+        records = []
+        for i, row in rows:
+            record = self._parse(i, row)
+            if record is None:
+                self.failed_count += 1
+            else:
+                records.append(record)
+        resolved = self._resolve(records)
+        self.failed_count += len(records) - len(resolved)
+        if resolved:
+            self._write_chunk(resolved)
+        # Errors are found in separate passes, so they are sorted back into row order
+        self.errors.extend(message for _, message in sorted(self._row_errors, key=lambda error: error[0]))
+
+    def _error(self, i, message):
+        self._row_errors.append((i, message))
+
+    def _resolve(self, records):
+        return records
+
+    def _write_chunk(self, records):
+        try:
+            self._write_atomic(records)
+            return
+        except DatabaseError:
+            pass
+        for record in records: # Find the rows the database rejects
+            try:
+                self._write_atomic([record])
+            except DatabaseError as e:
+                self.failed_count += 1
+                self._error(record['row'], self._database_error(record, e))
+
+    def _write_atomic(self, records):
+        # Counted once the transaction commits, so a write that is rolled back adds nothing
+        with transaction.atomic():
+            created, updated = self._write(records)
+        self.created_count += created
+        self.updated_count += updated
+
+    def _database_error(self, record, error):
+        return f"Row {record['row']}: An unexpected database error occurred: {error}"
+
+
+class StudentImporter(BulkImporter):
+    """
+    Bulk engine behind the coordinator's student import.
+
+    The whole batch of rows is parsed first; programmes, supervisors and topics are resolved from
+    dicts loaded once, existing users and profiles are fetched with one query each, and the changes
+    are written with bulk_create/bulk_update plus a delete and a bulk_create per topic through-table.
+    The query count therefore does not grow with the number of rows.
+
+    Rows repeating a student ID update the earlier one. Rows that cannot be imported are skipped and reported
+    in self.errors with the same messages as the row-by-row import; created_count and updated_count count the
+    imported rows, failed_count the skipped ones.
+    """
+    required_headers = {'Full Name', 'Student ID', 'Programme'}
+    # ManyToMany fields and their column headers
+    m2m_field_map = {
+        'positive_preferences': 'Positive Preferences',
+        'negative_preferences': 'Negative Preferences',
+        'matching_topics': 'Matching Topics',
+        'conflicting_topics': 'Conflicting Topics',
+    }
+
+    def __init__(self, semester, headers):
+        super().__init__(headers)
+        self.semester = semester
+        self.programmes = None
+
+    def _parse(self, i, row):
+        full_name = (row.get('Full Name') or '').strip()
+        student_id = (row.get('Student ID') or '').strip().lower()
+        programme_name = (row.get('Programme') or '').strip()
+        if not all([full_name, student_id, programme_name]):
+            self._error(i, f"Row {i}: Missing required data (Full Name, Student ID, or Programme).")
+            return None
+
+        record = {
+            'row': i,
+            'email': f"{student_id}@{STUDENT_EMAIL_DOMAIN}",
+            'full_name': full_name,
+            'programme_name': programme_name,
+            'supervisor_email': None,
+            'profile_data': {
+                'preference_text': (row.get('Preference Text') or '').strip() if 'Preference Text' in self.headers else None
+            },
+            'topics': {},
+        }
+        if 'Supervisor Email' in self.headers and (row.get('Supervisor Email') or '').strip():
+            record['supervisor_email'] = row['Supervisor Email'].strip()
+        if 'Programme Match Type' in self.headers and (row.get('Programme Match Type') or '').strip():
+            try:
+                record['profile_data']['programme_match_type'] = int(row['Programme Match Type'].strip())
+            except ValueError as e:
+                self._error(i, f"Row {i}: Invalid data. Check 'Programme Match Type' is a number. Details: {e}")
+                return None
+        for field_name, header_name in self.m2m_field_map.items():
+            if header_name in self.headers:
+                record['topics'][field_name] = split_topic_cell(row.get(header_name))
+        return record
+
+    def _database_error(self, record, error):
+        return f"Row {record['row']}: An unexpected database error occurred for student ID {record['email'].split('@')[0]}: {error}"
+
+    def _resolve(self, records):
+        """Replaces names with model instances/ids from lookups that each take a single query."""
+        if not records:
+            return []
+        if self.programmes is None: # Loaded once, however many chunks are imported
+            self.programmes = {programme.name.casefold(): programme for programme in Programme.objects.all()}
+        programmes = self.programmes
+        # Supervisor emails are stored lower-cased (see SupervisorImporter._parse)
+        supervisor_emails = {record['supervisor_email'].lower() for record in records if record['supervisor_email']}
+        supervisors = {}
+        if supervisor_emails:
+            supervisors = dict(
+                SupervisorProfile.objects.filter(user__email__in=supervisor_emails).values_list('user__email', 'pk')
+            )
+        topic_names = {name for record in records for names in record['topics'].values() for name in names}
+        topics = dict(StandardisedTopic.objects.filter(name__in=topic_names).values_list('name', 'id')) if topic_names else {}
+
+        resolved = []
+        for record in records:
+            i = record['row']
+            programme = programmes.get(record['programme_name'].casefold())
+            if programme is None:
+                self._error(i, f"Row {i}: Programme '{record['programme_name']}' not found. Skipping.")
+                continue
+            record['profile_data']['programme'] = programme
+            if record['supervisor_email']:
+                supervisor_id = supervisors.get(record['supervisor_email'].lower())
+                if supervisor_id is None:
+                    self._error(i, f"Row {i}: Supervisor with email '{record['supervisor_email']}' not found. Skipping.")
+                    continue
+                record['profile_data']['supervisor_id'] = supervisor_id
+            for field_name, names in record['topics'].items():
+                missing_topics = {name for name in names if name not in topics}
+                if missing_topics:
+                    self._error(i, f"Row {i}: For student {record['email']}, could not find topics: {', '.join(missing_topics)}")
+                record['topics'][field_name] = list(dict.fromkeys(topics[name] for name in names if name in topics))
+            resolved.append(record)
+        return resolved
+
+    def _write(self, records):
+        emails = list(dict.fromkeys(record['email'] for record in records))
+        users = {user.email: user for user in User.objects.filter(email__in=emails)}
+        profiles = {profile.user_id: profile for profile in StudentProfile.objects.filter(user__email__in=emails)}
+
+        # --- Users: create the new ones, refresh name and type of the existing ones ---
+        new_users = []
+        password_hash = None
+        for record in records:
+            if record['email'] not in users:
+                password_hash = password_hash or default_password_hash()
+                user = User(email=record['email'], full_name=record['full_name'], user_type='student', password=password_hash)
+                users[record['email']] = user
+                new_users.append(user)
+            else:
+                users[record['email']].full_name = record['full_name']
+                users[record['email']].user_type = 'student'
+        new_emails = {user.email for user in new_users}
+        User.objects.bulk_create(new_users)
+        User.objects.bulk_update([user for email, user in users.items() if email not in new_emails], ['full_name', 'user_type'])
+        if new_users and any(user.pk is None for user in new_users): # Backends without RETURNING
+            created_ids = dict(User.objects.filter(email__in=new_emails).values_list('email', 'pk'))
+            for user in new_users:
+                user.pk = created_ids[user.email]
+
+        # --- Profiles: the last row for a student wins, like sequential update_or_create calls ---
+        new_profiles = {}
+        created = updated = 0
+        updated_fields = {'programme', 'semester', 'preference_text'}
+        for record in records:
+            user = users[record['email']]
+            profile = profiles.get(user.pk) or new_profiles.get(user.pk)
+            if profile is None:
+                profile = StudentProfile(user_id=user.pk, student_id=student_id_from_email(user.email))
+                new_profiles[user.pk] = profile
+                created += 1
+            else:
+                updated += 1
+            profile.semester = self.semester
+            for field, value in record['profile_data'].items():
+                setattr(profile, field, value)
+            updated_fields.update('supervisor' if field == 'supervisor_id' else field for field in record['profile_data'])
+        StudentProfile.objects.bulk_create(new_profiles.values())
+        StudentProfile.objects.bulk_update(profiles.values(), sorted(updated_fields))
+
+        # --- Topics: replace each imported field's through-rows; an empty cell clears the field ---
+        for field_name in self.m2m_field_map:
+            links = {}
+            for record in records:
+                if field_name in record['topics']:
+                    links[users[record['email']].pk] = record['topics'][field_name]
+            if not links:
+                continue
+            through = getattr(StudentProfile, field_name).through
+            through.objects.filter(studentprofile_id__in=links).delete()
+            through.objects.bulk_create(
+                through(studentprofile_id=profile_id, standardisedtopic_id=topic_id)
+                for profile_id, topic_ids in links.items()
+                for topic_id in topic_ids
+            )
+        return created, updated
+
+
+class SupervisorImporter(BulkImporter):
+    """
+    Bulk engine behind the coordinator's supervisor import.
+
+    Departments, schools and preference groups are loaded once into case-folded dicts (their names match
+    case-insensitively) and, when the file has a 'Standardised Expertise' column, topics into a dict keyed
+    by their exact name, so each row is resolved without a query. Existing users
+    and profiles are fetched with one query each and the changes are written with bulk_create/bulk_update
+    plus a delete and a bulk_create on the expertise through-table. Re-importing a whole roster therefore
+    takes a constant number of queries.
+
+    Rows that cannot be imported are skipped and reported in self.errors; missing topics are reported
+    but do not skip the row. created_count and updated_count count the imported rows, failed_count the
+    skipped ones.
+    """
+    required_headers = {'Full Name', 'Department', 'Email'}
+    preference_group_field_map = {
+        'preferred_programmes_first_choice': 'Preferred Programmes First Choice',
+        'preferred_programmes_second_choice': 'Preferred Programmes Second Choice',
+    }
+
+    def __init__(self, headers):
+        super().__init__(headers)
+        self.org_units = None
+
+    def import_rows(self, rows):
+        """
+        Imports (row number, row dict) pairs. Rows repeating an email update the earlier one.
+        Can be called once per chunk of a file; the lookups are only loaded by the first call.
+        """
+        if self.org_units is None:
+            self._load_lookups()
+        super().import_rows(rows)
+
+    def _load_lookups(self):
+        # Case-folded names. Rows are read newest first, so the oldest of two names that only differ in
+        # case wins, and departments go in after schools, so a department wins over a school of the same name.
+        self.org_units = {name.casefold(): (None, pk) for name, pk in School.objects.order_by('-pk').values_list('name', 'pk')}
+        self.org_units.update(
+            (name.casefold(), (pk, school_id))
+            for name, pk, school_id in Department.objects.order_by('-pk').values_list('name', 'pk', 'school_id')
+        )
+        self.groups = {}
+        if any(header in self.headers for header in self.preference_group_field_map.values()):
+            self.groups = {name.casefold(): pk for name, pk in ProgrammePreferenceGroup.objects.order_by('-pk').values_list('name', 'pk')}
+        self.topics = {}
+        if 'Standardised Expertise' in self.headers: # Topic names are matched exactly
+            self.topics = dict(StandardisedTopic.objects.values_list('name', 'pk'))
+
+    def _parse(self, i, row):
+        full_name = (row.get('Full Name') or '').strip()
+        email = (row.get('Email') or '').strip().lower()
+        org_unit_name = (row.get('Department') or '').strip()
+        if not all([full_name, email, org_unit_name]):
+            self._error(i, f"Row {i}: Missing required data (Full Name, Department, or Email).")
+            return None
+
+        org_unit = self.org_units.get(org_unit_name.casefold())
+        if org_unit is None:
+            self._error(i, f"Row {i}: Department/School '{org_unit_name}' not found. Skipping.")
+            return None
+        profile_data = {'department_id': org_unit[0], 'school_id': org_unit[1]}
+
+        if 'Expertise' in self.headers:
+            profile_data['expertise'] = ", ".join(f'"{item}"' for item in split_topic_cell(row.get('Expertise')))
+        if 'Supervision Capacity' in self.headers and (row.get('Supervision Capacity') or '').strip():
+            try:
+                profile_data['supervision_capacity'] = int(row['Supervision Capacity'].strip())
+            except ValueError:
+                self._error(i, f"Row {i}: Invalid 'Supervision Capacity'. It must be a whole number. Skipping.")
+                return None
+        if 'Accepting Students' in self.headers:
+            accepting = parse_boolean(row.get('Accepting Students'))
+            if accepting is not None:
+                profile_data['accepting_students'] = accepting
+        for field_name, header_name in self.preference_group_field_map.items():
+            group_name = (row.get(header_name) or '').strip() if header_name in self.headers else ''
+            if group_name:
+                group_id = self.groups.get(group_name.casefold())
+                if group_id is None:
+                    self._error(i, f"Row {i}: A Programme Preference Group was not found. "
+                                   "Details: ProgrammePreferenceGroup matching query does not exist.")
+                    return None
+                profile_data[f'{field_name}_id'] = group_id
+
+        topic_ids = None
+        if 'Standardised Expertise' in self.headers:
+            topic_names = split_topic_cell(row.get('Standardised Expertise'))
+            missing_topics = [name for name in topic_names if name not in self.topics]
+            if missing_topics:
+                self._error(i, f"Row {i}: For supervisor {email}, could not find standardised topics: {', '.join(missing_topics)}")
+            topic_ids = list(dict.fromkeys(self.topics[name] for name in topic_names if name in self.topics))
+
+        return {'row': i, 'email': email, 'full_name': full_name, 'profile_data': profile_data, 'topics': topic_ids}
+
+    def _database_error(self, record, error):
+        return f"Row {record['row']}: An unexpected database error occurred for supervisor {record['email']}: {error}"
+
+    def _write(self, records):
+        emails = list(dict.fromkeys(record['email'] for record in records))
+        users = {user.email: user for user in User.objects.filter(email__in=emails)}
+        profiles = {profile.user_id: profile for profile in SupervisorProfile.objects.filter(user__email__in=emails)}
+
+        # --- Users: create the new ones, refresh name and type of the existing ones ---
+        new_users = []
+        password_hash = None
+        for record in records:
+            if record['email'] not in users:
+                password_hash = password_hash or default_password_hash()
+                user = User(email=record['email'], full_name=record['full_name'], user_type='supervisor', password=password_hash)
+                users[record['email']] = user
+                new_users.append(user)
+            else:
+                users[record['email']].full_name = record['full_name']
+                users[record['email']].user_type = 'supervisor'
+        new_emails = {user.email for user in new_users}
+        User.objects.bulk_create(new_users)
+        User.objects.bulk_update([user for email, user in users.items() if email not in new_emails], ['full_name', 'user_type'])
+        if new_users and any(user.pk is None for user in new_users): # Backends without RETURNING
+            created_ids = dict(User.objects.filter(email__in=new_emails).values_list('email', 'pk'))
+            for user in new_users:
+                user.pk = created_ids[user.email]
+
+        # --- Profiles: the last row for a supervisor wins, like sequential update_or_create calls ---
+        new_profiles = {}
+        created = updated = 0
+        updated_fields = set()
+        for record in records:
+            user = users[record['email']]
+            profile = profiles.get(user.pk) or new_profiles.get(user.pk)
+            if profile is None:
+                profile = SupervisorProfile(user_id=user.pk)
+                new_profiles[user.pk] = profile
+                created += 1
+            else:
+                updated += 1
+            for field, value in record['profile_data'].items():
+                setattr(profile, field, value)
+            updated_fields.update(field.removesuffix('_id') for field in record['profile_data'])
+        SupervisorProfile.objects.bulk_create(new_profiles.values())
+        SupervisorProfile.objects.bulk_update(profiles.values(), sorted(updated_fields))
+
+        # --- Expertise: replace the through-rows of every imported supervisor; an empty cell clears them ---
+        links = {users[record['email']].pk: record['topics'] for record in records if record['topics'] is not None}
+        if links:
+            through = SupervisorProfile.standardised_expertise.through
+            through.objects.filter(supervisorprofile_id__in=links).delete()
+            through.objects.bulk_create(
+                through(supervisorprofile_id=profile_id, standardisedtopic_id=topic_id)
+                for profile_id, topic_ids in links.items()
+                for topic_id in topic_ids
+            )
+        return created, updated
@@ -1,14 +1,59 @@
 import csv
 import random
+from collections import Counter
 from django.core.management.base import BaseCommand, CommandError
 from django.contrib.auth import get_user_model
 from django.db import transaction
 from django.utils.text import slugify
-from users.models import StudentProfile
+from users.importers import default_password_hash
+from users.models import StudentProfile, student_id_from_email
 from academics.models import Programme, Semester
 
 User = get_user_model()
 
+
+def allocate_unique_emails(usernames, email_domain):
+    """
+    One unused email address per username: username@domain, or username1@domain, username2@domain, ...
+    when that is taken by an existing user or an earlier username in the list.
+    Only the candidate addresses are looked up, with one email__in query per round. A round checks a
+    window of candidates for every username that still needs one, and the window doubles whenever a
+    username runs out of free candidates, so heavy collisions cost a logarithmic number of queries.
+    """
+    def candidate(username, counter):
+        return f"{username}{counter or ''}@{email_domain}"
+
+    checked = set() # Candidates whose availability is known
+    taken = set()
+    next_counter = {}
+    window = {}
+    emails = []
+    while len(emails) < len(usernames):
+        pending = usernames[len(emails):]
+        batch = set()
+        for username, occurrences in Counter(pending).items():
+            window[username] = max(window.get(username, 0) * 2, occurrences + 1)
+            start = next_counter.get(username, 0)
+            batch.update(candidate(username, counter) for counter in range(start, start + window[username]))
+        batch -= checked
+        taken.update(User.objects.filter(email__in=batch).values_list('email', flat=True))
+        checked |= batch
+
+        # Allocate in list order; stop at the first username whose next free candidate is not checked yet,
+        # so every row gets the same address as it would one by one
+        for username in pending:
+            counter = next_counter.get(username, 0)
+            while candidate(username, counter) in taken:
+                counter += 1
+            next_counter[username] = counter
+            email = candidate(username, counter)
+            if email not in checked:
+                break
+            taken.add(email)
+            emails.append(email)
+    return emails
+
+
 class Command(BaseCommand):
     help = 'Imports student preference text from a CSV file into StudentProfile model'
 
@@ -68,91 +113,76 @@ class Command(BaseCommand):
                     raise CommandError(f"CSV file is missing the specified name header: '{name_column_name}'. Found headers: {reader.fieldnames}")
 
 
-                students_created_count = 0
-                students_updated_count = 0
+                # 1. Parse every row first; users and profiles are then written in bulk.
+                records = []
+                for row_num, row in enumerate(reader, 1):
+                    preference_text_data = row.get(sentence_column_name, "").strip()
 
-                with transaction.atomic():
-                    for row_num, row in enumerate(reader, 1):
-                        preference_text_data = row.get(sentence_column_name, "").strip()
+                    # Determine Student Identifier and Name
+                    student_identifier_base = ""
+                    full_name = f"Student {row_num}" # Default full name
 
-                        # 1. Determine Student Identifier and Name
-                        student_identifier_base = ""
-                        full_name = f"Student {row_num}" # Default full name
+                    if id_column_name:
+                        student_identifier_base = row.get(id_column_name, "").strip()
+                        if not student_identifier_base:
+                            self.stdout.write(self.style.WARNING(f"Row {row_num}: ID column '{id_column_name}' is empty. Using generic ID."))
+                            student_identifier_base = f"S{row_num}"
+                    else:
+                        student_identifier_base = f"S{row_num}" # Fallback if no ID column
 
-                        if id_column_name:
-                            student_identifier_base = row.get(id_column_name, "").strip()
-                            if not student_identifier_base:
-                                self.stdout.write(self.style.WARNING(f"Row {row_num}: ID column '{id_column_name}' is empty. Using generic ID."))
-                                student_identifier_base = f"S{row_num}"
-                        else:
-                            student_identifier_base = f"S{row_num}" # Fallback if no ID column
-                        
-                        if name_column_name:
-                            csv_full_name = row.get(name_column_name, "").strip()
-                            if csv_full_name:
-                                full_name = csv_full_name
-                            else:
-                                self.stdout.write(self.style.WARNING(f"Row {row_num}: Name column '{name_column_name}' is empty. Using generic name '{full_name}'."))
-                        
-                        # Generate a unique email
-                        email_username_part = slugify(student_identifier_base)
-                        email = f"{email_username_part}@{email_domain}"
-                        
-                        # # Ensure email is unique if it might not be
-                        temp_email = email
-                        counter = 1
-                        while User.objects.filter(email=temp_email).exists():
-                            temp_email = f"{email_username_part}{counter}@{email_domain}"
-                            counter += 1
-                        email = temp_email
-                        
-                        # 2. Create or get User
-                        user, user_created = User.objects.get_or_create(
-                            email=email,
-                            defaults={
-                                'full_name': full_name,
-                                'user_type': 'student',
-                            }
-                        )
-
-                        if user_created:
-                            user.set_password('defaultPassword123!') # Set a random secure password
-                            user.save()
-                            self.stdout.write(self.style.SUCCESS(f"Created user: {user.email} for '{full_name}'"))
-                        elif user.user_type != 'student':
-                             self.stdout.write(self.style.WARNING(f"User {user.email} exists but is not a student. Updating user_type to student."))
-                             user.user_type = 'student'
-                             user.full_name = full_name # Update full name if user existed
-                             user.save()
-                        # If user existed and is already a student, we proceed to create/update profile.
-
-                        # 3. Randomly select a Programme
-                        selected_programme = random.choice(available_programmes)
-
-                        # 4. Create or Update StudentProfile
-                        # Other fields (positive_preferences, negative_preferences, supervisor) will be left blank/null.
-                        profile, profile_created = StudentProfile.objects.update_or_create(
-                            user=user,
-                            defaults={
-                                'programme': selected_programme,
-                                'preference_text': preference_text_data,
-                                'semester': Semester.objects.latest(),
-                                # Explicitly set others to None or leave them to model defaults if appropriate
-                                'positive_preferences': None,
-                                'negative_preferences': None,
-                                'supervisor': None,
-                            }
-                        )
-
-                        if profile_created:
-                            students_created_count += 1
+                    if name_column_name:
+                        csv_full_name = row.get(name_column_name, "").strip()
+                        if csv_full_name:
+                            full_name = csv_full_name
                         else:
-                            students_updated_count += 1
-            
+                            self.stdout.write(self.style.WARNING(f"Row {row_num}: Name column '{name_column_name}' is empty. Using generic name '{full_name}'."))
+
+                    records.append((slugify(student_identifier_base), full_name, preference_text_data))
+
+            if not records:
+                self.stdout.write(self.style.WARNING("CSV file has no data rows."))
+                return
+
+            # 2. Resolve the semester once
+            try:
+                semester = Semester.objects.latest()
+            except Semester.DoesNotExist:
+                raise CommandError("No Semesters found in the database. Please add a Semester before running this import.")
+
+            with transaction.atomic():
+                # 3. Give every row an email address no user has yet
+                emails = allocate_unique_emails([username for username, _, _ in records], email_domain)
+                password_hash = default_password_hash() # Hashed once and shared by every user this import creates
+                users = [
+                    User(email=email, full_name=full_name, user_type='student', password=password_hash)
+                    for email, (_, full_name, _) in zip(emails, records)
+                ]
+                User.objects.bulk_create(users)
+                if any(user.pk is None for user in users): # Backends without RETURNING
+                    created_ids = dict(User.objects.filter(email__in=emails).values_list('email', 'pk'))
+                    for user in users:
+                        user.pk = created_ids[user.email]
+
+                # 4. Create the profiles with a random Programme each.
+                # Other fields (positive_preferences, negative_preferences, supervisor) are left blank.
+                StudentProfile.objects.bulk_create(
+                    StudentProfile(
+                        user_id=user.pk,
+                        student_id=student_id_from_email(user.email),
+                        programme=random.choice(available_programmes),
+                        preference_text=preference_text_data,
+                        semester=semester,
+                    )
+                    for user, (_, _, preference_text_data) in zip(users, records)
+                )
+
+            for user in users:
+                self.stdout.write(self.style.SUCCESS(f"Created user: {user.email} for '{user.full_name}'"))
+            # Every row gets a new address, so no existing profile is updated
             self.stdout.write(self.style.SUCCESS(
                 f"Import complete. "
-                f"Student profiles created: {students_created_count}. "
-                f"Student profiles updated: {students_updated_count}."
+                f"Student profiles created: {len(users)}. "
+                f"Student profiles updated: 0."
             ))
 
         except FileNotFoundError:
@@ -7,6 +7,7 @@ from django.contrib.auth import get_user_model
 from django.db import transaction
 from django.utils.text import slugify # For generating username part of email
 
+from users.importers import default_password_hash
 from users.models import SupervisorProfile
 from academics.models import School, Department, ProgrammePreferenceGroup 
 
@@ -65,6 +66,7 @@ class Command(BaseCommand):
 
                 supervisors_created_count = 0
                 supervisors_updated_count = 0
+                password_hash = default_password_hash() # Hashed once and shared by every user this import creates
 
                 with transaction.atomic(): # Use a transaction for atomicity
                     for row_num, row in enumerate(reader, 1):
@@ -95,12 +97,10 @@ class Command(BaseCommand):
                             defaults={
                                 'full_name': full_name,
                                 'user_type': 'supervisor',
-                                'password': 'defaultPassword123!'
+                                'password': password_hash,
                             }
                         )
                         if user_created:
-                            user.set_password('defaultPassword123!') # Or User.objects.make_random_password()
-                            user.save()
                             self.stdout.write(self.style.SUCCESS(f"Created user: {user.email}"))
                         elif user.user_type != 'supervisor':
                              self.stdout.write(self.style.WARNING(f"User {user.email} exists but is not a supervisor. Skipping profile creation for this user."))
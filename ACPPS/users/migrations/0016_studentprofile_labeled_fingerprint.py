@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0015_alter_supervisorprofile_standardised_expertise'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='studentprofile',
+            name='labeled_text_fingerprint',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='studentprofile',
+            name='labeled_topic_version',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+    ]
@@ -0,0 +1,30 @@
+from django.db import migrations, models
+
+
+def backfill_student_ids(apps, schema_editor):
+    StudentProfile = apps.get_model('users', 'StudentProfile')
+    profiles = list(StudentProfile.objects.select_related('user'))
+    for profile in profiles:
+        profile.student_id = profile.user.email.split('@')[0] if profile.user.email else None
+    StudentProfile.objects.bulk_update(profiles, ['student_id'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0016_studentprofile_labeled_fingerprint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='studentprofile',
+            name='student_id',
+            field=models.CharField(blank=True, editable=False, max_length=254, null=True),
+        ),
+        migrations.RunPython(backfill_student_ids, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='studentprofile',
+            name='student_id',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=254, null=True),
+        ),
+    ]
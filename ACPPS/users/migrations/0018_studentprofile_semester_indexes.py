@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academics', '0005_alter_semester_options'),
+        ('api', '0005_labelingrun'),
+        ('users', '0017_studentprofile_student_id'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='studentprofile',
+            index=models.Index(fields=['semester', 'supervisor'], name='student_sem_supervisor_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='studentprofile',
+            index=models.Index(condition=models.Q(('preference_text__isnull', False)), fields=['semester', 'user'], name='student_sem_pref_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='studentprofile',
+            index=models.Index(condition=models.Q(('preference_text__isnull', False), ('supervisor__isnull', True)), fields=['semester', 'user'], name='student_sem_unassigned_idx'),
+        ),
+    ]
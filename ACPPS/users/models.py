@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import Q
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 from django.conf import settings
 from django.utils import timezone
@@ -18,6 +19,10 @@ def get_default_semester():
         # Returning None makes the field empty, which requires it to be nullable.
         return None
 
+def student_id_from_email(email):
+    """A student's ID is the local part of their university email address."""
+    return email.split('@')[0] if email else None
+
 class UserManager(BaseUserManager):
     def create_user(self, email, password=None, **extra_fields):
         if not email:
@@ -53,12 +58,35 @@ class User(AbstractBaseUser, PermissionsMixin):
 
     def __str__(self):
         return self.email
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        user = super().from_db(db, field_names, values)
+        # Remembered so save() only touches the student ID when the email address changes.
+        user._loaded_email = user.__dict__.get('email')
+        return user
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        email_changed = (
+            not self._state.adding # A new user has no profile yet
+            and (update_fields is None or 'email' in update_fields)
+            and self.email != getattr(self, '_loaded_email', None)
+        )
+        super().save(*args, **kwargs)
+        if email_changed:
+            # Keep the denormalised student ID in step with the email address.
+            StudentProfile.objects.filter(user_id=self.pk).update(student_id=student_id_from_email(self.email))
+        self._loaded_email = self.email
     
     def get_full_name(self):
         return self.full_name or self.email
 
 class StudentProfile(models.Model):
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True)
+    # Email prefix of the user, stored (and indexed) for exact-match lookups; set on save.
+    # Not unique: students on different email domains may share a prefix (see find_students_by_id).
+    student_id = models.CharField(max_length=254, db_index=True, null=True, blank=True, editable=False)
     programme = models.ForeignKey(Programme, on_delete=models.SET_NULL, null=True, related_name='students')
     preference_text = models.TextField(blank=True, null=True)
     positive_preferences = models.ManyToManyField(StandardisedTopic, blank=True, related_name='positive_preferences_students')
@@ -75,11 +103,38 @@ class StudentProfile(models.Model):
     programme_match_type = models.IntegerField(null=True)
     matching_topics = models.ManyToManyField(StandardisedTopic, blank=True, related_name='matching_students')
     conflicting_topics = models.ManyToManyField(StandardisedTopic, blank=True, related_name='conflicting_students')
+    # Fingerprint of the preference text and version of the topic list the current labels were made from
+    labeled_text_fingerprint = models.CharField(max_length=64, null=True, blank=True)
+    labeled_topic_version = models.CharField(max_length=64, null=True, blank=True)
 
     PREFERENCE_MAX_LENGTH = 4093
+
+    class Meta:
+        indexes = [
+            # Semester-scoped lookups: reset, assigned students per semester, supervisor loads.
+            models.Index(fields=['semester', 'supervisor'], name='student_sem_supervisor_idx'),
+            # Labeling selection: students of a semester with a preference, in user order.
+            models.Index(
+                fields=['semester', 'user'],
+                condition=Q(preference_text__isnull=False),
+                name='student_sem_pref_idx',
+            ),
+            # Matching selection: unassigned students of a semester with a preference.
+            models.Index(
+                fields=['semester', 'user'],
+                condition=Q(supervisor__isnull=True, preference_text__isnull=False),
+                name='student_sem_unassigned_idx',
+            ),
+        ]
     
     def __str__(self):
         return f"{self.user.email} - Student"
+
+    def save(self, *args, **kwargs):
+        self.student_id = student_id_from_email(self.user.email)
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'student_id'}
+        super().save(*args, **kwargs)
     
     def clean(self):
         super().clean()
@@ -96,10 +151,6 @@ class StudentProfile(models.Model):
     @property
     def school(self):
         return self.programme.department.school if self.programme else None
-    
-    @property
-    def student_id(self):
-        return self.user.email.split('@')[0] if self.user.email else None
 
 class SupervisorProfile(models.Model):
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True)
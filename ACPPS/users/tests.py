@@ -1,3 +1,296 @@
+import io
+import tempfile
+from datetime import date
+from unittest import mock
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.db import IntegrityError, connection
 from django.test import TestCase
 
-# Create your tests here.
+from academics.models import Department, Programme, ProgrammePreferenceGroup, School, Semester
+from api.models import StandardisedTopic
+
+from .importers import DEFAULT_PASSWORD, StudentImporter, SupervisorImporter
+from .management.commands.import_students import allocate_unique_emails
+from .models import StudentProfile, SupervisorProfile, User
+
+
+class StudentIdTests(TestCase):
+    def test_student_id_follows_the_email_address(self):
+        user = User.objects.create_user('ABC123@example.com', 'password', user_type='student', full_name='Student')
+        profile = StudentProfile.objects.create(user=user, semester=None)
+        self.assertEqual(profile.student_id, 'ABC123')
+
+        user.email = 'xyz789@example.com'
+        user.save()
+        profile.refresh_from_db()
+        self.assertEqual(profile.student_id, 'xyz789')
+        self.assertEqual(StudentProfile.objects.get(student_id='xyz789'), profile)
+
+    def test_saving_a_user_only_syncs_the_student_id_when_the_email_changes(self):
+        user = User.objects.create_user('abc123@example.com', None, user_type='student', full_name='Student')
+        StudentProfile.objects.create(user=user, semester=None)
+        user = User.objects.get(pk=user.pk)
+        with self.assertNumQueries(1):
+            user.save(update_fields=['last_login'])
+        with self.assertNumQueries(1):
+            user.full_name = 'Renamed'
+            user.save()
+        with self.assertNumQueries(2):
+            user.email = 'def456@example.com'
+            user.save(update_fields=['email'])
+        self.assertEqual(StudentProfile.objects.get().student_id, 'def456')
+
+    def test_students_on_different_domains_may_share_an_id(self):
+        for domain in ('imail.sunway.edu.my', 'example.com'):
+            user = User.objects.create_user(f'abc123@{domain}', None, user_type='student', full_name='Student')
+            StudentProfile.objects.create(user=user, semester=None)
+        self.assertEqual(StudentProfile.objects.filter(student_id='abc123').count(), 2)
+
+
+class StudentQueryPlanTests(TestCase):
+    """Guards the semester-scoped access paths against silently degrading to full table scans."""
+
+    def setUp(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest("Query plan assertions are written for SQLite's EXPLAIN QUERY PLAN output.")
+        self.semester = Semester.objects.create(name='Test', start_date=date(2025, 1, 1), end_date=date(2025, 6, 1))
+
+    def assertUsesIndex(self, queryset, *index_names):
+        """The plan must search one of index_names (all led by semester) instead of scanning the table."""
+        plan = queryset.explain()
+        self.assertRegex(plan, rf"SEARCH (users_studentprofile|\"users_studentprofile\") USING (COVERING )?INDEX ({'|'.join(index_names)})")
+        self.assertNotRegex(plan, r'SCAN (users_studentprofile|"users_studentprofile")')
+
+    def test_matching_selection_uses_a_semester_index(self):
+        self.assertUsesIndex(
+            StudentProfile.objects.filter(semester=self.semester, supervisor__isnull=True, preference_text__isnull=False),
+            'student_sem_unassigned_idx', 'student_sem_supervisor_idx',
+        )
+
+    def test_labeling_selection_uses_the_preference_index(self):
+        self.assertUsesIndex(
+            StudentProfile.objects.filter(preference_text__isnull=False, semester=self.semester).order_by('user'),
+            'student_sem_pref_idx',
+        )
+
+    def test_semester_reset_and_assigned_lookups_use_a_semester_index(self):
+        self.assertUsesIndex(
+            StudentProfile.objects.filter(semester=self.semester),
+            'student_sem_supervisor_idx', 'users_studentprofile_semester_id_[0-9a-f]+',
+        )
+        self.assertUsesIndex(
+            StudentProfile.objects.filter(semester=self.semester, supervisor__isnull=False),
+            'student_sem_supervisor_idx',
+        )
+
+
+class StudentImporterTests(TestCase):
+    headers = ['Full Name', 'Student ID', 'Programme', 'Supervisor Email', 'Positive Preferences', 'Programme Match Type']
+
+    def setUp(self):
+        self.semester = Semester.objects.create(name='Test', start_date=date(2025, 1, 1), end_date=date(2025, 6, 1))
+        department = Department.objects.create(name='Computing')
+        self.programme = Programme.objects.create(name='BCS', department=department)
+        for name in ('AI', 'Web'):
+            StandardisedTopic.objects.create(name=name)
+        user = User.objects.create_user('lecturer@example.com', None, user_type='supervisor', full_name='Lecturer')
+        self.supervisor = SupervisorProfile.objects.create(user=user)
+
+    def import_rows(self, rows):
+        importer = StudentImporter(self.semester, self.headers)
+        importer.import_rows(enumerate(rows, start=2))
+        return importer
+
+    def row(self, student_id, **values):
+        return {'Full Name': f'Student {student_id}', 'Student ID': student_id, 'Programme': 'bcs',
+                'Supervisor Email': '', 'Positive Preferences': 'AI; Web', 'Programme Match Type': '', **values}
+
+    def test_query_count_does_not_grow_with_the_number_of_rows(self):
+        # programmes, topics, users, profiles, user insert, profile insert, topic delete + insert, savepoint pair
+        with self.assertNumQueries(10):
+            self.import_rows([self.row(f'a{index}') for index in range(2)])
+        # ... plus one bulk_update each for the existing users and profiles
+        with self.assertNumQueries(12):
+            self.import_rows([self.row(f'a{index}') for index in range(2)] + [self.row(f'b{index}') for index in range(4)])
+        self.assertEqual(StudentProfile.objects.filter(semester=self.semester).count(), 6)
+        profile = StudentProfile.objects.get(student_id='b3')
+        self.assertEqual(profile.programme, self.programme)
+        self.assertEqual(profile.user.email, 'b3@imail.sunway.edu.my')
+        self.assertEqual(sorted(profile.positive_preferences.values_list('name', flat=True)), ['AI', 'Web'])
+
+    def test_default_password_is_hashed_once_per_import(self):
+        with mock.patch('users.importers.make_password', wraps=make_password) as hasher:
+            self.import_rows([self.row(f'd{index}') for index in range(5)])
+        hasher.assert_called_once_with(DEFAULT_PASSWORD)
+        user = User.objects.get(email='d4@imail.sunway.edu.my')
+        self.assertTrue(user.check_password(DEFAULT_PASSWORD))
+
+        with mock.patch('users.importers.make_password', wraps=make_password) as hasher:
+            self.import_rows([self.row('d0')])
+        hasher.assert_not_called()
+
+    def test_bad_rows_are_reported_and_skipped(self):
+        importer = self.import_rows([
+            self.row('ok1', **{'Supervisor Email': 'LECTURER@example.com', 'Programme Match Type': '1'}),
+            self.row('bad1', Programme='Unknown'),
+            self.row('bad2', **{'Supervisor Email': 'nobody@example.com'}),
+            self.row('bad3', **{'Programme Match Type': 'first'}),
+            self.row('', ),
+            self.row('ok2', **{'Positive Preferences': 'AI; Cooking'}),
+        ])
+        self.assertEqual((importer.created_count, importer.updated_count), (2, 0))
+        self.assertEqual(importer.errors, [
+            "Row 3: Programme 'Unknown' not found. Skipping.",
+            "Row 4: Supervisor with email 'nobody@example.com' not found. Skipping.",
+            "Row 5: Invalid data. Check 'Programme Match Type' is a number. Details: invalid literal for int() with base 10: 'first'",
+            "Row 6: Missing required data (Full Name, Student ID, or Programme).",
+            "Row 7: For student ok2@imail.sunway.edu.my, could not find topics: Cooking",
+        ])
+        profile = StudentProfile.objects.get(student_id='ok1')
+        self.assertEqual((profile.supervisor, profile.programme_match_type), (self.supervisor, 1))
+        self.assertEqual(list(StudentProfile.objects.get(student_id='ok2').positive_preferences.values_list('name', flat=True)), ['AI'])
+
+    def test_rows_rejected_by_the_database_only_skip_themselves(self):
+        write = StudentImporter._write
+
+        def write_then_reject(importer, records):
+            counts = write(importer, records)
+            if any(record['email'].startswith('bad') for record in records):
+                raise IntegrityError('rejected')
+            return counts
+
+        with mock.patch.object(StudentImporter, '_write', write_then_reject):
+            importer = self.import_rows([self.row('e1'), self.row('bad1'), self.row('e2', Programme='Unknown'), self.row('e3')])
+        self.assertEqual((importer.created_count, importer.failed_count), (2, 2))
+        self.assertEqual(importer.errors, [
+            "Row 3: An unexpected database error occurred for student ID bad1: rejected",
+            "Row 4: Programme 'Unknown' not found. Skipping.",
+        ])
+        self.assertEqual(sorted(StudentProfile.objects.values_list('student_id', flat=True)), ['e1', 'e3'])
+
+    def test_reimport_updates_existing_students(self):
+        self.import_rows([self.row('c1')])
+        importer = self.import_rows([self.row('c1', **{'Full Name': 'Renamed', 'Positive Preferences': ''}), self.row('c2')])
+        self.assertEqual((importer.created_count, importer.updated_count), (1, 1))
+        profile = StudentProfile.objects.get(student_id='c1')
+        self.assertEqual(profile.user.full_name, 'Renamed')
+        self.assertFalse(profile.positive_preferences.exists())
+        self.assertEqual(User.objects.filter(email='c1@imail.sunway.edu.my').count(), 1)
+
+
+class SupervisorImporterTests(TestCase):
+    headers = [
+        'Full Name', 'Email', 'Department', 'Expertise', 'Supervision Capacity', 'Accepting Students',
+        'Standardised Expertise', 'Preferred Programmes First Choice', 'Preferred Programmes Second Choice',
+    ]
+
+    def setUp(self):
+        self.school = School.objects.create(name='School of Engineering')
+        self.department = Department.objects.create(name='Computing', school=self.school)
+        self.group = ProgrammePreferenceGroup.objects.create(name='Computer Science')
+        for name in ('AI', 'Web'):
+            StandardisedTopic.objects.create(name=name)
+
+    def import_rows(self, rows):
+        importer = SupervisorImporter(self.headers)
+        importer.import_rows(enumerate(rows, start=2))
+        return importer
+
+    def row(self, name, **values):
+        return {'Full Name': f'Lecturer {name}', 'Email': f'{name}@example.com', 'Department': 'computing',
+                'Expertise': 'Machine learning; Web', 'Supervision Capacity': '5', 'Accepting Students': 'Yes',
+                'Standardised Expertise': 'AI; Web', 'Preferred Programmes First Choice': 'computer science',
+                'Preferred Programmes Second Choice': '', **values}
+
+    def test_roster_reimport_takes_a_constant_number_of_queries(self):
+        # schools, departments, groups, topics, users, profiles, user insert, profile insert,
+        # expertise delete + insert, savepoint pair
+        with self.assertNumQueries(12):
+            self.import_rows([self.row(f'a{index}') for index in range(2)])
+        # ... plus one bulk_update each for the existing users and profiles
+        with self.assertNumQueries(14):
+            importer = self.import_rows([self.row(f'a{index}') for index in range(2)] + [self.row(f'b{index}') for index in range(4)])
+        self.assertEqual((importer.created_count, importer.updated_count), (4, 2))
+        profile = SupervisorProfile.objects.get(user__email='b3@example.com')
+        self.assertEqual((profile.department, profile.school), (self.department, self.school))
+        self.assertEqual(profile.expertise, '"Machine learning", "Web"')
+        self.assertEqual((profile.supervision_capacity, profile.accepting_students), (5, True))
+        self.assertEqual(profile.preferred_programmes_first_choice, self.group)
+        self.assertEqual(sorted(profile.standardised_expertise.values_list('name', flat=True)), ['AI', 'Web'])
+        self.assertTrue(profile.user.check_password(DEFAULT_PASSWORD))
+
+    def test_bad_rows_are_reported_and_skipped(self):
+        importer = self.import_rows([
+            self.row('ok1', Department='SCHOOL OF ENGINEERING', **{'Standardised Expertise': 'AI; ai; Cooking'}),
+            self.row('bad1', Department='Unknown'),
+            self.row('bad2', **{'Supervision Capacity': 'many'}),
+            self.row('bad3', **{'Preferred Programmes Second Choice': 'Nothing'}),
+            self.row('bad4', Email=''),
+        ])
+        self.assertEqual((importer.created_count, importer.updated_count), (1, 0))
+        self.assertEqual(importer.errors, [
+            "Row 2: For supervisor ok1@example.com, could not find standardised topics: ai, Cooking",
+            "Row 3: Department/School 'Unknown' not found. Skipping.",
+            "Row 4: Invalid 'Supervision Capacity'. It must be a whole number. Skipping.",
+            "Row 5: A Programme Preference Group was not found. Details: ProgrammePreferenceGroup matching query does not exist.",
+            "Row 6: Missing required data (Full Name, Department, or Email).",
+        ])
+        profile = SupervisorProfile.objects.get()
+        self.assertEqual((profile.department, profile.school), (None, self.school))
+        self.assertEqual(list(profile.standardised_expertise.values_list('name', flat=True)), ['AI'])
+
+    def test_reimport_updates_only_the_given_columns(self):
+        self.import_rows([self.row('c1')])
+        importer = SupervisorImporter(['Full Name', 'Email', 'Department', 'Standardised Expertise'])
+        importer.import_rows([(2, {'Full Name': 'Renamed', 'Email': 'C1@example.com', 'Department': 'Computing', 'Standardised Expertise': ''})])
+        profile = SupervisorProfile.objects.get()
+        self.assertEqual(profile.user.full_name, 'Renamed')
+        self.assertEqual((profile.supervision_capacity, profile.expertise), (5, '"Machine learning", "Web"'))
+        self.assertFalse(profile.standardised_expertise.exists())
+
+
+class ImportStudentsCommandTests(TestCase):
+    def setUp(self):
+        self.semester = Semester.objects.create(name='Latest', start_date=date(2025, 1, 1), end_date=date(2025, 6, 1))
+        Semester.objects.create(name='Older', start_date=date(2024, 1, 1), end_date=date(2024, 6, 1))
+        Programme.objects.create(name='BCS', department=Department.objects.create(name='Computing'))
+        User.objects.create_user('s1@imail.sunway.edu.my', None, user_type='student', full_name='Existing')
+
+    def call(self, rows):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', newline='') as csv_file:
+            csv_file.write('id,sentence\n' + ''.join(f'{student_id},I like AI\n' for student_id in rows))
+            csv_file.flush()
+            stdout = io.StringIO()
+            call_command('import_students', csv_file.name, '--id_column', 'id', stdout=stdout)
+        return stdout.getvalue()
+
+    def test_duplicate_ids_get_unique_suffixes_in_constant_queries(self):
+        # programmes, semester, candidate emails, user insert, profile insert, savepoint pair
+        with self.assertNumQueries(7):
+            self.call(['S1', 's1', 'S11', 'x'])
+        self.assertEqual(
+            list(StudentProfile.objects.order_by('user_id').values_list('student_id', flat=True)),
+            ['s11', 's12', 's111', 'x'],
+        )
+        self.assertEqual(set(StudentProfile.objects.values_list('semester', flat=True)), {self.semester.pk})
+        with self.assertNumQueries(7):
+            self.call([f'y{index}' for index in range(20)])
+        self.assertEqual(StudentProfile.objects.count(), 24)
+
+    def test_output_lists_every_created_user(self):
+        output = self.call(['S1', 'z'])
+        self.assertEqual(output.splitlines(), [
+            "Created user: s11@imail.sunway.edu.my for 'Student 1'",
+            "Created user: z@imail.sunway.edu.my for 'Student 2'",
+            "Import complete. Student profiles created: 2. Student profiles updated: 0.",
+        ])
+
+    def test_heavy_collisions_only_look_up_candidate_emails(self):
+        User.objects.bulk_create(User(email=f'x{index or ""}@imail.sunway.edu.my') for index in range(10))
+        User.objects.create_user('x10@other.edu', None)
+        # Candidate windows x..x2, x3..x8 and x9..x20 are looked up in turn
+        with self.assertNumQueries(3):
+            emails = allocate_unique_emails(['x', 'y', 'x'], 'imail.sunway.edu.my')
+        self.assertEqual(emails, ['x10@imail.sunway.edu.my', 'y@imail.sunway.edu.my', 'x11@imail.sunway.edu.my'])